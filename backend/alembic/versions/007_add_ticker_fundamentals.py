@@ -0,0 +1,37 @@
+"""Add shared ticker_fundamentals table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ticker_fundamentals",
+        sa.Column("symbol", sa.String(20), primary_key=True),
+        sa.Column("lpa", sa.Float, nullable=True),
+        sa.Column("vpa", sa.Float, nullable=True),
+        sa.Column("pvp", sa.Float, nullable=True),
+        sa.Column("dy", sa.Float, nullable=True),
+        sa.Column("last_dividend", sa.Float, nullable=True),
+        sa.Column("dividends_5y", ARRAY(sa.Float), nullable=True),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("requested_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_ticker_fundamentals_fetched_at", "ticker_fundamentals", ["fetched_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ticker_fundamentals_fetched_at", table_name="ticker_fundamentals")
+    op.drop_table("ticker_fundamentals")
@@ -0,0 +1,41 @@
+"""Add daily price_bars and price_history_coverage tables
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_bars",
+        sa.Column("symbol", sa.String(20), primary_key=True),
+        sa.Column("date", sa.Date, primary_key=True),
+        sa.Column("open", sa.Float, nullable=True),
+        sa.Column("high", sa.Float, nullable=True),
+        sa.Column("low", sa.Float, nullable=True),
+        sa.Column("close", sa.Float, nullable=False),
+        sa.Column("adj_close", sa.Float, nullable=True),
+        sa.Column("volume", sa.Float, nullable=True),
+    )
+    op.create_table(
+        "price_history_coverage",
+        sa.Column("symbol", sa.String(20), primary_key=True),
+        sa.Column("start_date", sa.Date, nullable=False),
+        sa.Column("end_date", sa.Date, nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("price_history_coverage")
+    op.drop_table("price_bars")
@@ -0,0 +1,35 @@
+"""Add local BCB SGS series store
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bcb_series_points",
+        sa.Column("code", sa.Integer, primary_key=True),
+        sa.Column("date", sa.Date, primary_key=True),
+        sa.Column("value", sa.Float, nullable=False),
+    )
+    op.create_table(
+        "bcb_series_sync",
+        sa.Column("code", sa.Integer, primary_key=True),
+        sa.Column("first_date", sa.Date, nullable=False),
+        sa.Column("synced_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bcb_series_sync")
+    op.drop_table("bcb_series_points")
@@ -0,0 +1,40 @@
+"""Add position_checkpoints for the transaction ledger
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position_checkpoints",
+        sa.Column("user_id", sa.String(36), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("asset_class", sa.String(20), primary_key=True),
+        sa.Column("asset_key", sa.String(36), primary_key=True),
+        sa.Column("tx_date", sa.Date, primary_key=True),
+        sa.Column("tx_id", sa.Integer, primary_key=True),
+        sa.Column("tx_count", sa.Integer, nullable=False),
+        sa.Column("state", JSONB, nullable=False),
+    )
+    # Replays read one asset's transactions in (date, id) order
+    op.create_index(
+        "ix_transactions_user_asset_class_date",
+        "transactions",
+        ["user_id", "asset_class", "date", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_asset_class_date", table_name="transactions")
+    op.drop_table("position_checkpoints")
@@ -0,0 +1,107 @@
+"""Partition activity_logs by month
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months after the current one created up front; the partition
+# maintenance job keeps this many ahead from then on
+PARTITIONS_AHEAD = 3
+
+
+def upgrade() -> None:
+    # Keep the id sequence, so ids stay unique across old and new rows
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_unpartitioned")
+    op.execute("ALTER INDEX activity_logs_pkey RENAME TO activity_logs_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_activity_logs_user_id RENAME TO ix_activity_logs_unpartitioned_user_id")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+
+    # The partition key must be part of the primary key
+    op.execute("""
+        CREATE TABLE activity_logs (
+            id integer NOT NULL DEFAULT nextval('activity_logs_id_seq'),
+            user_id varchar(36) NOT NULL REFERENCES users (id),
+            action varchar(50) NOT NULL,
+            resource varchar(50) NOT NULL,
+            resource_id varchar(100),
+            details text,
+            ip_address varchar(45),
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    # Keyset pagination over all logs and over one user's logs
+    op.create_index("ix_activity_logs_created_at_id", "activity_logs", ["created_at", "id"])
+    op.create_index("ix_activity_logs_user_id_created_at", "activity_logs", ["user_id", "created_at", "id"])
+
+    # One partition per UTC month, from the oldest row to PARTITIONS_AHEAD
+    # months after the current one
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date := date_trunc(
+                'month', coalesce((SELECT min(created_at) FROM activity_logs_unpartitioned), now()) AT TIME ZONE 'UTC'
+            )::date;
+            last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{PARTITIONS_AHEAD} months')::date;
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF activity_logs FOR VALUES FROM (%L) TO (%L)',
+                    'activity_logs_' || to_char(month, 'YYYY_MM'),
+                    month::timestamp AT TIME ZONE 'UTC',
+                    (month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+
+    # Catches rows outside every monthly partition (e.g. a clock far off)
+    # instead of failing their insert; the maintenance job moves them out
+    op.execute("CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT")
+
+    op.execute("""
+        INSERT INTO activity_logs (id, user_id, action, resource, resource_id, details, ip_address, created_at)
+        SELECT id, user_id, action, resource, resource_id, details, ip_address, coalesce(created_at, now())
+        FROM activity_logs_unpartitioned
+    """)
+    op.execute("DROP TABLE activity_logs_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+    op.execute("ALTER INDEX activity_logs_pkey RENAME TO activity_logs_partitioned_pkey")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE activity_logs (
+            id integer NOT NULL DEFAULT nextval('activity_logs_id_seq') PRIMARY KEY,
+            user_id varchar(36) NOT NULL REFERENCES users (id),
+            action varchar(50) NOT NULL,
+            resource varchar(50) NOT NULL,
+            resource_id varchar(100),
+            details text,
+            ip_address varchar(45),
+            created_at timestamptz DEFAULT now()
+        )
+    """)
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    op.create_index("ix_activity_logs_user_id", "activity_logs", ["user_id"])
+
+    op.execute("""
+        INSERT INTO activity_logs (id, user_id, action, resource, resource_id, details, ip_address, created_at)
+        SELECT id, user_id, action, resource, resource_id, details, ip_address, created_at
+        FROM activity_logs_partitioned
+    """)
+    # Drops every partition with it
+    op.execute("DROP TABLE activity_logs_partitioned")
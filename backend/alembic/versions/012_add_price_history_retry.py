@@ -0,0 +1,27 @@
+"""Track unconfirmed empty ranges in price_history_coverage
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("price_history_coverage", sa.Column("unconfirmed_start", sa.Date, nullable=True))
+    op.add_column("price_history_coverage", sa.Column("unconfirmed_end", sa.Date, nullable=True))
+    op.add_column("price_history_coverage", sa.Column("retry_after", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("price_history_coverage", "retry_after")
+    op.drop_column("price_history_coverage", "unconfirmed_end")
+    op.drop_column("price_history_coverage", "unconfirmed_start")
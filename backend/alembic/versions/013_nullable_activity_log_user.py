@@ -0,0 +1,24 @@
+"""Allow activity_logs without a user
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Failed logins of unknown emails are logged without a user
+    op.alter_column("activity_logs", "user_id", nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM activity_logs WHERE user_id IS NULL")
+    op.alter_column("activity_logs", "user_id", nullable=False)
@@ -11,6 +11,14 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
 
+    # Password hashing: bcrypt cost, worker threads and how many calls may
+    # wait for a worker before requests get 503; with password_rehash a
+    # login re-hashes passwords stored at another cost
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 32
+    password_rehash: bool = True
+
     # Google OAuth
     google_client_id: str = ""
 
@@ -26,6 +34,65 @@ class Settings(BaseSettings):
     smtp_from: str = ""
     email_verify_url: str = "http://localhost:5173"
 
+    # Market data caching (seconds)
+    quote_cache_ttl_market_open: int = 120
+    quote_cache_ttl_market_closed: int = 1800
+    quote_cache_max_entries: int = 5000
+
+    # Shared fundamentals store
+    fundamentals_max_age_hours: int = 24
+    fundamentals_retry_hours: int = 6
+    fundamentals_active_days: int = 30
+    fundamentals_refresh_interval_seconds: int = 900
+    fundamentals_refresh_batch: int = 40
+
+    # Hours before an unexplained empty price history range is downloaded again
+    price_history_retry_hours: int = 24
+
+    # Server-side price write-back for all holders
+    price_sync_interval_seconds: int = 900
+
+    # Local BCB SGS series store (minutes between upstream checks per code)
+    bcb_series_sync_interval_minutes: int = 360
+
+    # Position ledger: keep a checkpoint every N transactions per asset
+    ledger_checkpoint_interval: int = 50
+    # Attempts for ledger writes aborted by a deadlock or serialization failure
+    ledger_write_attempts: int = 3
+
+    # Position reconciliation (users per page, hours between report-only runs)
+    reconcile_page_size: int = 200
+    reconcile_interval_hours: int = 24
+
+    # Per-user derived data (fixed-income series, summaries)
+    user_cache_ttl_seconds: int = 3600
+    user_cache_max_entries: int = 2000
+
+    # Seconds an authenticated user's account status is trusted without a
+    # lookup (upper bound for a deactivation made outside the admin endpoints)
+    user_status_cache_ttl_seconds: int = 30
+
+    # Buffered activity log: rows per insert, seconds between flushes and
+    # entries buffered before log_activity waits for a flush
+    activity_log_batch_size: int = 200
+    activity_log_flush_seconds: float = 2
+    activity_log_max_pending: int = 10000
+    # Monthly activity_logs partitions: full months kept before the current
+    # one (older partitions are dropped) and months created ahead
+    activity_log_retention_months: int = 12
+    activity_log_partitions_ahead: int = 3
+
+    # Admin metrics: seconds the counts are cached, heaviest users listed
+    admin_metrics_ttl_seconds: int = 60
+    admin_metrics_top_users: int = 20
+
+    # Spreadsheet uploads (B3 statements): size limits, non-empty data rows
+    # per file and threads parsing concurrently
+    import_max_file_mb: int = 20
+    import_max_uncompressed_mb: int = 200
+    import_max_rows: int = 50000
+    import_parse_workers: int = 2
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
@@ -1,23 +1,141 @@
+"""
+Buffered activity log.
+
+``log_activity`` stages the entry on the request's session; when that
+session commits the entry moves to an in-process buffer (a rollback
+drops it, so only committed actions are logged). The buffer is written
+with multi-row inserts by the ``activity-log-flush`` job, every
+``activity_log_flush_seconds`` or as soon as ``activity_log_batch_size``
+entries are waiting, and once more on shutdown.
+
+The buffer holds at most ``activity_log_max_pending`` entries: callers
+wait for a flush when it is full. A batch that fails because the database
+is unreachable goes back to the buffer for the next flush. Entries still
+buffered when the process dies are lost.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from ..config import settings
+from ..database import async_session
 from ..models.activity_log import ActivityLog
+from .scheduler import periodic
+
+logger = logging.getLogger(__name__)
+
+# Session.info key for entries staged before the session commits
+_INFO_KEY = "activity_log_entries"
+
+_pending: list[dict] = []
+_flushed = asyncio.Event()
+_flush_lock = asyncio.Lock()
+_stats = {"logged": 0, "written": 0, "dropped": 0, "batches": 0, "waits": 0}
 
 
 async def log_activity(
     db: AsyncSession,
-    user_id: str,
+    user_id: str | None,
     action: str,
     resource: str,
     resource_id: str | None = None,
     details: str | None = None,
     ip_address: str | None = None,
 ):
-    entry = ActivityLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        resource_id=resource_id,
-        details=details,
-        ip_address=ip_address,
-    )
-    db.add(entry)
+    while len(_pending) >= settings.activity_log_max_pending:
+        _stats["waits"] += 1
+        _flushed.clear()
+        flush_job.trigger()
+        await _flushed.wait()
+
+    db.info.setdefault(_INFO_KEY, []).append({
+        "user_id": user_id,
+        "action": action,
+        "resource": resource,
+        "resource_id": resource_id,
+        "details": details,
+        "ip_address": ip_address,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_entries(session: Session) -> None:
+    entries = session.info.pop(_INFO_KEY, None)
+    if not entries:
+        return
+    _pending.extend(entries)
+    _stats["logged"] += len(entries)
+    if len(_pending) >= settings.activity_log_batch_size:
+        flush_job.trigger()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_entries(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
+
+
+async def _write(rows: list[dict]) -> None:
+    async with async_session() as db:
+        await db.execute(insert(ActivityLog), rows)
+        await db.commit()
+
+
+def _is_unavailable(exc: Exception) -> bool:
+    """Whether the write failed for lack of a database, not because of its rows."""
+    if isinstance(exc, (OperationalError, InterfaceError, PoolTimeoutError, OSError)):
+        return True
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+async def flush() -> int:
+    """Write every buffered entry; returns the number written."""
+    written = 0
+    async with _flush_lock:
+        while _pending:
+            batch = _pending[:settings.activity_log_batch_size]
+            del _pending[:len(batch)]
+            try:
+                await _write(batch)
+                written += len(batch)
+            except asyncio.CancelledError:
+                # Stopped mid-write (shutdown): the final flush writes it
+                _pending[:0] = batch
+                raise
+            except Exception as e:
+                if _is_unavailable(e):
+                    # Kept for the next flush; waiting callers stay blocked
+                    # until the database is back
+                    _pending[:0] = batch
+                    _stats["written"] += written
+                    logger.warning("[activity-log] database unavailable, %d entries kept: %s", len(_pending), e)
+                    return written
+                # One bad row (e.g. a deleted user's id) must not lose the batch
+                logger.warning("[activity-log] batch insert failed, writing %d rows one by one", len(batch))
+                for row in batch:
+                    try:
+                        await _write([row])
+                        written += 1
+                    except Exception:
+                        _stats["dropped"] += 1
+                        logger.exception("[activity-log] dropped %s entry of user %s", row["action"], row["user_id"])
+            _stats["batches"] += 1
+            _flushed.set()
+    _stats["written"] += written
+    _flushed.set()
+    return written
+
+
+@periodic("activity-log-flush", seconds=settings.activity_log_flush_seconds)
+async def flush_job() -> None:
+    await flush()
+
+
+def stats() -> dict:
+    return _stats | {"pending": len(_pending)}
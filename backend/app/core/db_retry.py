@@ -0,0 +1,39 @@
+"""Retry database work aborted by a deadlock or serialization failure."""
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+BASE_DELAY = 0.05
+
+
+def is_retryable(exc: DBAPIError) -> bool:
+    return getattr(exc.orig, "sqlstate", None) in RETRYABLE_SQLSTATES
+
+
+async def run_with_retry(db: AsyncSession, work: Callable[[], Awaitable[T]], attempts: int = 3) -> T:
+    """Run ``work`` (which must commit) and rerun it after a rollback if the
+    database aborted it to break a lock conflict.
+
+    ``work`` is called from scratch on every attempt, so it must reload
+    whatever it changes instead of reusing objects from a failed attempt.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await work()
+        except DBAPIError as e:
+            await db.rollback()
+            if attempt == attempts or not is_retryable(e):
+                raise
+            logger.info("[db] retrying after %s (attempt %d/%d)", e.orig.sqlstate, attempt, attempts)
+            await asyncio.sleep(BASE_DELAY * attempt * (1 + random.random()))
@@ -0,0 +1,46 @@
+"""
+Conditional GET for per-user data.
+
+ETags are derived from the user's data version (``user_cache``), so a
+request whose ``If-None-Match`` is current is answered with 304 before
+the endpoint queries any entity table. Versions live in-process, which
+matches the single-process deployment of the other in-process caches.
+"""
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from ..models.user import User
+from . import user_cache
+from .security import get_current_user
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def user_etag(user_id: str) -> str:
+    epoch, version = user_cache.data_version(user_id)
+    return f'W/"{epoch}-{user_id}-{version}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip() for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+async def get_versioned_user(
+    request: Request,
+    response: Response,
+    user: User = Depends(get_current_user),
+) -> User:
+    """``get_current_user`` for reads of the user's own data.
+
+    Raises 304 when the client already holds the current version and
+    otherwise tags the response with the version's ETag.
+    """
+    etag = user_etag(user.id)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return user
@@ -0,0 +1,110 @@
+"""
+Password hashing on a dedicated worker pool.
+
+bcrypt is deliberately slow (hundreds of milliseconds per call), so it
+never runs on the event loop: calls go to a small thread pool and wait
+there behind at most ``password_hash_max_queue`` others. Beyond that the
+request fails fast with 503 instead of piling up behind the pool.
+
+Hashes are produced with ``bcrypt_rounds``. With ``password_rehash`` a
+successful login re-hashes a password stored at any other cost, so the
+cost factor can be changed without invalidating existing passwords.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from ..config import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    # Any other cost counts as outdated for verify_and_update
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+
+class _PasswordPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not finished (event loop only)
+        self._running = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _timed(self, submitted: float, fn, args):
+        started = time.monotonic()
+        with self._lock:
+            self._running += 1
+            wait = started - submitted
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.run_seconds += time.monotonic() - started
+
+    async def run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Servidor ocupado, tente novamente")
+        self._pending += 1
+        self.calls += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, time.monotonic(), fn, args)
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = self._running
+            finished = self.calls - self._pending
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": running,
+                "queued": self._pending - running,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / finished * 1000, 1) if finished else None,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+                "avg_run_ms": round(self.run_seconds / finished * 1000, 1) if finished else None,
+            }
+
+
+_pool = _PasswordPool(settings.password_hash_workers, settings.password_hash_max_queue)
+
+
+async def hash_password(password: str) -> str:
+    return await _pool.run(pwd_context.hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _pool.run(pwd_context.verify, plain, hashed)
+
+
+async def verify_and_update(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """``(valid, new hash)``; the new hash is set only when the stored one is outdated."""
+    if not settings.password_rehash:
+        return await verify_password(plain, hashed), None
+    return await _pool.run(pwd_context.verify_and_update, plain, hashed)
+
+
+def pool_stats() -> dict:
+    return _pool.stats()
@@ -0,0 +1,96 @@
+"""Minimal in-process scheduler for periodic background jobs.
+
+Jobs are registered at import time with ``@periodic(...)`` and started
+by the FastAPI lifespan. ``job.trigger()`` wakes a job before its next
+scheduled run (e.g. when a request enqueues work for it).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval: float, fn: Callable[[], Awaitable[None]], initial_delay: float = 0):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.initial_delay = initial_delay
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: float | None = None
+        self.last_duration: float | None = None
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def trigger(self) -> None:
+        """Run the job as soon as possible instead of waiting for the interval."""
+        self._wake.set()
+
+    async def run_once(self) -> None:
+        started = time.monotonic()
+        try:
+            await self.fn()
+        except Exception:
+            self.failures += 1
+            logger.exception("[scheduler] job %s failed", self.name)
+        finally:
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.last_duration = time.monotonic() - started
+
+    async def _loop(self) -> None:
+        await self._sleep(self.initial_delay)
+        while True:
+            await self.run_once()
+            await self._sleep(self.interval)
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+        }
+
+
+_jobs: dict[str, PeriodicJob] = {}
+
+
+def periodic(name: str, seconds: float, initial_delay: float = 0):
+    """Register the decorated coroutine function as a periodic job."""
+    def decorator(fn: Callable[[], Awaitable[None]]) -> PeriodicJob:
+        job = PeriodicJob(name, seconds, fn, initial_delay)
+        _jobs[name] = job
+        return job
+    return decorator
+
+
+def start() -> None:
+    for job in _jobs.values():
+        if job._task is None or job._task.done():
+            job._task = asyncio.create_task(job._loop(), name=f"job:{job.name}")
+
+
+async def stop() -> None:
+    tasks = [job._task for job in _jobs.values() if job._task]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for job in _jobs.values():
+        job._task = None
+
+
+def stats() -> dict:
+    return {name: job.stats() for name, job in _jobs.items()}
@@ -3,23 +3,19 @@ from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
 from ..database import get_db
+from .cache import TTLCache
 from ..models.user import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 bearer_scheme = HTTPBearer()
 
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+# Users that passed every account check, detached from their session.
+# Admin endpoints that change a user call ``invalidate_user_status``; the
+# TTL bounds how long any other change goes unnoticed.
+_user_status = TTLCache(maxsize=settings.user_cache_max_entries, ttl=settings.user_status_cache_ttl_seconds)
 
 
 def create_access_token(user_id: str, role: str) -> str:
@@ -67,6 +63,17 @@ def decode_token(token: str, expected_type: str = "access") -> dict:
     return payload
 
 
+def token_user_id(authorization: str | None) -> str | None:
+    """User id of a valid ``Bearer`` access token, without a database lookup."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_token(token).get("sub")
+    except HTTPException:
+        return None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: AsyncSession = Depends(get_db),
@@ -76,6 +83,10 @@ async def get_current_user(
     if not user_id:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Token invalido")
 
+    user = _user_status.get(user_id)
+    if user is not None:
+        return user
+
     user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Usuario nao encontrado")
@@ -86,9 +97,17 @@ async def get_current_user(
     if not user.is_approved:
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Conta pendente de aprovacao")
 
+    # Shared read-only between requests, so keep it out of this session
+    db.expunge(user)
+    _user_status.set(user_id, user)
     return user
 
 
+def invalidate_user_status(user_id: str) -> None:
+    """Make the next request of ``user_id`` reload their account."""
+    _user_status.delete(user_id)
+
+
 async def require_admin(
     user: User = Depends(get_current_user),
 ) -> User:
@@ -0,0 +1,86 @@
+"""Request coalescing: concurrent callers share one upstream call per key."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+
+class SingleFlight:
+    """Deduplicate in-flight batch lookups on a per-key basis.
+
+    A caller asking for keys ``{A, B}`` while another request for ``{B, C}``
+    is already running only fetches ``A`` itself and waits on the pending
+    result for ``B``. Every key is fetched at most once at any given time.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # The loop only keeps weak references to tasks
+        self._tasks: set[asyncio.Task] = set()
+        self.shared = 0
+        self.started = 0
+
+    async def run_many(
+        self,
+        keys: Iterable[Hashable],
+        fetch: Callable[[list], Awaitable[dict]],
+    ) -> dict[Hashable, Any]:
+        """Resolve ``keys`` through ``fetch``, joining calls already in flight.
+
+        ``fetch`` receives the list of keys this caller owns and must return
+        a ``{key: value}`` dict; keys it leaves out resolve to ``None``.
+        """
+        loop = asyncio.get_running_loop()
+        waiting: dict[Hashable, asyncio.Future] = {}
+        owned: list = []
+        for key in dict.fromkeys(keys):
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = loop.create_future()
+                self._inflight[key] = fut
+                owned.append(key)
+            else:
+                self.shared += 1
+            waiting[key] = fut
+
+        if owned:
+            self.started += 1
+            # Run upstream in its own task so a disconnecting owner does not
+            # cancel the work other callers are waiting on.
+            task = asyncio.ensure_future(self._resolve(owned, fetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # Wait for every key before raising, so no failed future is left
+        # with its exception never retrieved
+        outcomes = await asyncio.gather(
+            *(asyncio.shield(fut) for fut in waiting.values()), return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return dict(zip(waiting, outcomes))
+
+    async def _resolve(self, owned: list, fetch: Callable[[list], Awaitable[dict]]):
+        try:
+            values = await fetch(owned)
+        except asyncio.CancelledError:
+            for key in owned:
+                self._inflight.pop(key).cancel()
+            raise
+        except Exception as e:
+            for key in owned:
+                fut = self._inflight.pop(key)
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for key in owned:
+            fut = self._inflight.pop(key)
+            if not fut.done():
+                fut.set_result(values.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.started,
+            "shared_keys": self.shared,
+        }
@@ -0,0 +1,61 @@
+"""
+Per-user cache for data derived from a user's holdings.
+
+Entries are keyed by ``(user_id, namespace, params)``. Any successful
+write request drops the caller's entries (see the middleware in
+``main``); routers that write positions or transactions also call
+``invalidate_user`` before responding, and the seed reset clears
+everything.
+
+Each user also has a data version, bumped whenever their entries are
+invalidated; ``data_version`` feeds the ETags of per-user GET endpoints.
+The epoch changes on every process start and on ``clear``, so versions
+are never reused for different data.
+"""
+
+import uuid
+from typing import Any, Hashable
+
+from ..config import settings
+from .cache import TTLCache
+
+_cache = TTLCache(maxsize=settings.user_cache_max_entries, ttl=settings.user_cache_ttl_seconds)
+_epoch = uuid.uuid4().hex[:8]
+_versions: dict[str, int] = {}
+
+
+def get(user_id: str, namespace: str, params: Hashable = ()) -> Any:
+    """Cached value or ``None``."""
+    return _cache.get((user_id, namespace, params))
+
+
+def set(user_id: str, namespace: str, params: Hashable, value: Any) -> None:
+    _cache.set((user_id, namespace, params), value)
+
+
+def data_version(user_id: str) -> tuple[str, int]:
+    """``(epoch, version)`` of the user's data."""
+    return _epoch, _versions.get(user_id, 0)
+
+
+def invalidate_user(user_id: str, namespace: str | None = None) -> int:
+    """Drop the user's entries (only ``namespace`` if given).
+
+    Without a namespace the user's data changed, so their version is bumped.
+    """
+    if namespace is None:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+    return _cache.delete_where(
+        lambda key: key[0] == user_id and (namespace is None or key[1] == namespace)
+    )
+
+
+def clear() -> None:
+    global _epoch
+    _epoch = uuid.uuid4().hex[:8]
+    _versions.clear()
+    _cache.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
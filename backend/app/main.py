@@ -1,12 +1,14 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from .config import settings
+from .core import activity_logger, scheduler, user_cache
+from .core.security import token_user_id
 from .database import async_session
 from .routers import (
     auth,
@@ -33,8 +35,11 @@ from .routers import (
     import_backup,
     import_templates,
     closed_positions,
+    realized_pnl,
+    portfolio_summary,
 )
 from .routers.seed import _is_empty, run_seed
+from .services.bcb import close_client as close_bcb_client
 
 
 @asynccontextmanager
@@ -46,7 +51,11 @@ async def lifespan(app: FastAPI):
             print("[seed] Database seeded with initial data")
         else:
             print("[seed] Database already has data, skipping seed")
+    scheduler.start()
     yield
+    await scheduler.stop()
+    await activity_logger.flush()
+    await close_bcb_client()
 
 
 app = FastAPI(title="Dash Financeiro API", version="1.0.0", lifespan=lifespan)
@@ -65,6 +74,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+@app.middleware("http")
+async def invalidate_user_cache_on_write(request: Request, call_next):
+    """Drop the caller's derived data after any successful write."""
+    response = await call_next(request)
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        user_id = token_user_id(request.headers.get("authorization"))
+        if user_id:
+            user_cache.invalidate_user(user_id)
+    return response
+
+
 # Auth & admin routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -92,6 +115,8 @@ app.include_router(portfolio_reset.router)
 app.include_router(import_backup.router)
 app.include_router(import_templates.router)
 app.include_router(closed_positions.router)
+app.include_router(realized_pnl.router)
+app.include_router(portfolio_summary.router)
 
 
 @app.get("/api/health")
@@ -14,6 +14,10 @@ from .patrimonial_history import PatrimonialHistory
 from .transaction import Transaction
 from .fi_etf import FiEtf
 from .cash_account import CashAccount
+from .ticker_fundamental import TickerFundamental
+from .price_history import PriceBar, PriceHistoryCoverage
+from .bcb_series import BcbSeriesPoint, BcbSeriesSync
+from .position_checkpoint import PositionCheckpoint
 
 __all__ = [
     "Base",
@@ -32,4 +36,10 @@ __all__ = [
     "Transaction",
     "FiEtf",
     "CashAccount",
+    "TickerFundamental",
+    "PriceBar",
+    "PriceHistoryCoverage",
+    "BcbSeriesPoint",
+    "BcbSeriesSync",
+    "PositionCheckpoint",
 ]
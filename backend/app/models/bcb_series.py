@@ -0,0 +1,26 @@
+import datetime
+
+from sqlalchemy import Integer, Float, Date, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class BcbSeriesPoint(Base):
+    """One observation of a BCB SGS series (e.g. CDI=12, Selic=11, IPCA=433)."""
+
+    __tablename__ = "bcb_series_points"
+
+    code: Mapped[int] = mapped_column(Integer, primary_key=True)
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    value: Mapped[float] = mapped_column(Float)
+
+
+class BcbSeriesSync(Base):
+    """Sync state per SGS code: stored range start and last upstream check."""
+
+    __tablename__ = "bcb_series_sync"
+
+    code: Mapped[int] = mapped_column(Integer, primary_key=True)
+    first_date: Mapped[datetime.date] = mapped_column(Date)
+    synced_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,25 @@
+import datetime
+
+from sqlalchemy import String, Integer, Date, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class PositionCheckpoint(Base):
+    """Snapshot of one asset's position after a given transaction.
+
+    ``(tx_date, tx_id)`` is the ordering key of the last transaction
+    included; the opening balance uses ``(0001-01-01, 0)``.
+    """
+
+    __tablename__ = "position_checkpoints"
+
+    user_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    asset_class: Mapped[str] = mapped_column(String(20), primary_key=True)
+    asset_key: Mapped[str] = mapped_column(String(36), primary_key=True)  # ticker or asset id
+    tx_date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    tx_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tx_count: Mapped[int] = mapped_column(Integer)  # transactions included
+    state: Mapped[dict] = mapped_column(JSONB)
@@ -0,0 +1,44 @@
+import datetime
+
+from sqlalchemy import String, Float, Date, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class PriceBar(Base):
+    """Daily OHLC bar per Yahoo symbol, shared by all users."""
+
+    __tablename__ = "price_bars"
+
+    symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    open: Mapped[float | None] = mapped_column(Float, nullable=True)
+    high: Mapped[float | None] = mapped_column(Float, nullable=True)
+    low: Mapped[float | None] = mapped_column(Float, nullable=True)
+    close: Mapped[float] = mapped_column(Float)
+    adj_close: Mapped[float | None] = mapped_column(Float, nullable=True)
+    volume: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+class PriceHistoryCoverage(Base):
+    """Contiguous date range already downloaded for a symbol.
+
+    Tracked separately from the bars so ranges with no trading (holidays,
+    dates before listing) are not requested from Yahoo again. A long range
+    that came back empty with nothing to explain it is covered but kept as
+    ``unconfirmed_start``/``unconfirmed_end``, and downloaded once more
+    after ``retry_after``.
+    """
+
+    __tablename__ = "price_history_coverage"
+
+    symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    start_date: Mapped[datetime.date] = mapped_column(Date)
+    end_date: Mapped[datetime.date] = mapped_column(Date)
+    unconfirmed_start: Mapped[datetime.date | None] = mapped_column(Date, nullable=True)
+    unconfirmed_end: Mapped[datetime.date | None] = mapped_column(Date, nullable=True)
+    retry_after: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
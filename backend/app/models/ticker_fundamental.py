@@ -0,0 +1,23 @@
+import datetime
+
+from sqlalchemy import String, Float, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class TickerFundamental(Base):
+    """Fundamentals per Yahoo symbol, shared by all users."""
+
+    __tablename__ = "ticker_fundamentals"
+
+    symbol: Mapped[str] = mapped_column(String(20), primary_key=True)  # Yahoo symbol, e.g. PETR4.SA
+    lpa: Mapped[float | None] = mapped_column(Float, nullable=True)
+    vpa: Mapped[float | None] = mapped_column(Float, nullable=True)
+    pvp: Mapped[float | None] = mapped_column(Float, nullable=True)
+    dy: Mapped[float | None] = mapped_column(Float, nullable=True)
+    last_dividend: Mapped[float | None] = mapped_column(Float, nullable=True)
+    dividends_5y: Mapped[list[float] | None] = mapped_column(ARRAY(Float), nullable=True)
+    fetched_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), index=True)
+    requested_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
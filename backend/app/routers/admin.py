@@ -1,55 +1,93 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func
+import base64
+import binascii
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..models.user import User
 from ..models.activity_log import ActivityLog
-from ..schemas.activity_log import ActivityLogRead
+from ..schemas.activity_log import ActivityLogPage
+from ..core import activity_logger
+from ..core.passwords import pool_stats
 from ..core.security import require_admin
+from ..services import admin_metrics
+from ..services.log_partitions import maintain_partitions
+from ..services.reconcile import reconcile_positions
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
 @router.get("/metrics")
 async def get_metrics(
+    refresh: bool = Query(False, description="Recompute instead of using the cached counts"),
     admin: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    total = await db.scalar(select(func.count()).select_from(User))
-    active = await db.scalar(
-        select(func.count()).select_from(User).where(User.is_active == True)
-    )
-    pending = await db.scalar(
-        select(func.count())
-        .select_from(User)
-        .where(
-            User.is_approved == False,
-            User.email_verified == True,
-            User.is_active == True,
-        )
-    )
-
-    return {
-        "total_users": total,
-        "active_users": active,
-        "pending_users": pending,
+    """User counts and per-user storage (cached briefly) plus live worker stats."""
+    metrics = await admin_metrics.get_metrics(db, refresh=refresh)
+    return metrics | {
+        "password_hashing": pool_stats(),
+        "activity_log": activity_logger.stats(),
     }
 
 
-@router.get("/logs", response_model=list[ActivityLogRead])
+@router.post("/reconcile-positions")
+async def run_reconcile_positions(
+    repair: bool = Query(False, description="Overwrite mismatched positions with the replayed values"),
+    user_id: str | None = Query(None),
+    admin: User = Depends(require_admin),
+):
+    """Replay transactions and diff them against the stored positions."""
+    return await reconcile_positions(repair=repair, user_id=user_id)
+
+
+@router.post("/log-partitions")
+async def run_log_partitions(
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create upcoming activity log partitions, empty the default one and drop expired ones now."""
+    return await maintain_partitions(db)
+
+
+def _encode_cursor(log: ActivityLog) -> str:
+    raw = f"{log.created_at.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(400, "Cursor invalido")
+
+
+@router.get("/logs", response_model=ActivityLogPage)
 async def get_logs(
     user_id: str | None = Query(None),
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
     admin: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    query = select(ActivityLog).order_by(ActivityLog.created_at.desc())
+    """Logs newest first, paged by (created_at, id) instead of an offset."""
+    query = select(ActivityLog).order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())
 
     if user_id:
         query = query.where(ActivityLog.user_id == user_id)
+    if cursor:
+        created_at, log_id = _decode_cursor(cursor)
+        query = query.where(
+            # The plain bound lets Postgres skip newer partitions
+            ActivityLog.created_at <= created_at,
+            tuple_(ActivityLog.created_at, ActivityLog.id) < (created_at, log_id),
+        )
 
-    query = query.offset(offset).limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    result = await db.execute(query.limit(limit + 1))
+    logs = result.scalars().all()
+    next_cursor = _encode_cursor(logs[limit - 1]) if len(logs) > limit else None
+    return {"items": logs[:limit], "next_cursor": next_cursor}
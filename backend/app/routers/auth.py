@@ -18,9 +18,8 @@ from ..schemas.auth import (
     RefreshResponse,
 )
 from ..schemas.user import UserRead
+from ..core.passwords import hash_password, verify_and_update
 from ..core.security import (
-    hash_password,
-    verify_password,
     create_access_token,
     create_refresh_token,
     decode_token,
@@ -58,7 +57,7 @@ async def register(
     user = User(
         email=data.email,
         name=data.name,
-        hashed_password=hash_password(data.password),
+        hashed_password=await hash_password(data.password),
         role="user",
         is_active=True,
         email_verified=False,
@@ -91,14 +90,15 @@ async def login(
 
     if not user or not user.hashed_password:
         await log_activity(
-            db, "unknown", "login_failed", "auth",
+            db, None, "login_failed", "auth",
             details=f"email={data.email}",
             ip_address=request.client.host if request.client else None,
         )
         await db.commit()
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Credenciais invalidas")
 
-    if not verify_password(data.password, user.hashed_password):
+    valid, new_hash = await verify_and_update(data.password, user.hashed_password)
+    if not valid:
         await log_activity(
             db, user.id, "login_failed", "auth",
             ip_address=request.client.host if request.client else None,
@@ -113,6 +113,8 @@ async def login(
     if not user.is_active:
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Conta desativada")
 
+    if new_hash:
+        user.hashed_password = new_hash
     await log_activity(
         db, user.id, "login", "auth",
         ip_address=request.client.host if request.client else None,
@@ -1,7 +1,7 @@
 """Aggregated metrics for closed positions, computed from transactions + dividends."""
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func
+from sqlalchemy import select, func, case, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
@@ -45,98 +45,85 @@ async def get_closed_position_metrics(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Fetch all transactions for this asset class and user
-    result = await db.execute(
-        select(Transaction)
-        .where(Transaction.user_id == user.id, Transaction.asset_class == asset_class)
-        .order_by(Transaction.date)
+    use_ticker = asset_class in TICKER_CLASSES
+    key_col = Transaction.ticker if use_ticker else Transaction.asset_id
+    is_buy = Transaction.operation_type.in_(BUY_OPS.get(asset_class, set()))
+    is_sell = Transaction.operation_type.in_(SELL_OPS.get(asset_class, set()))
+
+    # Ticker classes count shares and value them at the unit price;
+    # the others count the transaction value itself
+    if use_ticker:
+        qty = func.coalesce(Transaction.qty, 0)
+        value = qty * func.coalesce(Transaction.unit_price, 0)
+    else:
+        qty = value = func.coalesce(Transaction.total_value, 0)
+
+    def total(expr, cond=None):
+        if cond is not None:
+            expr = case((cond, expr), else_=0)
+        return func.coalesce(func.sum(expr), 0)
+
+    # One row per asset, aggregated in the database
+    per_asset = (
+        select(
+            key_col.label("key"),
+            total(value, is_buy).label("total_cost"),
+            total(value, is_sell).label("total_proceeds"),
+            total(qty, is_buy).label("total_bought_qty"),
+            total(qty, is_sell).label("total_sold_qty"),
+            total(func.coalesce(Transaction.fees, 0)).label("total_fees"),
+            func.min(case((is_buy, Transaction.date))).label("first_buy_date"),
+            func.max(case((is_sell, Transaction.date))).label("last_sell_date"),
+        )
+        .where(
+            Transaction.user_id == user.id,
+            Transaction.asset_class == asset_class,
+            key_col.is_not(None),
+            key_col != "",
+        )
+        .group_by(key_col)
+        .subquery()
     )
-    transactions = result.scalars().all()
 
-    use_ticker = asset_class in TICKER_CLASSES
-    buy_ops = BUY_OPS.get(asset_class, set())
-    sell_ops = SELL_OPS.get(asset_class, set())
-
-    # Group transactions by asset key (ticker or asset_id)
-    groups: dict[str, list] = {}
-    for tx in transactions:
-        key = tx.ticker if use_ticker else tx.asset_id
-        if not key:
-            continue
-        groups.setdefault(key, []).append(tx)
-
-    # Fetch dividends if ticker-based
-    dividends_by_ticker: dict[str, float] = {}
+    # Dividends joined in the same round trip (ticker-based classes only)
     if use_ticker:
-        div_result = await db.execute(
+        dividends = (
             select(Dividend.ticker, func.sum(Dividend.value).label("total"))
             .where(Dividend.user_id == user.id)
             .group_by(Dividend.ticker)
+            .subquery()
+        )
+        stmt = select(per_asset, dividends.c.total.label("total_dividends")).outerjoin(
+            dividends, dividends.c.ticker == per_asset.c.key
         )
-        for row in div_result:
-            dividends_by_ticker[row.ticker] = row.total or 0
+    else:
+        stmt = select(per_asset, literal(0).label("total_dividends"))
 
-    # Build metrics per asset
     metrics = {}
-    for key, txs in groups.items():
-        total_cost = 0.0
-        total_proceeds = 0.0
-        total_bought_qty = 0.0
-        total_sold_qty = 0.0
-        total_fees = 0.0
-        first_buy_date = None
-        last_sell_date = None
-
-        for tx in txs:
-            op = tx.operation_type
-            if op in buy_ops:
-                if use_ticker:
-                    qty = tx.qty or 0
-                    price = tx.unit_price or 0
-                    total_cost += qty * price
-                    total_bought_qty += qty
-                else:
-                    total_cost += tx.total_value or 0
-                    total_bought_qty += tx.total_value or 0
-                if not first_buy_date:
-                    first_buy_date = str(tx.date)
-            elif op in sell_ops:
-                if use_ticker:
-                    qty = tx.qty or 0
-                    price = tx.unit_price or 0
-                    total_proceeds += qty * price
-                    total_sold_qty += qty
-                else:
-                    total_proceeds += tx.total_value or 0
-                    total_sold_qty += tx.total_value or 0
-                last_sell_date = str(tx.date)
-
-            total_fees += tx.fees or 0
-
-        # Compute derived values
+    for row in (await db.execute(stmt)).all():
+        total_cost = float(row.total_cost)
+        total_proceeds = float(row.total_proceeds)
+        total_bought_qty = float(row.total_bought_qty)
+        total_sold_qty = float(row.total_sold_qty)
         avg_buy_price = (total_cost / total_bought_qty) if total_bought_qty else 0
         avg_sell_price = (total_proceeds / total_sold_qty) if total_sold_qty else 0
 
-        # Time held
         time_held_days = 0
-        if first_buy_date and last_sell_date:
-            from datetime import date as dt_date
-            d1 = dt_date.fromisoformat(first_buy_date)
-            d2 = dt_date.fromisoformat(last_sell_date)
-            time_held_days = (d2 - d1).days
+        if row.first_buy_date and row.last_sell_date:
+            time_held_days = (row.last_sell_date - row.first_buy_date).days
 
-        metrics[key] = {
+        metrics[row.key] = {
             "total_cost": round(total_cost, 2),
             "total_proceeds": round(total_proceeds, 2),
             "avg_buy_price": round(avg_buy_price, 2),
             "avg_sell_price": round(avg_sell_price, 2),
             "total_bought_qty": total_bought_qty,
             "total_sold_qty": total_sold_qty,
-            "first_buy_date": first_buy_date,
-            "last_sell_date": last_sell_date,
+            "first_buy_date": str(row.first_buy_date) if row.first_buy_date else None,
+            "last_sell_date": str(row.last_sell_date) if row.last_sell_date else None,
             "time_held_days": time_held_days,
-            "total_fees": round(total_fees, 2),
-            "total_dividends": round(dividends_by_ticker.get(key, 0), 2) if use_ticker else 0,
+            "total_fees": round(float(row.total_fees), 2),
+            "total_dividends": round(row.total_dividends or 0, 2),
         }
 
     return metrics
@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
 from ..database import get_db
 from ..models.dividend import Dividend
 from ..models.user import User
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/api/dividends", tags=["dividends"])
 
 @router.get("", response_model=list[DividendRead])
 async def list_dividends(
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_versioned_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
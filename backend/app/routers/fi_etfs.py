@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
 from ..database import get_db
 from ..models.fi_etf import FiEtf
 from ..models.user import User
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/api/fi-etfs", tags=["fi-etfs"])
 
 @router.get("", response_model=list[FiEtfRead])
 async def list_fi_etfs(
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_versioned_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
+from ..core import user_cache
 from ..database import get_db
 from ..models.fixed_income import FixedIncome
 from ..models.user import User
-from ..schemas.fixed_income import FixedIncomeCreate, FixedIncomeUpdate, FixedIncomeRead
+from ..schemas.fixed_income import (
+    FixedIncomeCreate, FixedIncomeUpdate, FixedIncomeRead, FixedIncomeValuationRead,
+)
+from ..services.fixed_income_valuation import value_portfolio
+from ..services.fixed_income_series import FREQUENCIES, build_series, cache_key
 
 router = APIRouter(prefix="/api/fixed-income", tags=["fixed-income"])
 
 
 @router.get("", response_model=list[FixedIncomeRead])
 async def list_fixed_income(
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_versioned_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
@@ -36,10 +44,56 @@ async def create_fixed_income(
     obj = FixedIncome(**data.model_dump(), user_id=user.id)
     db.add(obj)
     await db.commit()
+    user_cache.invalidate_user(user.id)
     await db.refresh(obj)
     return obj
 
 
+@router.get("/valuation", response_model=FixedIncomeValuationRead)
+async def get_valuation(
+    as_of: datetime.date | None = Query(None, description="Valuation date (default today)"),
+    include_closed: bool = Query(False),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(FixedIncome).where(FixedIncome.user_id == user.id)
+    if not include_closed:
+        query = query.where(FixedIncome.is_closed.is_(False))
+    result = await db.execute(query.order_by(FixedIncome.maturity_date))
+    try:
+        return await value_portfolio(db, result.scalars().all(), as_of)
+    except Exception as e:
+        raise HTTPException(502, f"Failed to value fixed income: {e}")
+
+
+@router.get("/series")
+async def get_series(
+    exclude: str = Query("", description="Comma-separated bond ids left out of the quota history"),
+    freq: str = Query("daily", description="daily, weekly or monthly"),
+    bonds: bool = Query(False, description="Include per-bond return series"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if freq not in FREQUENCIES:
+        raise HTTPException(400, f"freq must be one of: {', '.join(FREQUENCIES)}")
+    excluded = [i.strip() for i in exclude.split(",") if i.strip()]
+    key = cache_key(excluded, freq, bonds)
+    cached = user_cache.get(user.id, "fixed-income-series", key)
+    if cached is not None:
+        return cached
+
+    result = await db.execute(
+        select(FixedIncome)
+        .where(FixedIncome.user_id == user.id, FixedIncome.is_closed.is_(False))
+    )
+    try:
+        data = await build_series(db, result.scalars().all(), excluded, freq, bonds)
+    except Exception as e:
+        raise HTTPException(502, f"Failed to build fixed income series: {e}")
+    user_cache.set(user.id, "fixed-income-series", key, data)
+    return data
+
+
 @router.get("/{item_id}", response_model=FixedIncomeRead)
 async def get_fixed_income(
     item_id: str,
@@ -65,6 +119,7 @@ async def update_fixed_income(
     for key, val in data.model_dump().items():
         setattr(obj, key, val)
     await db.commit()
+    user_cache.invalidate_user(user.id)
     await db.refresh(obj)
     return obj
 
@@ -80,3 +135,4 @@ async def delete_fixed_income(
         raise HTTPException(404, f"ID {item_id} not found")
     await db.delete(obj)
     await db.commit()
+    user_cache.invalidate_user(user.id)
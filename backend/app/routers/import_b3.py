@@ -4,11 +4,10 @@ import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from openpyxl import load_workbook
-from io import BytesIO
 
 from ..database import get_db
 from ..core.security import get_current_user
+from ..core import user_cache
 from ..models.user import User
 from ..models.transaction import Transaction
 from ..models.br_stock import BrStock
@@ -21,8 +20,9 @@ from ..schemas.import_b3 import (
     ImportConfirmRequest,
     ImportConfirmResponse,
 )
+from ..services.xlsx_upload import parse_upload
 from ..services.yahoo import fetch_asset_info
-from .transactions import _apply
+from ..services.ledger import MODEL_MAP, lock_assets, record_transaction
 
 router = APIRouter(prefix="/api/import/b3", tags=["import-b3"])
 
@@ -116,6 +116,58 @@ def _parse_date(val) -> datetime.date:
     raise ValueError(f"Cannot parse date: {val}")
 
 
+def _parse_row(row: tuple) -> ImportedRow | None:
+    """One negociacao row, or None for blank and undated rows."""
+    # Skip empty rows
+    if not row[0]:
+        return None
+
+    date_val, tipo, mercado, _prazo, instituicao, codigo, qtd, preco, valor = row[:9]
+
+    try:
+        date = _parse_date(date_val)
+    except ValueError:
+        return None
+
+    market = str(mercado or "").strip()
+    ticker_raw = str(codigo or "").strip().upper()
+    broker = _abbreviate_broker(str(instituicao or ""))
+
+    # Skip options
+    if market in OPTION_MARKETS:
+        return ImportedRow(
+            date=date,
+            operation_type=str(tipo).lower().strip(),
+            market=market,
+            asset_class="br_stock",
+            ticker=ticker_raw,
+            qty=int(qtd or 0),
+            unit_price=float(preco or 0),
+            total_value=float(valor or 0),
+            broker=broker,
+            asset_name=ticker_raw,
+            is_skipped=True,
+            skip_reason=f"Opcao: {market}",
+        )
+
+    # Classify ticker
+    asset_class, clean_ticker = _classify_ticker(ticker_raw, market)
+    operation = "compra" if str(tipo).strip().lower() == "compra" else "venda"
+
+    return ImportedRow(
+        date=date,
+        operation_type=operation,
+        market=market,
+        asset_class=asset_class,
+        ticker=clean_ticker,
+        qty=int(qtd or 0),
+        unit_price=round(float(preco or 0), 2),
+        total_value=round(float(valor or 0), 2),
+        broker=broker,
+        asset_name=clean_ticker,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Preview endpoint
 # ---------------------------------------------------------------------------
@@ -129,69 +181,7 @@ async def preview_b3(
     if not file.filename.endswith((".xlsx", ".xls")):
         raise HTTPException(400, "Arquivo deve ser .xlsx")
 
-    content = await file.read()
-    wb = load_workbook(BytesIO(content), data_only=True)
-    ws = wb.active
-
-    rows_data: list[ImportedRow] = []
-    header_skipped = False
-
-    for row in ws.iter_rows(values_only=True):
-        if not header_skipped:
-            header_skipped = True
-            continue
-
-        # Skip empty rows
-        if not row[0]:
-            continue
-
-        date_val, tipo, mercado, _prazo, instituicao, codigo, qtd, preco, valor = row
-
-        try:
-            date = _parse_date(date_val)
-        except ValueError:
-            continue
-
-        market = str(mercado or "").strip()
-        ticker_raw = str(codigo or "").strip().upper()
-        broker = _abbreviate_broker(str(instituicao or ""))
-
-        # Skip options
-        if market in OPTION_MARKETS:
-            rows_data.append(ImportedRow(
-                date=date,
-                operation_type=str(tipo).lower().strip(),
-                market=market,
-                asset_class="br_stock",
-                ticker=ticker_raw,
-                qty=int(qtd or 0),
-                unit_price=float(preco or 0),
-                total_value=float(valor or 0),
-                broker=broker,
-                asset_name=ticker_raw,
-                is_skipped=True,
-                skip_reason=f"Opcao: {market}",
-            ))
-            continue
-
-        # Classify ticker
-        asset_class, clean_ticker = _classify_ticker(ticker_raw, market)
-        operation = "compra" if str(tipo).strip().lower() == "compra" else "venda"
-
-        rows_data.append(ImportedRow(
-            date=date,
-            operation_type=operation,
-            market=market,
-            asset_class=asset_class,
-            ticker=clean_ticker,
-            qty=int(qtd or 0),
-            unit_price=round(float(preco or 0), 2),
-            total_value=round(float(valor or 0), 2),
-            broker=broker,
-            asset_name=clean_ticker,
-        ))
-
-    wb.close()
+    rows_data: list[ImportedRow] = await parse_upload(file, _parse_row, min_columns=9)
 
     # --- Check duplicates against existing transactions ---
     result = await db.execute(select(Transaction).where(Transaction.user_id == user.id))
@@ -299,6 +289,13 @@ async def confirm_b3(
         except Exception:
             pass  # Fallback: will use "A classificar"
 
+    # Lock the existing positions up front, in key order; rows of an unknown
+    # class fail on their own below
+    await lock_assets(db, user.id, [
+        (row.asset_class, row.ticker.upper()) for row in sorted_rows
+        if row.asset_class in MODEL_MAP
+    ])
+
     for row in sorted_rows:
         try:
             # Auto-create asset if missing
@@ -367,13 +364,14 @@ async def confirm_b3(
             await db.flush()
 
             # Apply position changes
-            await _apply(db, tx, user.id)
+            await record_transaction(db, tx, user.id)
             created_count += 1
 
         except Exception as e:
             errors.append(f"{row.ticker} ({row.date}): {str(e)}")
 
     await db.commit()
+    user_cache.invalidate_user(user.id)
 
     return ImportConfirmResponse(
         created=created_count,
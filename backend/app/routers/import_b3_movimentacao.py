@@ -5,12 +5,11 @@ import unicodedata
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from openpyxl import load_workbook
-from io import BytesIO
 from pydantic import BaseModel
 
 from ..database import get_db
 from ..core.security import get_current_user
+from ..core import user_cache
 from ..models.user import User
 from ..models.transaction import Transaction
 from ..models.dividend import Dividend
@@ -18,8 +17,9 @@ from ..models.fixed_income import FixedIncome
 from ..models.br_stock import BrStock
 from ..models.fii import Fii
 from ..models.fi_etf import FiEtf
+from ..services.xlsx_upload import parse_upload
 from ..services.yahoo import fetch_asset_info
-from .transactions import _apply
+from ..services.ledger import lock_assets, record_transaction
 from .import_b3 import _classify_ticker, _abbreviate_broker, _parse_date
 
 router = APIRouter(prefix="/api/import/b3-mov", tags=["import-b3-mov"])
@@ -265,99 +265,33 @@ def _categorize_row(direction: str, movement_type: str, product: str) -> tuple[s
     return "ignorado", "ignorado"
 
 
-# ---------------------------------------------------------------------------
-# Preview endpoint
-# ---------------------------------------------------------------------------
-
-
-@router.post("/preview", response_model=MovPreviewResponse)
-async def preview_b3_mov(
-    file: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
-):
-    if not file.filename.endswith((".xlsx", ".xls")):
-        raise HTTPException(400, "Arquivo deve ser .xlsx")
-
-    content = await file.read()
-    wb = load_workbook(BytesIO(content), data_only=True)
-
-    # Try to find Movimentacao sheet
-    ws = None
-    for name in wb.sheetnames:
-        if "movimenta" in name.lower():
-            ws = wb[name]
-            break
-    if ws is None:
-        ws = wb.active
-
-    rows_data: list[MovRow] = []
-    header_skipped = False
-
-    for row in ws.iter_rows(values_only=True):
-        if not header_skipped:
-            header_skipped = True
-            continue
-
-        # Skip empty rows
-        if not row or not row[0]:
-            continue
-
-        # Columns: Entrada/Saida, Data, Movimentacao, Produto, Instituicao, Quantidade, Preco unitario, Valor da Operacao
-        if len(row) < 8:
-            continue
-
-        direction_val, date_val, mov_type_val, product_val, institution_val, qty_val, price_val, total_val = row[:8]
-
-        direction = str(direction_val or "").strip()
-        movement_type = str(mov_type_val or "").strip()
-        product = str(product_val or "").strip()
-        institution = _abbreviate_broker(str(institution_val or ""))
-
-        try:
-            date = _parse_date(date_val)
-        except (ValueError, Exception):
-            continue
-
-        qty = _parse_number(qty_val)
-        unit_price = _parse_number(price_val)
-        total_value = _parse_number(total_val)
-
-        # Check if should skip
-        skip_reason = _should_skip(movement_type, product)
-        if skip_reason:
-            rows_data.append(MovRow(
-                date=date.isoformat(),
-                direction=direction,
-                movement_type=movement_type,
-                product=product,
-                institution=institution,
-                qty=qty,
-                unit_price=unit_price,
-                total_value=total_value,
-                category="ignorado",
-                import_as="ignorado",
-                asset_name=product,
-                is_skipped=True,
-                skip_reason=skip_reason,
-            ))
-            continue
+def _parse_row(row: tuple) -> MovRow | None:
+    """One movimentacao row, or None for blank and undated rows."""
+    # Skip empty rows
+    if not row or not row[0]:
+        return None
 
-        # Categorize
-        category, import_as = _categorize_row(direction, movement_type, product)
+    # Columns: Entrada/Saida, Data, Movimentacao, Produto, Instituicao, Quantidade, Preco unitario, Valor da Operacao
+    direction_val, date_val, mov_type_val, product_val, institution_val, qty_val, price_val, total_val = row[:8]
 
-        # Extract ticker/asset info
-        info = _extract_ticker_from_product(product)
+    direction = str(direction_val or "").strip()
+    movement_type = str(mov_type_val or "").strip()
+    product = str(product_val or "").strip()
+    institution = _abbreviate_broker(str(institution_val or ""))
 
-        # For renda fixa operations, ensure asset_class is fixed_income
-        if category == "renda_fixa" and not info["rf_type"]:
-            # Try to detect from product
-            info["asset_class"] = "fixed_income"
+    try:
+        date = _parse_date(date_val)
+    except (ValueError, Exception):
+        return None
 
-        # For proventos, if we have a ticker, look up asset class
-        # For events, same
+    qty = _parse_number(qty_val)
+    unit_price = _parse_number(price_val)
+    total_value = _parse_number(total_val)
 
-        rows_data.append(MovRow(
+    # Check if should skip
+    skip_reason = _should_skip(movement_type, product)
+    if skip_reason:
+        return MovRow(
             date=date.isoformat(),
             direction=direction,
             movement_type=movement_type,
@@ -366,18 +300,63 @@ async def preview_b3_mov(
             qty=qty,
             unit_price=unit_price,
             total_value=total_value,
-            category=category,
-            import_as=import_as,
-            ticker=info["ticker"],
-            asset_name=info["asset_name"],
-            asset_class=info["asset_class"],
-            rf_type=info["rf_type"],
-            rf_code=info["rf_code"],
-            is_skipped=(category == "ignorado"),
-            skip_reason="Tipo nao suportado" if category == "ignorado" else None,
-        ))
+            category="ignorado",
+            import_as="ignorado",
+            asset_name=product,
+            is_skipped=True,
+            skip_reason=skip_reason,
+        )
+
+    # Categorize
+    category, import_as = _categorize_row(direction, movement_type, product)
+
+    # Extract ticker/asset info
+    info = _extract_ticker_from_product(product)
+
+    # For renda fixa operations, ensure asset_class is fixed_income
+    if category == "renda_fixa" and not info["rf_type"]:
+        # Try to detect from product
+        info["asset_class"] = "fixed_income"
+
+    # For proventos, if we have a ticker, look up asset class
+    # For events, same
+
+    return MovRow(
+        date=date.isoformat(),
+        direction=direction,
+        movement_type=movement_type,
+        product=product,
+        institution=institution,
+        qty=qty,
+        unit_price=unit_price,
+        total_value=total_value,
+        category=category,
+        import_as=import_as,
+        ticker=info["ticker"],
+        asset_name=info["asset_name"],
+        asset_class=info["asset_class"],
+        rf_type=info["rf_type"],
+        rf_code=info["rf_code"],
+        is_skipped=(category == "ignorado"),
+        skip_reason="Tipo nao suportado" if category == "ignorado" else None,
+    )
+
 
-    wb.close()
+# ---------------------------------------------------------------------------
+# Preview endpoint
+# ---------------------------------------------------------------------------
+
+
+@router.post("/preview", response_model=MovPreviewResponse)
+async def preview_b3_mov(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    if not file.filename.endswith((".xlsx", ".xls")):
+        raise HTTPException(400, "Arquivo deve ser .xlsx")
+
+    rows_data: list[MovRow] = await parse_upload(file, _parse_row, sheet_hint="movimenta", min_columns=8)
 
     # --- Duplicate detection ---
 
@@ -520,6 +499,13 @@ async def confirm_b3_mov(
         except Exception:
             pass  # Fallback: will use "A classificar"
 
+    # Lock the existing positions up front, in key order
+    await lock_assets(db, user.id, [
+        *(("fixed_income", row.rf_code[:36]) for row in sorted_rows if row.rf_code),
+        *((row.asset_class, row.ticker.upper()) for row in sorted_rows
+          if row.ticker and row.asset_class in asset_sets),
+    ])
+
     for row in sorted_rows:
         try:
             date = datetime.date.fromisoformat(row.date)
@@ -578,7 +564,7 @@ async def confirm_b3_mov(
                 )
                 db.add(tx)
                 await db.flush()
-                await _apply(db, tx, user.id)
+                await record_transaction(db, tx, user.id)
                 transactions_created += 1
 
             # --- Renda Fixa vencimento / resgate ---
@@ -604,7 +590,7 @@ async def confirm_b3_mov(
 
                 # For resgate with a known value, set current_value to the
                 # actual redemption amount so the return shows correctly
-                # (the standard _apply subtracts, which produces wrong results
+                # (the ledger subtracts, which produces wrong results
                 # when the rate is unknown and current_value == applied_value).
                 asset = await db.get(FixedIncome, row.rf_code[:36]) if row.rf_code else None
                 if asset and tv > 0 and asset.contracted_rate == 0:
@@ -614,9 +600,9 @@ async def confirm_b3_mov(
                 elif asset and tv == 0 and row.import_as == "vencimento_rf":
                     # Vencimento with no value reported: update maturity date
                     asset.maturity_date = date
-                    # Don't call _apply (total=0 wouldn't change anything)
+                    # Don't record the resgate (total=0 wouldn't change anything)
                 else:
-                    await _apply(db, tx, user.id)
+                    await record_transaction(db, tx, user.id)
 
                 transactions_created += 1
 
@@ -685,7 +671,7 @@ async def confirm_b3_mov(
                     )
                     db.add(tx)
                     await db.flush()
-                    await _apply(db, tx, user.id)
+                    await record_transaction(db, tx, user.id)
                     transactions_created += 1
 
             # --- Venda (Tesouro or stocks) ---
@@ -717,7 +703,7 @@ async def confirm_b3_mov(
                         asset.current_value = tv
                         asset.maturity_date = date
                     else:
-                        await _apply(db, tx, user.id)
+                        await record_transaction(db, tx, user.id)
 
                     transactions_created += 1
                 elif row.ticker and row.asset_class:
@@ -770,13 +756,14 @@ async def confirm_b3_mov(
                     )
                     db.add(tx)
                     await db.flush()
-                    await _apply(db, tx, user.id)
+                    await record_transaction(db, tx, user.id)
                     transactions_created += 1
 
         except Exception as e:
             errors.append(f"{row.product} ({row.date}): {str(e)}")
 
     await db.commit()
+    user_cache.invalidate_user(user.id)
 
     return MovConfirmResponse(
         dividends_created=dividends_created,
@@ -10,6 +10,7 @@ from pydantic import BaseModel
 
 from ..database import get_db
 from ..core.security import get_current_user
+from ..core import user_cache
 from ..models.user import User
 from ..models.transaction import Transaction
 from ..models.br_stock import BrStock
@@ -20,7 +21,7 @@ from ..models.fi_etf import FiEtf
 from ..models.cash_account import CashAccount
 from ..models.real_asset import RealAsset
 from ..services.yahoo import fetch_asset_info
-from .transactions import _apply
+from ..services.ledger import asset_ref, lock_assets, record_transaction
 
 router = APIRouter(prefix="/api/import/backup", tags=["import-backup"])
 
@@ -327,6 +328,9 @@ async def confirm_backup(
     except Exception:
         pass  # Fallback: will use "A classificar"
 
+    # Lock the existing positions up front, in key order
+    await lock_assets(db, user.id, [asset_ref(row) for row in sorted_rows])
+
     # Track newly-assigned IDs so transactions reference the right asset
     id_remap: dict[str, str] = {}
 
@@ -388,13 +392,14 @@ async def confirm_backup(
             await db.flush()
 
             # Apply position changes
-            await _apply(db, tx, user.id)
+            await record_transaction(db, tx, user.id)
             created_count += 1
 
         except Exception as e:
             errors.append(f"{row.ticker or row.asset_name} ({row.date}): {str(e)}")
 
     await db.commit()
+    user_cache.invalidate_user(user.id)
 
     return BackupConfirmResponse(
         created=created_count,
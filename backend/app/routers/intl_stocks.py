@@ -3,6 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
 from ..database import get_db
 from ..models.intl_stock import IntlStock
 from ..models.user import User
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/api/intl-stocks", tags=["intl-stocks"])
 
 @router.get("", response_model=list[IntlStockRead])
 async def list_intl_stocks(
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_versioned_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
@@ -1,3 +1,5 @@
+import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -7,9 +9,13 @@ from ..models.user import User
 from ..models.br_stock import BrStock
 from ..models.fii import Fii
 from ..models.intl_stock import IntlStock
-from ..services.yahoo import fetch_quotes, fetch_asset_info, fetch_fundamentals
-from ..services.bcb import fetch_exchange_rate, fetch_selic, fetch_cdi, fetch_ipca, fetch_historical_series
-from ..core.security import get_current_user
+from ..services.yahoo import fetch_quotes, fetch_asset_info, quote_cache_stats, inflight_stats, _yahoo_symbol
+from ..services.price_history import get_price_matrix, PRICE_FIELDS
+from ..services.fundamentals_store import get_fundamentals as get_stored_fundamentals
+from ..services.price_sync import sync_prices
+from ..services.bcb import fetch_exchange_rate, fetch_indicators, latest_cache_stats
+from ..services.bcb_store import get_series, parse_bcb_date
+from ..core.security import get_current_user, require_admin
 
 router = APIRouter(prefix="/api/market-data", tags=["market-data"])
 
@@ -38,6 +44,25 @@ async def get_intl_quotes(tickers: str = Query(..., description="Comma-separated
         raise HTTPException(502, f"Failed to fetch intl quotes: {e}")
 
 
+@router.get("/cache-stats")
+async def get_cache_stats(admin: User = Depends(require_admin)):
+    """Hit/miss counters for the shared market data caches."""
+    return {
+        "quotes": quote_cache_stats(),
+        "in_flight": inflight_stats(),
+        "bcb_latest": latest_cache_stats(),
+    }
+
+
+@router.post("/sync-prices")
+async def run_price_sync(admin: User = Depends(require_admin), db: AsyncSession = Depends(get_db)):
+    """Write current prices to every holder of every ticker now."""
+    try:
+        return await sync_prices(db)
+    except Exception as e:
+        raise HTTPException(502, f"Failed to sync prices: {e}")
+
+
 @router.get("/exchange-rate")
 async def get_exchange_rate(user: User = Depends(get_current_user)):
     try:
@@ -49,13 +74,7 @@ async def get_exchange_rate(user: User = Depends(get_current_user)):
 
 @router.get("/indicators")
 async def get_indicators(user: User = Depends(get_current_user)):
-    errors = {}
-    result = {}
-    for name, fn in [("selic", fetch_selic), ("cdi", fetch_cdi), ("ipca", fetch_ipca)]:
-        try:
-            result[name] = await fn()
-        except Exception as e:
-            errors[name] = str(e)
+    result, errors = await fetch_indicators()
     if errors:
         result["errors"] = errors
     return result
@@ -122,24 +141,57 @@ async def get_fundamentals(
     tickers: str = Query(..., description="Comma-separated tickers"),
     market: str = Query("br", description="Market: 'br' (adds .SA suffix) or 'intl'"),
     user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     ticker_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
     if not ticker_list:
         raise HTTPException(400, "No tickers provided")
     suffix = ".SA" if market == "br" else ""
     try:
-        result = await fetch_fundamentals(ticker_list, suffix=suffix)
+        result = await get_stored_fundamentals(db, ticker_list, suffix=suffix)
         return {"results": result}
     except Exception as e:
         raise HTTPException(502, f"Failed to fetch fundamentals: {e}")
 
 
+@router.get("/history")
+async def get_price_history(
+    tickers: str = Query(..., description="Comma-separated tickers"),
+    start: datetime.date = Query(..., description="Start date YYYY-MM-DD"),
+    end: datetime.date = Query(..., description="End date YYYY-MM-DD"),
+    market: str = Query("br", description="Market: 'br' (adds .SA suffix) or 'intl'"),
+    field: str = Query("close", description="open, high, low, close, adj_close or volume"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Daily prices for many tickers aligned on one date axis (closed sessions only)."""
+    ticker_list = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not ticker_list:
+        raise HTTPException(400, "No tickers provided")
+    if len(ticker_list) > 50:
+        raise HTTPException(400, "At most 50 tickers per request")
+    if start > end:
+        raise HTTPException(400, "start must be before end")
+    if field not in PRICE_FIELDS:
+        raise HTTPException(400, f"Invalid field: {field}")
+    suffix = ".SA" if market == "br" else ""
+    symbols = {_yahoo_symbol(t, suffix): t for t in ticker_list}
+    try:
+        matrix = await get_price_matrix(db, list(symbols), start, end, field=field)
+    except Exception as e:
+        raise HTTPException(502, f"Failed to fetch price history: {e}")
+    data = matrix.to_dict()
+    data["series"] = {symbols[s]: v for s, v in data["series"].items()}
+    return data
+
+
 @router.get("/historical-rates")
 async def get_historical_rates(
     series: str = Query(..., description="Comma-separated BCB series codes (e.g. 12,433,11)"),
     start: str = Query(..., description="Start date DD/MM/YYYY"),
     end: str = Query(..., description="End date DD/MM/YYYY"),
     user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     codes = []
     for s in series.split(","):
@@ -150,7 +202,11 @@ async def get_historical_rates(
     if not codes:
         raise HTTPException(400, "No series codes provided")
     try:
-        data = await fetch_historical_series(codes, start, end)
+        start_date, end_date = parse_bcb_date(start), parse_bcb_date(end)
+    except ValueError:
+        raise HTTPException(400, "Dates must be DD/MM/YYYY")
+    try:
+        data = await get_series(db, codes, start_date, end_date)
         return {str(k): v for k, v in data.items()}
     except Exception as e:
         raise HTTPException(502, f"Failed to fetch historical rates: {e}")
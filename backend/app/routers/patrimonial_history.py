@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
 from ..database import get_db
 from ..models.patrimonial_history import PatrimonialHistory
 from ..models.user import User
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/api/patrimonial-history", tags=["patrimonial-history
 
 @router.get("", response_model=list[PatrimonialHistoryRead])
 async def list_history(
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_versioned_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
@@ -23,7 +23,9 @@ from ..models.patrimonial_history import PatrimonialHistory
 from ..models.watchlist import WatchlistItem
 from ..models.allocation_target import AllocationTarget
 from ..models.accumulation_goal import AccumulationGoal
+from ..models.position_checkpoint import PositionCheckpoint
 from ..core.security import get_current_user
+from ..core import user_cache
 
 router = APIRouter(prefix="/api/portfolio", tags=["portfolio"])
 
@@ -103,7 +105,7 @@ async def export_transactions(user: User = Depends(get_current_user), db: AsyncS
 
 # All tables to clear during a full portfolio reset (user-scoped)
 ALL_MODELS = [
-    Transaction, Dividend, PatrimonialHistory,
+    PositionCheckpoint, Transaction, Dividend, PatrimonialHistory,
     WatchlistItem, AllocationTarget, AccumulationGoal,
     BrStock, Fii, IntlStock, FixedIncome, FiEtf, CashAccount, RealAsset,
 ]
@@ -124,5 +126,6 @@ async def reset_portfolio(user: User = Depends(get_current_user), db: AsyncSessi
         total += c
 
     await db.commit()
+    user_cache.invalidate_user(user.id)
 
     return {"deleted": counts, "total": total}
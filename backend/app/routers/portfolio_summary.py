@@ -0,0 +1,101 @@
+"""Single-request dashboard reads: allocation summary and full snapshot."""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..models.user import User
+from ..models.br_stock import BrStock
+from ..models.fii import Fii
+from ..models.intl_stock import IntlStock
+from ..models.fixed_income import FixedIncome
+from ..models.real_asset import RealAsset
+from ..models.fi_etf import FiEtf
+from ..models.cash_account import CashAccount
+from ..models.dividend import Dividend
+from ..models.watchlist import WatchlistItem
+from ..models.allocation_target import AllocationTarget
+from ..models.accumulation_goal import AccumulationGoal
+from ..models.patrimonial_history import PatrimonialHistory
+from ..models.transaction import Transaction
+from ..schemas.br_stock import BrStockRead
+from ..schemas.fii import FiiRead
+from ..schemas.intl_stock import IntlStockRead
+from ..schemas.fixed_income import FixedIncomeRead
+from ..schemas.real_asset import RealAssetRead
+from ..schemas.fi_etf import FiEtfRead
+from ..schemas.cash_account import CashAccountRead
+from ..schemas.dividend import DividendRead
+from ..schemas.watchlist import WatchlistRead
+from ..schemas.allocation_target import AllocationTargetRead
+from ..schemas.accumulation_goal import AccumulationGoalRead
+from ..schemas.patrimonial_history import PatrimonialHistoryRead
+from ..schemas.transaction import TransactionRead
+from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
+from ..core import user_cache
+from ..services.bcb import fetch_exchange_rate
+from ..services.portfolio_summary import FALLBACK_EXCHANGE_RATE, load_totals, summarize
+
+router = APIRouter(prefix="/api/portfolio", tags=["portfolio"])
+
+# Snapshot key -> (model, read schema, ordering of the matching list endpoint)
+SNAPSHOT_LISTS = {
+    "br_stocks": (BrStock, BrStockRead, (BrStock.ticker,)),
+    "fiis": (Fii, FiiRead, (Fii.ticker,)),
+    "intl_stocks": (IntlStock, IntlStockRead, (IntlStock.ticker,)),
+    "fixed_income": (FixedIncome, FixedIncomeRead, (FixedIncome.maturity_date,)),
+    "real_assets": (RealAsset, RealAssetRead, (RealAsset.acquisition_date,)),
+    "fi_etfs": (FiEtf, FiEtfRead, (FiEtf.ticker,)),
+    "cash_accounts": (CashAccount, CashAccountRead, (CashAccount.name,)),
+    "dividends": (Dividend, DividendRead, (Dividend.date.desc(),)),
+    "watchlist": (WatchlistItem, WatchlistRead, (WatchlistItem.ticker,)),
+    "allocation_targets": (AllocationTarget, AllocationTargetRead, (AllocationTarget.id,)),
+    "accumulation_goals": (AccumulationGoal, AccumulationGoalRead, (AccumulationGoal.id,)),
+    "patrimonial_history": (PatrimonialHistory, PatrimonialHistoryRead, (PatrimonialHistory.id,)),
+    "transactions": (Transaction, TransactionRead, (Transaction.date.desc(), Transaction.id.desc())),
+}
+
+
+@router.get("/summary")
+async def get_portfolio_summary(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Class totals, allocation percentages and deltas against the targets."""
+    raw = user_cache.get(user.id, "portfolio-summary")
+    if raw is None:
+        version = user_cache.data_version(user.id)
+        raw = await load_totals(db, user.id)
+        # Not cached if a write landed while reading
+        if user_cache.data_version(user.id) == version:
+            user_cache.set(user.id, "portfolio-summary", (), raw)
+    try:
+        rate, live = await fetch_exchange_rate(), True
+    except Exception:
+        rate, live = FALLBACK_EXCHANGE_RATE, False
+    return {**summarize(raw, rate), "exchange_rate_live": live}
+
+
+@router.get("/snapshot")
+async def get_portfolio_snapshot(
+    user: User = Depends(get_versioned_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Every entity list of the user in one response.
+
+    Carries the same ETag as the list endpoints, so an unchanged
+    portfolio costs a 304 and no entity query.
+    """
+    snapshot = user_cache.get(user.id, "portfolio-snapshot")
+    if snapshot is None:
+        version = user_cache.data_version(user.id)
+        snapshot = {}
+        for key, (model, schema, order) in SNAPSHOT_LISTS.items():
+            result = await db.execute(select(model).where(model.user_id == user.id).order_by(*order))
+            snapshot[key] = [schema.model_validate(obj).model_dump(mode="json") for obj in result.scalars().all()]
+        # Not cached if a write landed while reading (the ETag is already older)
+        if user_cache.data_version(user.id) == version:
+            user_cache.set(user.id, "portfolio-snapshot", (), snapshot)
+    return snapshot
@@ -0,0 +1,31 @@
+"""Realized P&L per asset and monthly tax (DARF) report."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..models.user import User
+from ..core.security import get_current_user
+from ..core import user_cache
+from ..services.realized_pnl import METHODS, build_report
+
+router = APIRouter(prefix="/api/realized-pnl", tags=["realized-pnl"])
+
+
+@router.get("")
+async def get_realized_pnl(
+    method: str = Query("average", description="Cost basis: average or fifo"),
+    year: int | None = Query(None, description="Only the months of this year"),
+    user: User = Depends(get_current_user),
+):
+    if method not in METHODS:
+        raise HTTPException(400, f"method must be one of: {', '.join(METHODS)}")
+    report = user_cache.get(user.id, "realized-pnl", method)
+    if report is None:
+        version = user_cache.data_version(user.id)
+        report = await build_report(user.id, method)
+        # Not cached if a write landed while the report was built
+        if user_cache.data_version(user.id) == version:
+            user_cache.set(user.id, "realized-pnl", method, report)
+    if year is not None:
+        prefix = f"{year}-"
+        report = {**report, "months": [m for m in report["months"] if m["month"].startswith(prefix)]}
+    return report
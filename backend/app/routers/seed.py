@@ -9,8 +9,10 @@ from ..models import (
     Dividend, WatchlistItem, AllocationTarget, AccumulationGoal,
     PatrimonialHistory, FiEtf, CashAccount, Transaction, User,
 )
-from ..core.security import hash_password, require_admin
-from ..routers.transactions import _apply
+from ..core.passwords import hash_password
+from ..core.security import require_admin
+from ..core import user_cache
+from ..services.ledger import record_transaction
 from ..seed.seed_data import (
     BR_STOCKS, FIIS, INTL_STOCKS, FIXED_INCOME, REAL_ASSETS,
     DIVIDENDS, WATCHLIST, ALLOCATION_TARGETS, ACCUMULATION_GOALS,
@@ -31,7 +33,7 @@ async def _create_admin(db: AsyncSession) -> User:
     admin = User(
         email=settings.admin_email,
         name="Administrador",
-        hashed_password=hash_password(settings.admin_password),
+        hashed_password=await hash_password(settings.admin_password),
         role="admin",
         is_active=True,
         email_verified=True,
@@ -80,7 +82,7 @@ async def run_seed(db: AsyncSession):
     for row in TRANSACTIONS:
         tx = Transaction(**row, user_id=admin_id)
         db.add(tx)
-        await _apply(db, tx, admin_id)
+        await record_transaction(db, tx, admin_id)
 
     # Post-transaction adjustments (fixed income current_value includes yield)
     for fi_id, adjustments in FIXED_INCOME_ADJUSTMENTS.items():
@@ -95,7 +97,7 @@ async def run_seed(db: AsyncSession):
 @router.post("/reset")
 async def reset_seed(admin: User = Depends(require_admin), db: AsyncSession = Depends(get_db)):
     tables = [
-        "transactions",
+        "position_checkpoints", "transactions",
         "patrimonial_history", "accumulation_goals", "allocation_targets",
         "watchlist", "dividends", "real_assets", "fixed_income",
         "fi_etfs", "cash_accounts",
@@ -140,7 +142,7 @@ async def reset_seed(admin: User = Depends(require_admin), db: AsyncSession = De
     for row in TRANSACTIONS:
         tx = Transaction(**row, user_id=admin_id)
         db.add(tx)
-        await _apply(db, tx, admin_id)
+        await record_transaction(db, tx, admin_id)
 
     for fi_id, adjustments in FIXED_INCOME_ADJUSTMENTS.items():
         asset = await db.get(FixedIncome, fi_id)
@@ -149,6 +151,7 @@ async def reset_seed(admin: User = Depends(require_admin), db: AsyncSession = De
                 setattr(asset, field, value)
 
     await db.commit()
+    user_cache.clear()
     return {"status": "ok", "message": "Database reset to seed data"}
 
 
@@ -1,253 +1,51 @@
+from types import SimpleNamespace
+
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config import settings
 from ..database import get_db
 from ..models.user import User
 from ..models.transaction import Transaction
-from ..models.br_stock import BrStock
-from ..models.fii import Fii
-from ..models.intl_stock import IntlStock
-from ..models.fixed_income import FixedIncome
-from ..models.real_asset import RealAsset
-from ..models.fi_etf import FiEtf
-from ..models.cash_account import CashAccount
-from ..schemas.transaction import TransactionCreate, TransactionRead, TransactionUpdate
+from ..schemas.transaction import (
+    TransactionCreate, TransactionRead, TransactionUpdate,
+    TransactionBulkRequest, TransactionBulkResponse, TransactionBulkResult,
+)
+from ..services.ledger import (
+    VALID_OPS, LedgerBatch, asset_ref, tx_key, ensure_opening, replay, record_transaction,
+)
 from ..core.security import get_current_user
+from ..core.etag import get_versioned_user
+from ..core import user_cache
+from ..core.db_retry import run_with_retry
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
+MAX_BULK_OPERATIONS = 5000
 
-# ---------------------------------------------------------------------------
-# Helpers: resolve the target asset from a transaction
-# ---------------------------------------------------------------------------
+# Transaction fields that decide which asset a transaction moves
+REF_FIELDS = ("asset_class", "operation_type", "ticker", "asset_id")
 
-MODEL_MAP = {
-    "br_stock": (BrStock, "ticker"),
-    "fii": (Fii, "ticker"),
-    "intl_stock": (IntlStock, "ticker"),
-    "fixed_income": (FixedIncome, "id"),
-    "real_asset": (RealAsset, "id"),
-    "fi_etf": (FiEtf, "ticker"),
-    "cash_account": (CashAccount, "id"),
-}
-
-VALID_OPS = {
-    "br_stock": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
-    "fii": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
-    "intl_stock": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
-    "fixed_income": {"aporte", "resgate", "transferencia"},
-    "real_asset": {"compra", "venda"},
-    "fi_etf": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
-    "cash_account": {"aporte", "resgate", "transferencia"},
-}
-
-
-async def _get_asset(db: AsyncSession, tx, user_id: str = None):
-    entry = MODEL_MAP.get(tx.asset_class)
-    if not entry:
-        return None
-    model, key_field = entry
-    if key_field == "ticker":
-        pk = tx.ticker
-        if not pk:
-            return None
-        # Composite PK: (user_id, ticker)
-        uid = user_id or getattr(tx, "user_id", None)
-        if uid:
-            return await db.get(model, (uid, pk.upper()))
-        return await db.get(model, pk.upper())
-    else:
-        pk = tx.asset_id
-        if not pk:
-            return None
-        return await db.get(model, pk)
 
+def _invalid_op(fields) -> str | None:
+    valid = VALID_OPS.get(fields.asset_class)
+    if valid and fields.operation_type not in valid:
+        return f"Invalid operation '{fields.operation_type}' for {fields.asset_class}"
+    return None
 
-# ---------------------------------------------------------------------------
-# Apply / revert position changes
-# ---------------------------------------------------------------------------
 
-async def _apply(db: AsyncSession, tx, user_id: str = None):
-    """Apply a transaction's effect on the underlying asset position."""
-    asset = await _get_asset(db, tx, user_id)
-    if not asset:
-        return
-
-    op = tx.operation_type
-    cls = tx.asset_class
-
-    if cls in ("br_stock", "fii", "fi_etf"):
-        if op == "compra":
-            old_qty = asset.qty or 0
-            old_avg = asset.avg_price or 0
-            new_qty = old_qty + (tx.qty or 0)
-            if new_qty > 0:
-                asset.avg_price = ((old_qty * old_avg) + ((tx.qty or 0) * (tx.unit_price or 0))) / new_qty
-            asset.qty = int(new_qty)
-        elif op == "venda":
-            asset.qty = int((asset.qty or 0) - (tx.qty or 0))
-        elif op == "transferencia":
-            if tx.broker_destination:
-                asset.broker = tx.broker_destination
-        elif op == "desdobramento":
-            factor = tx.qty or 1
-            asset.qty = int((asset.qty or 0) * factor)
-            if factor > 0:
-                asset.avg_price = (asset.avg_price or 0) / factor
-        elif op == "bonificacao":
-            old_qty = asset.qty or 0
-            old_avg = asset.avg_price or 0
-            bonus_qty = tx.qty or 0
-            new_qty = old_qty + bonus_qty
-            if new_qty > 0:
-                asset.avg_price = (old_qty * old_avg) / new_qty
-            asset.qty = int(new_qty)
-
-    elif cls == "intl_stock":
-        if op == "compra":
-            old_qty = asset.qty or 0
-            old_avg = asset.avg_price_usd or 0
-            new_qty = old_qty + (tx.qty or 0)
-            if new_qty > 0:
-                asset.avg_price_usd = ((old_qty * old_avg) + ((tx.qty or 0) * (tx.unit_price or 0))) / new_qty
-            asset.qty = int(new_qty)
-        elif op == "venda":
-            asset.qty = int((asset.qty or 0) - (tx.qty or 0))
-        elif op == "transferencia":
-            if tx.broker_destination:
-                asset.broker = tx.broker_destination
-        elif op == "desdobramento":
-            factor = tx.qty or 1
-            asset.qty = int((asset.qty or 0) * factor)
-            if factor > 0:
-                asset.avg_price_usd = (asset.avg_price_usd or 0) / factor
-        elif op == "bonificacao":
-            old_qty = asset.qty or 0
-            old_avg = asset.avg_price_usd or 0
-            bonus_qty = tx.qty or 0
-            new_qty = old_qty + bonus_qty
-            if new_qty > 0:
-                asset.avg_price_usd = (old_qty * old_avg) / new_qty
-            asset.qty = int(new_qty)
-
-    elif cls == "fixed_income":
-        if op == "aporte":
-            asset.applied_value = (asset.applied_value or 0) + (tx.total_value or 0)
-            asset.current_value = (asset.current_value or 0) + (tx.total_value or 0)
-        elif op == "resgate":
-            asset.current_value = (asset.current_value or 0) - (tx.total_value or 0)
-        elif op == "transferencia":
-            if tx.broker_destination:
-                asset.broker = tx.broker_destination
-
-    elif cls == "real_asset":
-        if op == "compra":
-            asset.estimated_value = (asset.estimated_value or 0) + (tx.total_value or 0)
-        elif op == "venda":
-            asset.estimated_value = (asset.estimated_value or 0) - (tx.total_value or 0)
-
-    elif cls == "cash_account":
-        if op == "aporte":
-            asset.balance = (asset.balance or 0) + (tx.total_value or 0)
-        elif op == "resgate":
-            asset.balance = (asset.balance or 0) - (tx.total_value or 0)
-        elif op == "transferencia":
-            if tx.broker_destination:
-                asset.institution = tx.broker_destination
-
-
-async def _revert(db: AsyncSession, tx, user_id: str = None):
-    """Revert a transaction's effect (inverse of _apply)."""
-    asset = await _get_asset(db, tx, user_id)
-    if not asset:
-        return
-
-    op = tx.operation_type
-    cls = tx.asset_class
-
-    if cls in ("br_stock", "fii", "fi_etf"):
-        if op == "compra":
-            cur_qty = asset.qty or 0
-            cur_avg = asset.avg_price or 0
-            tx_qty = tx.qty or 0
-            old_qty = cur_qty - tx_qty
-            if old_qty > 0:
-                asset.avg_price = ((cur_qty * cur_avg) - (tx_qty * (tx.unit_price or 0))) / old_qty
-            elif old_qty == 0:
-                asset.avg_price = 0
-            asset.qty = int(max(old_qty, 0))
-        elif op == "venda":
-            asset.qty = int((asset.qty or 0) + (tx.qty or 0))
-        elif op == "transferencia":
-            if tx.broker:
-                asset.broker = tx.broker
-        elif op == "desdobramento":
-            factor = tx.qty or 1
-            if factor > 0:
-                asset.qty = int((asset.qty or 0) / factor)
-                asset.avg_price = (asset.avg_price or 0) * factor
-        elif op == "bonificacao":
-            cur_qty = asset.qty or 0
-            bonus_qty = tx.qty or 0
-            old_qty = cur_qty - bonus_qty
-            if old_qty > 0:
-                asset.avg_price = ((asset.avg_price or 0) * cur_qty) / old_qty
-            asset.qty = int(max(old_qty, 0))
-
-    elif cls == "intl_stock":
-        if op == "compra":
-            cur_qty = asset.qty or 0
-            cur_avg = asset.avg_price_usd or 0
-            tx_qty = tx.qty or 0
-            old_qty = cur_qty - tx_qty
-            if old_qty > 0:
-                asset.avg_price_usd = ((cur_qty * cur_avg) - (tx_qty * (tx.unit_price or 0))) / old_qty
-            elif old_qty == 0:
-                asset.avg_price_usd = 0
-            asset.qty = int(max(old_qty, 0))
-        elif op == "venda":
-            asset.qty = int((asset.qty or 0) + (tx.qty or 0))
-        elif op == "transferencia":
-            if tx.broker:
-                asset.broker = tx.broker
-        elif op == "desdobramento":
-            factor = tx.qty or 1
-            if factor > 0:
-                asset.qty = int((asset.qty or 0) / factor)
-                asset.avg_price_usd = (asset.avg_price_usd or 0) * factor
-        elif op == "bonificacao":
-            cur_qty = asset.qty or 0
-            bonus_qty = tx.qty or 0
-            old_qty = cur_qty - bonus_qty
-            if old_qty > 0:
-                asset.avg_price_usd = ((asset.avg_price_usd or 0) * cur_qty) / old_qty
-            asset.qty = int(max(old_qty, 0))
-
-    elif cls == "fixed_income":
-        if op == "aporte":
-            asset.applied_value = (asset.applied_value or 0) - (tx.total_value or 0)
-            asset.current_value = (asset.current_value or 0) - (tx.total_value or 0)
-        elif op == "resgate":
-            asset.current_value = (asset.current_value or 0) + (tx.total_value or 0)
-        elif op == "transferencia":
-            if tx.broker:
-                asset.broker = tx.broker
-
-    elif cls == "real_asset":
-        if op == "compra":
-            asset.estimated_value = (asset.estimated_value or 0) - (tx.total_value or 0)
-        elif op == "venda":
-            asset.estimated_value = (asset.estimated_value or 0) + (tx.total_value or 0)
-
-    elif cls == "cash_account":
-        if op == "aporte":
-            asset.balance = (asset.balance or 0) - (tx.total_value or 0)
-        elif op == "resgate":
-            asset.balance = (asset.balance or 0) + (tx.total_value or 0)
-        elif op == "transferencia":
-            if tx.broker:
-                asset.institution = tx.broker
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+async def _get_locked(db: AsyncSession, user_id: str, transaction_id: int) -> Transaction:
+    """The user's transaction, locked FOR UPDATE (before any asset row)."""
+    obj = await db.get(Transaction, transaction_id, with_for_update=True)
+    if not obj or obj.user_id != user_id:
+        raise HTTPException(404, f"Transaction {transaction_id} not found")
+    return obj
 
 
 # ---------------------------------------------------------------------------
@@ -255,7 +53,7 @@ async def _revert(db: AsyncSession, tx, user_id: str = None):
 # ---------------------------------------------------------------------------
 
 @router.get("", response_model=list[TransactionRead])
-async def list_transactions(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def list_transactions(user: User = Depends(get_versioned_user), db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(Transaction)
         .where(Transaction.user_id == user.id)
@@ -269,14 +67,128 @@ async def create_transaction(data: TransactionCreate, user: User = Depends(get_c
     valid = VALID_OPS.get(data.asset_class)
     if valid and data.operation_type not in valid:
         raise HTTPException(422, f"Invalid operation '{data.operation_type}' for {data.asset_class}")
-    obj = Transaction(**data.model_dump(), user_id=user.id)
-    db.add(obj)
-    await _apply(db, obj, user.id)
-    await db.commit()
+
+    async def write():
+        obj = Transaction(**data.model_dump(), user_id=user.id)
+        db.add(obj)
+        await record_transaction(db, obj, user.id)
+        await db.commit()
+        return obj
+
+    obj = await run_with_retry(db, write, settings.ledger_write_attempts)
+    user_cache.invalidate_user(user.id)
     await db.refresh(obj)
     return obj
 
 
+@router.post("/bulk", response_model=TransactionBulkResponse)
+async def bulk_transactions(
+    data: TransactionBulkRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create, update and delete many transactions in one database transaction.
+
+    Invalid rows are reported in ``results`` and skipped; the valid ones
+    are written together and positions are replayed once per asset.
+    """
+    ops = data.operations
+    if len(ops) > MAX_BULK_OPERATIONS:
+        raise HTTPException(413, f"At most {MAX_BULK_OPERATIONS} operations per request")
+
+    response = await run_with_retry(db, lambda: _apply_bulk(db, user.id, ops), settings.ledger_write_attempts)
+    user_cache.invalidate_user(user.id)
+    return response
+
+
+async def _apply_bulk(db: AsyncSession, user_id: str, ops) -> TransactionBulkResponse:
+    results = [TransactionBulkResult(index=i, action=op.action, status="ok", id=op.id) for i, op in enumerate(ops)]
+
+    # Existing rows referenced by update/delete, in one query
+    ids = {op.id for op in ops if op.action != "create" and op.id is not None}
+    existing = {}
+    if ids:
+        # Locked before the assets, in the same order as single-row edits
+        result = await db.execute(
+            select(Transaction)
+            .where(Transaction.user_id == user_id, Transaction.id.in_(ids))
+            .order_by(Transaction.id)
+            .with_for_update()
+        )
+        existing = {tx.id: tx for tx in result.scalars().all()}
+
+    # Pass 1: validate every row against the state left by the rows before it
+    planned = []  # (index, action, tx or None, payload)
+    current = {i: SimpleNamespace(**{f: getattr(tx, f) for f in REF_FIELDS}) for i, tx in existing.items()}
+    refs = []
+    for i, op in enumerate(ops):
+        try:
+            if op.action == "create":
+                payload = TransactionCreate.model_validate(op.data or {}).model_dump()
+                fields = SimpleNamespace(**payload)
+            else:
+                if op.id is None or op.id not in current:
+                    raise LookupError(f"Transaction {op.id} not found")
+                payload = TransactionUpdate.model_validate(op.data or {}).model_dump(exclude_unset=True) if op.action == "update" else {}
+                refs.append(asset_ref(current[op.id]))
+                fields = SimpleNamespace(**{f: payload.get(f, getattr(current[op.id], f)) for f in REF_FIELDS})
+            error = _invalid_op(fields) if op.action != "delete" else None
+            if error:
+                raise ValueError(error)
+        except ValidationError as e:
+            results[i].status, results[i].error = "error", _validation_message(e)
+            continue
+        except (LookupError, ValueError) as e:
+            results[i].status, results[i].error = "error", str(e)
+            continue
+        if op.action == "delete":
+            del current[op.id]
+        else:
+            refs.append(asset_ref(fields))
+            if op.action == "update":
+                current[op.id] = fields
+        planned.append((i, op.action, existing.get(op.id), payload))
+
+    # Anchor every affected asset before any transaction changes
+    batch = LedgerBatch(db, user_id)
+    await batch.load(refs)
+
+    # Pass 2: apply the changes in memory
+    created = []
+    for i, action, tx, payload in planned:
+        if action == "create":
+            tx = Transaction(**payload, user_id=user_id)
+            created.append((i, tx))
+        elif action == "update":
+            batch.touch(asset_ref(tx), tx_key(tx))
+            for field, value in payload.items():
+                setattr(tx, field, value)
+            batch.touch(asset_ref(tx), tx_key(tx))
+        else:
+            batch.touch(asset_ref(tx), tx_key(tx))
+            await db.delete(tx)
+
+    # One flush: batched INSERTs for new rows, then replay each asset once
+    db.add_all([tx for _, tx in created])
+    await db.flush()
+    for i, tx in created:
+        results[i].id = tx.id
+        batch.touch(asset_ref(tx), tx_key(tx))
+    await batch.finish()
+    await db.commit()
+
+    counts = {"create": 0, "update": 0, "delete": 0}
+    for i, action, _, _ in planned:
+        counts[action] += 1
+    return TransactionBulkResponse(
+        results=results,
+        created=counts["create"],
+        updated=counts["update"],
+        deleted=counts["delete"],
+        errors=sum(1 for r in results if r.status == "error"),
+    )
+
+
 @router.get("/{transaction_id}", response_model=TransactionRead)
 async def get_transaction(transaction_id: int, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     obj = await db.get(Transaction, transaction_id)
@@ -292,31 +204,53 @@ async def update_transaction(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    obj = await db.get(Transaction, transaction_id)
-    if not obj or obj.user_id != user.id:
-        raise HTTPException(404, f"Transaction {transaction_id} not found")
-    # Revert the old state
-    await _revert(db, obj, user.id)
-    # Apply updates
     update_data = data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(obj, field, value)
-    # Validate operation
-    valid = VALID_OPS.get(obj.asset_class)
-    if valid and obj.operation_type not in valid:
-        raise HTTPException(422, f"Invalid operation '{obj.operation_type}' for {obj.asset_class}")
-    # Apply new state
-    await _apply(db, obj, user.id)
-    await db.commit()
+
+    async def write():
+        tx = await _get_locked(db, user.id, transaction_id)
+        updated = SimpleNamespace(**{f: update_data.get(f, getattr(tx, f)) for f in REF_FIELDS})
+        # Validate operation
+        error = _invalid_op(updated)
+        if error:
+            raise HTTPException(422, error)
+        old_ref, old_key = asset_ref(tx), tx_key(tx)
+        new_ref = asset_ref(updated)
+        # Anchor (and lock) both assets on their rows as they were before this edit
+        for ref in sorted({r for r in (old_ref, new_ref) if r}):
+            await ensure_opening(db, user.id, ref)
+        # Apply updates
+        for field, value in update_data.items():
+            setattr(tx, field, value)
+        await db.flush()
+        # Replay each asset from whichever version of the transaction comes first
+        new_key = tx_key(tx)
+        if old_ref and old_ref == new_ref:
+            await replay(db, user.id, old_ref, min(old_key, new_key))
+        else:
+            for ref, since in ((old_ref, old_key), (new_ref, new_key)):
+                if ref:
+                    await replay(db, user.id, ref, since)
+        await db.commit()
+        return tx
+
+    obj = await run_with_retry(db, write, settings.ledger_write_attempts)
+    user_cache.invalidate_user(user.id)
     await db.refresh(obj)
     return obj
 
 
 @router.delete("/{transaction_id}", status_code=204)
 async def delete_transaction(transaction_id: int, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    obj = await db.get(Transaction, transaction_id)
-    if not obj or obj.user_id != user.id:
-        raise HTTPException(404, f"Transaction {transaction_id} not found")
-    await _revert(db, obj, user.id)
-    await db.delete(obj)
-    await db.commit()
+    async def write():
+        tx = await _get_locked(db, user.id, transaction_id)
+        ref = asset_ref(tx)
+        if ref:
+            await ensure_opening(db, user.id, ref)
+        await db.delete(tx)
+        if ref:
+            await db.flush()
+            await replay(db, user.id, ref, tx_key(tx))
+        await db.commit()
+
+    await run_with_retry(db, write, settings.ledger_write_attempts)
+    user_cache.invalidate_user(user.id)
@@ -5,8 +5,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models.user import User
 from ..schemas.user import UserRead, UserUpdate
-from ..core.security import require_admin
+from ..core.security import require_admin, invalidate_user_status
 from ..core.activity_logger import log_activity
+from ..services import admin_metrics
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
@@ -54,6 +55,8 @@ async def update_user(
         details=str(update_data),
     )
     await db.commit()
+    invalidate_user_status(user_id)
+    admin_metrics.invalidate()
     await db.refresh(user)
     return user
 
@@ -74,6 +77,8 @@ async def approve_user(
         resource_id=user_id,
     )
     await db.commit()
+    invalidate_user_status(user_id)
+    admin_metrics.invalidate()
     await db.refresh(user)
     return user
 
@@ -97,3 +102,5 @@ async def delete_user(
     )
     await db.delete(user)
     await db.commit()
+    invalidate_user_status(user_id)
+    admin_metrics.invalidate()
@@ -5,7 +5,7 @@ from pydantic import BaseModel
 
 class ActivityLogRead(BaseModel):
     id: int
-    user_id: str
+    user_id: str | None = None
     action: str
     resource: str
     resource_id: str | None = None
@@ -14,3 +14,9 @@ class ActivityLogRead(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class ActivityLogPage(BaseModel):
+    items: list[ActivityLogRead]
+    # Pass as ``cursor`` to get the next (older) page; None on the last page
+    next_cursor: str | None = None
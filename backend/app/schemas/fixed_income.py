@@ -30,3 +30,32 @@ class FixedIncomeRead(FixedIncomeBase):
     id: str
 
     model_config = {"from_attributes": True}
+
+
+class FixedIncomeValuation(BaseModel):
+    id: str
+    gross_value: float
+    net_value: float
+    ir: float
+    ir_rate: float
+    return_pct: float
+    net_return_pct: float
+    status: str
+
+
+class FixedIncomeValuationTotals(BaseModel):
+    total_applied: float
+    total_gross: float
+    total_ir: float
+    total_net: float
+    total_gross_return: float
+    total_net_return: float
+    gross_return_pct: float
+    net_return_pct: float
+    active_bonds: int
+
+
+class FixedIncomeValuationRead(BaseModel):
+    as_of: datetime.date
+    bonds: list[FixedIncomeValuation]
+    totals: FixedIncomeValuationTotals
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Literal
 import datetime
 
 
@@ -52,3 +53,29 @@ class TransactionRead(BaseModel):
     created_at: datetime.datetime | None = None
 
     model_config = {"from_attributes": True}
+
+
+class TransactionBulkItem(BaseModel):
+    action: Literal["create", "update", "delete"]
+    id: int | None = None  # required for update/delete
+    data: dict | None = None  # TransactionCreate fields (create) or TransactionUpdate fields (update)
+
+
+class TransactionBulkRequest(BaseModel):
+    operations: list[TransactionBulkItem]
+
+
+class TransactionBulkResult(BaseModel):
+    index: int
+    action: str
+    status: Literal["ok", "error"]
+    id: int | None = None
+    error: str | None = None
+
+
+class TransactionBulkResponse(BaseModel):
+    results: list[TransactionBulkResult]
+    created: int
+    updated: int
+    deleted: int
+    errors: int
@@ -149,7 +149,7 @@ ACCUMULATION_HISTORY = [
 ]
 
 # ---------------------------------------------------------------------------
-# Transactions that reconstruct the positions above via _apply()
+# Transactions that reconstruct the positions above via the ledger
 # ---------------------------------------------------------------------------
 TRANSACTIONS = [
     # BR Stocks
@@ -0,0 +1,114 @@
+"""
+Admin metrics: user counts and per-user storage.
+
+User counts come from one pass over ``users`` with filtered counts.
+Storage is the number of rows each user owns in every per-user table,
+from a single ``UNION ALL`` of per-table ``GROUP BY user_id`` counts, so
+each table is read once (through its user_id index) whatever the number
+of users. Both are cached for ``admin_metrics_ttl_seconds``.
+"""
+
+import time
+
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core.cache import TTLCache
+from ..models import (
+    User,
+    BrStock,
+    Fii,
+    IntlStock,
+    FixedIncome,
+    FiEtf,
+    CashAccount,
+    RealAsset,
+    Transaction,
+    Dividend,
+    PositionCheckpoint,
+    PatrimonialHistory,
+    AllocationTarget,
+    AccumulationGoal,
+    WatchlistItem,
+    ActivityLog,
+)
+
+USER_TABLES = (
+    BrStock, Fii, IntlStock, FixedIncome, FiEtf, CashAccount, RealAsset,
+    Transaction, Dividend, PositionCheckpoint, PatrimonialHistory,
+    AllocationTarget, AccumulationGoal, WatchlistItem, ActivityLog,
+)
+
+_cache = TTLCache(maxsize=4, ttl=settings.admin_metrics_ttl_seconds)
+
+
+async def _user_counts(db: AsyncSession) -> dict:
+    row = (await db.execute(
+        select(
+            func.count().label("total_users"),
+            func.count().filter(User.is_active.is_(True)).label("active_users"),
+            func.count().filter(
+                User.is_approved.is_(False),
+                User.email_verified.is_(True),
+                User.is_active.is_(True),
+            ).label("pending_users"),
+        ).select_from(User)
+    )).one()
+    return dict(row._mapping)
+
+
+async def _storage(db: AsyncSession) -> dict:
+    """Rows per table and the ``admin_metrics_top_users`` heaviest users."""
+    query = union_all(*(
+        select(
+            model.user_id.label("user_id"),
+            literal(model.__tablename__).label("table"),
+            func.count().label("rows"),
+        ).group_by(model.user_id)
+        for model in USER_TABLES
+    ))
+    tables = {model.__tablename__: 0 for model in USER_TABLES}
+    users: dict[str, dict[str, int]] = {}
+    for user_id, table, rows in (await db.execute(query)).all():
+        tables[table] += rows
+        # Activity logs of unknown users have no user_id
+        if user_id is not None:
+            users.setdefault(user_id, {})[table] = rows
+
+    heaviest = sorted(users.items(), key=lambda item: sum(item[1].values()), reverse=True)
+    heaviest = heaviest[:settings.admin_metrics_top_users]
+    result = await db.execute(
+        select(User.id, User.email).where(User.id.in_([user_id for user_id, _ in heaviest]))
+    )
+    emails = dict(result.all())
+    return {
+        "tables": tables,
+        "total_rows": sum(tables.values()),
+        "users_with_data": len(users),
+        "top_users": [
+            {
+                "user_id": user_id,
+                "email": emails.get(user_id),
+                "total_rows": sum(rows.values()),
+                "rows": dict(sorted(rows.items(), key=lambda item: item[1], reverse=True)),
+            }
+            for user_id, rows in heaviest
+        ],
+    }
+
+
+async def get_metrics(db: AsyncSession, refresh: bool = False) -> dict:
+    """User counts and storage statistics, cached unless ``refresh``."""
+    metrics = None if refresh else _cache.get("metrics")
+    if metrics is None:
+        metrics = await _user_counts(db)
+        metrics["storage"] = await _storage(db)
+        metrics["computed_at"] = time.time()
+        _cache.set("metrics", metrics)
+    return metrics
+
+
+def invalidate() -> None:
+    """Drop the cached metrics (after a user is approved, changed or deleted)."""
+    _cache.clear()
@@ -1,17 +1,66 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
 import httpx
 
+from ..core.cache import TTLCache
+from ..core.singleflight import SingleFlight
+
 BCB_SGS_BASE = "https://api.bcb.gov.br/dados/serie/bcdata.sgs"
 
+# Latest-value cache lifetime per series, matched to publication cadence
+LATEST_TTL = {
+    1: 15 * 60,        # USD/BRL PTAX: several bulletins per business day
+    4189: 60 * 60,     # Selic (annualized): changes at most daily
+    4391: 60 * 60,     # CDI (monthly accumulated): daily
+    433: 6 * 60 * 60,  # IPCA: monthly
+}
+DEFAULT_LATEST_TTL = 60 * 60
 
-async def _fetch_series(code: int) -> float:
-    url = f"{BCB_SGS_BASE}.{code}/dados/ultimos/1?formato=json"
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url)
+_client: httpx.AsyncClient | None = None
+_latest_cache = TTLCache(maxsize=64, ttl=DEFAULT_LATEST_TTL)
+_latest_flight = SingleFlight()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared, pooled client so BCB calls reuse TCP+TLS connections."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _download_latest(codes: list[int]) -> dict[int, float]:
+    async def one(code: int) -> float:
+        url = f"{BCB_SGS_BASE}.{code}/dados/ultimos/1?formato=json"
+        resp = await get_client().get(url, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         if not data:
             raise ValueError(f"BCB series {code}: empty response")
-        return float(data[0]["valor"])
+        value = float(data[0]["valor"])
+        _latest_cache.set(code, value, ttl=LATEST_TTL.get(code, DEFAULT_LATEST_TTL))
+        return value
+
+    return {code: await one(code) for code in codes}
+
+
+async def _fetch_series(code: int) -> float:
+    """Latest value of a series, cached and coalesced across requests."""
+    value = _latest_cache.get(code)
+    if value is None:
+        value = (await _latest_flight.run_many([code], _download_latest))[code]
+    return value
 
 
 async def fetch_exchange_rate() -> float:
@@ -30,10 +79,55 @@ async def fetch_ipca() -> float:
     return await _fetch_series(433)
 
 
-async def fetch_historical_series(
+async def fetch_indicators() -> tuple[dict[str, float], dict[str, str]]:
+    """Fetch Selic, CDI and IPCA concurrently. Returns (values, errors)."""
+    names = ("selic", "cdi", "ipca")
+    results = await asyncio.gather(
+        fetch_selic(), fetch_cdi(), fetch_ipca(), return_exceptions=True
+    )
+    values, errors = {}, {}
+    for name, res in zip(names, results):
+        if isinstance(res, Exception):
+            errors[name] = str(res)
+        else:
+            values[name] = res
+    return values, errors
+
+
+def latest_cache_stats() -> dict:
+    return _latest_cache.stats()
+
+
+# BCB SGS rejects daily-series queries spanning more than 10 years
+MAX_WINDOW_YEARS = 10
+MAX_CONCURRENT_REQUESTS = 4
+
+
+def _add_years(d: date, years: int) -> date:
+    try:
+        return d.replace(year=d.year + years)
+    except ValueError:  # Feb 29 -> Feb 28
+        return d.replace(year=d.year + years, day=28)
+
+
+def split_windows(start: date, end: date, years: int = MAX_WINDOW_YEARS) -> list[tuple[date, date]]:
+    """Split [start, end] into consecutive windows no longer than ``years``."""
+    windows = []
+    cur = start
+    while cur <= end:
+        window_end = min(_add_years(cur, years) - timedelta(days=1), end)
+        windows.append((cur, window_end))
+        cur = window_end + timedelta(days=1)
+    return windows
+
+
+async def fetch_series_windows(
     codes: list[int], start_date: str, end_date: str
-) -> dict[int, list[dict]]:
-    """Fetch multiple BCB SGS historical series in a date range.
+) -> tuple[dict[int, list[dict]], list[dict]]:
+    """Fetch BCB SGS series in a date range, split into valid windows.
+
+    All (code, window) requests run concurrently, bounded by a semaphore.
+    Results are merged per code, sorted and deduplicated by date.
 
     Args:
         codes: list of BCB series codes (e.g. [12, 433, 11])
@@ -41,24 +135,66 @@ async def fetch_historical_series(
         end_date: DD/MM/YYYY format
 
     Returns:
-        dict keyed by series code, each value is a list of {date, value} dicts.
+        (series, failures): series keyed by code, each a list of {date, value}
+        dicts; failures lists the windows that could not be fetched as
+        {code, start, end, error} dicts.
+    """
+    start = datetime.strptime(start_date, "%d/%m/%Y").date()
+    end = datetime.strptime(end_date, "%d/%m/%Y").date()
+    windows = split_windows(start, end)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def fetch_window(client: httpx.AsyncClient, code: int, w_start: date, w_end: date) -> list[dict]:
+        url = (
+            f"{BCB_SGS_BASE}.{code}/dados"
+            f"?formato=json&dataInicial={w_start:%d/%m/%Y}&dataFinal={w_end:%d/%m/%Y}"
+        )
+        async with semaphore:
+            resp = await client.get(url)
+        # SGS answers 404 when a window simply has no observations
+        if resp.status_code == 404:
+            return []
+        resp.raise_for_status()
+        return resp.json()
+
+    jobs = [(code, w_start, w_end) for code in dict.fromkeys(codes) for w_start, w_end in windows]
+    client = get_client()
+    responses = await asyncio.gather(
+        *(fetch_window(client, *job) for job in jobs), return_exceptions=True
+    )
+
+    merged: dict[int, dict[str, float]] = {code: {} for code in codes}
+    failures: list[dict] = []
+    for (code, w_start, w_end), data in zip(jobs, responses):
+        if isinstance(data, Exception):
+            failures.append({
+                "code": code,
+                "start": w_start.strftime("%d/%m/%Y"),
+                "end": w_end.strftime("%d/%m/%Y"),
+                "error": str(data) or type(data).__name__,
+            })
+            continue
+        for entry in data:
+            if entry.get("valor") is not None:
+                merged[code][entry["data"]] = float(entry["valor"])
+
+    def sort_key(d: str) -> tuple:
+        day, month, year = d.split("/")
+        return int(year), int(month), int(day)
+
+    series = {
+        code: [{"date": d, "value": points[d]} for d in sorted(points, key=sort_key)]
+        for code, points in merged.items()
+    }
+    return series, failures
+
+
+async def fetch_historical_series(
+    codes: list[int], start_date: str, end_date: str
+) -> dict[int, list[dict]]:
+    """Fetch multiple BCB SGS historical series in a date range.
+
+    Same as ``fetch_series_windows`` without the failure report.
     """
-    results: dict[int, list[dict]] = {}
-    async with httpx.AsyncClient(timeout=30) as client:
-        for code in codes:
-            try:
-                url = (
-                    f"{BCB_SGS_BASE}.{code}/dados"
-                    f"?formato=json&dataInicial={start_date}&dataFinal={end_date}"
-                )
-                resp = await client.get(url)
-                resp.raise_for_status()
-                data = resp.json()
-                results[code] = [
-                    {"date": entry["data"], "value": float(entry["valor"])}
-                    for entry in data
-                    if entry.get("valor") is not None
-                ]
-            except Exception:
-                results[code] = []
-    return results
+    series, _ = await fetch_series_windows(codes, start_date, end_date)
+    return series
@@ -0,0 +1,181 @@
+"""
+Local store for BCB SGS historical series.
+
+Each series code is downloaded once and then only topped up with the
+observations published after the last stored date, so
+/api/market-data/historical-rates is served from the database.
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core.scheduler import periodic
+from ..database import async_session
+from ..models.bcb_series import BcbSeriesPoint, BcbSeriesSync
+from .bcb import fetch_series_windows
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement (asyncpg caps a statement at 32767 parameters)
+_INSERT_CHUNK = 5000
+
+# Bumped whenever new observations are stored, so derived tables built
+# from the series (e.g. fixed-income factor indexes) know to rebuild
+_version = 0
+
+
+def series_version() -> int:
+    return _version
+
+
+def format_bcb_date(d: date) -> str:
+    return d.strftime("%d/%m/%Y")
+
+
+def parse_bcb_date(s: str) -> date:
+    return datetime.strptime(s.strip(), "%d/%m/%Y").date()
+
+
+async def _store_points(db: AsyncSession, code: int, points: list[dict]) -> None:
+    global _version
+    if points:
+        _version += 1
+    rows = [
+        {"code": code, "date": parse_bcb_date(p["date"]), "value": p["value"]}
+        for p in points
+    ]
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        stmt = pg_insert(BcbSeriesPoint).values(rows[i:i + _INSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BcbSeriesPoint.code, BcbSeriesPoint.date],
+            set_={"value": stmt.excluded.value},
+        )
+        await db.execute(stmt)
+
+
+async def sync_series(
+    db: AsyncSession,
+    codes: list[int],
+    start: date | None = None,
+    force: bool = False,
+) -> None:
+    """Make sure ``codes`` are stored from ``start`` up to the latest observation.
+
+    Unknown codes are downloaded from ``start``; known codes are backfilled
+    if ``start`` is earlier than what is stored, and topped up from their
+    last stored date once the sync interval has elapsed (or with ``force``).
+    """
+    now = datetime.now(timezone.utc)
+    today = date.today()
+    interval = timedelta(minutes=settings.bcb_series_sync_interval_minutes)
+
+    result = await db.execute(select(BcbSeriesSync).where(BcbSeriesSync.code.in_(codes)))
+    state = {s.code: s for s in result.scalars().all()}
+    result = await db.execute(
+        select(BcbSeriesPoint.code, func.max(BcbSeriesPoint.date))
+        .where(BcbSeriesPoint.code.in_(codes))
+        .group_by(BcbSeriesPoint.code)
+    )
+    last_stored = dict(result.all())
+
+    # Codes needing the same range share one fetch
+    by_range: dict[tuple[date, date], list[int]] = {}
+    topped_up: set[int] = set()
+    for code in dict.fromkeys(codes):
+        st = state.get(code)
+        if st is None:
+            if start is not None and start <= today:
+                by_range.setdefault((start, today), []).append(code)
+                topped_up.add(code)
+            continue
+        if start is not None and start < st.first_date:
+            by_range.setdefault((start, st.first_date - timedelta(days=1)), []).append(code)
+        if force or now - st.synced_at >= interval:
+            since = last_stored[code] + timedelta(days=1) if code in last_stored else st.first_date
+            if since <= today:
+                by_range.setdefault((since, today), []).append(code)
+            topped_up.add(code)
+
+    if not by_range:
+        return
+
+    # Codes with a failed window keep their previous sync state, so the
+    # missing range is requested again next time (points that did arrive
+    # are stored anyway; re-inserting them is idempotent).
+    failed: set[int] = set()
+    for (range_start, range_end), group in by_range.items():
+        data, failures = await fetch_series_windows(
+            group, format_bcb_date(range_start), format_bcb_date(range_end)
+        )
+        for failure in failures:
+            logger.warning("[bcb] series %(code)s %(start)s-%(end)s failed: %(error)s", failure)
+            failed.add(failure["code"])
+        for code in group:
+            await _store_points(db, code, data.get(code, []))
+
+    # Upsert so concurrent first requests for the same code do not collide
+    for code in dict.fromkeys(codes):
+        st = state.get(code)
+        if code in failed or (st is None and code not in topped_up):
+            continue
+        first_date = min(d for d in (start, st.first_date if st else None) if d is not None)
+        synced_at = now if code in topped_up else st.synced_at
+        stmt = pg_insert(BcbSeriesSync).values(code=code, first_date=first_date, synced_at=synced_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BcbSeriesSync.code],
+            set_={
+                "first_date": func.least(BcbSeriesSync.first_date, stmt.excluded.first_date),
+                "synced_at": func.greatest(BcbSeriesSync.synced_at, stmt.excluded.synced_at),
+            },
+        )
+        await db.execute(stmt)
+    await db.commit()
+
+
+async def load_points(db: AsyncSession, codes: list[int], start: date, end: date) -> dict[int, list[tuple[date, float]]]:
+    """Stored ``(date, value)`` pairs for ``codes`` in [start, end], oldest first.
+
+    Reads the store only; call ``sync_series`` first for fresh data.
+    """
+    result = await db.execute(
+        select(BcbSeriesPoint.code, BcbSeriesPoint.date, BcbSeriesPoint.value)
+        .where(
+            BcbSeriesPoint.code.in_(codes),
+            BcbSeriesPoint.date >= start,
+            BcbSeriesPoint.date <= end,
+        )
+        .order_by(BcbSeriesPoint.code, BcbSeriesPoint.date)
+    )
+    points: dict[int, list[tuple[date, float]]] = {code: [] for code in codes}
+    for code, day, value in result.all():
+        points[code].append((day, value))
+    return points
+
+
+async def get_series(db: AsyncSession, codes: list[int], start: date, end: date) -> dict[int, list[dict]]:
+    """Observations for ``codes`` in [start, end], read from the local store.
+
+    Returns the same shape as ``fetch_series_windows``: lists of
+    ``{"date": "DD/MM/YYYY", "value": float}`` keyed by series code.
+    """
+    await sync_series(db, codes, start)
+    points = await load_points(db, codes, start, end)
+    return {
+        code: [{"date": format_bcb_date(day), "value": value} for day, value in pts]
+        for code, pts in points.items()
+    }
+
+
+@periodic("bcb-series-sync", seconds=settings.bcb_series_sync_interval_minutes * 60, initial_delay=120)
+async def bcb_series_sync_job() -> None:
+    """Top up every stored series with newly published observations."""
+    async with async_session() as db:
+        result = await db.execute(select(BcbSeriesSync.code))
+        codes = [r[0] for r in result.all()]
+        if codes:
+            await sync_series(db, codes, force=True)
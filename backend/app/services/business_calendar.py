@@ -0,0 +1,108 @@
+"""
+Brazilian business-day calendar (ANBIMA national holidays, used by B3).
+
+Holidays are generated once for ``FIRST_YEAR``..``LAST_YEAR`` and turned
+into a cumulative business-day count per calendar day, so the number of
+business days between two dates is a subtraction.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+FIRST_YEAR = 1990
+LAST_YEAR = 2099
+
+# (month, day) holidays observed every year
+FIXED_HOLIDAYS = (
+    (1, 1),    # Confraternizacao Universal
+    (4, 21),   # Tiradentes
+    (5, 1),    # Dia do Trabalho
+    (9, 7),    # Independencia
+    (10, 12),  # Nossa Senhora Aparecida
+    (11, 2),   # Finados
+    (11, 15),  # Proclamacao da Republica
+    (12, 25),  # Natal
+)
+# Dia Nacional de Zumbi e da Consciencia Negra (Lei 14.759/2023)
+CONSCIENCIA_NEGRA_SINCE = 2024
+
+
+def easter(year: int) -> date:
+    """Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def holidays_for(year: int) -> list[date]:
+    e = easter(year)
+    days = [date(year, m, d) for m, d in FIXED_HOLIDAYS]
+    days += [
+        e - timedelta(days=48),  # Carnaval (segunda)
+        e - timedelta(days=47),  # Carnaval (terca)
+        e - timedelta(days=2),   # Sexta-feira Santa
+        e + timedelta(days=60),  # Corpus Christi
+    ]
+    if year >= CONSCIENCIA_NEGRA_SINCE:
+        days.append(date(year, 11, 20))
+    return sorted(days)
+
+
+HOLIDAYS: frozenset[date] = frozenset(
+    d for year in range(FIRST_YEAR, LAST_YEAR + 1) for d in holidays_for(year)
+)
+
+_FIRST_DAY = np.datetime64(date(FIRST_YEAR, 1, 1), "D")
+_LAST_DAY = np.datetime64(date(LAST_YEAR, 12, 31), "D")
+_is_business_day = np.is_busday(
+    np.arange(_FIRST_DAY, _LAST_DAY + 1),
+    holidays=np.array(sorted(HOLIDAYS), dtype="datetime64[D]"),
+)
+# _cum[i]: business days from FIRST_YEAR-01-01 through day i inclusive
+_cum = np.cumsum(_is_business_day, dtype=np.int64)
+
+
+def _offsets(days: np.ndarray) -> np.ndarray:
+    days = days.astype("datetime64[D]")
+    if days.size and (days.min() < _FIRST_DAY or days.max() > _LAST_DAY):
+        raise ValueError(f"Calendar covers {FIRST_YEAR}-{LAST_YEAR} only")
+    return (days - _FIRST_DAY).astype(np.int64)
+
+
+def is_business_day(d: date) -> bool:
+    return bool(_is_business_day[_offsets(np.array([d]))[0]])
+
+
+def business_days(start: date, end: date) -> int:
+    """Business days in (start, end]; 0 when ``end <= start``."""
+    if end <= start:
+        return 0
+    i, j = _offsets(np.array([start, end]))
+    return int(_cum[j] - _cum[i])
+
+
+def business_days_array(start: date, ends: np.ndarray) -> np.ndarray:
+    """``business_days(start, e)`` for every date in ``ends``."""
+    i = _offsets(np.array([start]))[0]
+    counts = _cum[_offsets(np.asarray(ends))] - _cum[i]
+    return np.maximum(counts, 0)
+
+
+def add_business_days(d: date, n: int) -> date:
+    """The ``n``-th business day after ``d`` (n >= 0; 0 returns ``d``)."""
+    if n <= 0:
+        return d
+    target = _cum[_offsets(np.array([d]))[0]] + n
+    j = int(np.searchsorted(_cum, target, side="left"))
+    if j >= len(_cum):
+        raise ValueError(f"Calendar covers {FIRST_YEAR}-{LAST_YEAR} only")
+    return (_FIRST_DAY + j).astype(date)
@@ -0,0 +1,216 @@
+"""
+Fixed-income chart series: portfolio quota (cota) history, benchmark
+curves and per-bond return series.
+
+Each bond's value path is computed for the whole date axis at once from
+the factor indexes in ``fixed_income_valuation``; the quota series is
+then a cumulative product over the portfolio's daily returns. Series can
+be downsampled to the last point of each week or month.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.fixed_income import FixedIncome
+from .bcb_store import series_version
+from .business_calendar import business_days_array
+from .fixed_income_valuation import CDI, SELIC, IPCA, RateTables, get_rate_tables
+
+INITIAL_QUOTA_VALUE = 1000.0
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+# Fixed spread of the IPCA + 6% benchmark and the Poupanca share of Selic
+IPCA_BENCHMARK_SPREAD = 6.0
+POUPANCA_SELIC_SHARE = 0.7
+
+
+def cache_key(exclude: list[str], freq: str, with_bonds: bool) -> tuple:
+    """Parameters identifying one computed payload for a user.
+
+    Includes the day and the BCB store version, so entries go stale when
+    new observations arrive even without a portfolio change.
+    """
+    return (tuple(sorted(exclude)), freq, with_bonds, date.today(), series_version())
+
+
+def _downsample(dates: np.ndarray, freq: str) -> np.ndarray:
+    """Indices of the last point of each period (all points for daily)."""
+    if freq == "daily" or len(dates) == 0:
+        return np.arange(len(dates))
+    if freq == "weekly":
+        # Day 0 (1970-01-01) is a Thursday; +3 makes weeks start on Monday
+        period = (dates.astype(np.int64) + 3) // 7
+    else:
+        period = dates.astype("datetime64[M]").astype(np.int64)
+    return np.flatnonzero(np.append(period[1:] != period[:-1], True))
+
+
+def _points(dates: np.ndarray, values: np.ndarray, freq: str) -> list[dict]:
+    idx = _downsample(dates, freq)
+    return [
+        {"date": str(d), "value": float(v)}
+        for d, v in zip(dates[idx], values[idx])
+    ]
+
+
+def _series_dates(tables: RateTables, code: int, after: date, inclusive: bool = False) -> np.ndarray:
+    dates = tables.dates[code]
+    side = "left" if inclusive else "right"
+    return dates[np.searchsorted(dates, np.datetime64(after, "D"), side=side):]
+
+
+# ---------------------------------------------------------------------------
+# Quota history
+# ---------------------------------------------------------------------------
+
+def _value_paths(bonds: list[FixedIncome], tables: RateTables, axis: np.ndarray, entry: np.ndarray) -> np.ndarray:
+    """``paths[t, b]``: value of bond b at the end of axis day t.
+
+    A bond enters on its first axis day at or after the application date
+    and earns that day's return; before entry its value is 0.
+    """
+    paths = np.zeros((len(axis), len(bonds)))
+    for b, bond in enumerate(bonds):
+        k = entry[b]
+        if k >= len(axis):
+            continue
+        days = axis[k:]
+        # Returns from the entry day inclusive, i.e. observations after the previous day
+        since = (days[0] - np.timedelta64(1, "D")).astype(date)
+        rate = bond.contracted_rate or 0
+        if bond.indexer == "Selic":
+            growth = tables.index(SELIC, (rate or 100) / 100).factors(since, days)
+        elif bond.indexer == "IPCA":
+            daily = (1 + rate / 100) ** (np.arange(1, len(days) + 1) / 252)
+            growth = tables.index(IPCA).factors(since, days) * daily
+        elif bond.indexer == "Prefixado":
+            growth = (1 + rate / 100) ** (np.arange(1, len(days) + 1) / 252)
+        else:
+            growth = tables.index(CDI, (rate or 100) / 100).factors(since, days)
+        paths[k:, b] = bond.applied_value * growth
+    return paths
+
+
+def quota_history(bonds: list[FixedIncome], tables: RateTables, freq: str) -> list[dict]:
+    """Quota value, total value and quota count per day of the rate axis.
+
+    Bonds buy quotas at the current quota value when they enter; the
+    quota value then moves with the portfolio's daily weighted return.
+    """
+    if not bonds:
+        return []
+    axis_code = CDI if tables.has(CDI) else SELIC
+    start = min(b.application_date for b in bonds)
+    axis = _series_dates(tables, axis_code, start, inclusive=True)
+    if not len(axis):
+        return []
+
+    applied = np.array([b.applied_value for b in bonds], dtype=float)
+    app_dates = np.array([b.application_date for b in bonds], dtype="datetime64[D]")
+    entry = np.searchsorted(axis, app_dates, side="left")
+
+    after = _value_paths(bonds, tables, axis, entry)
+    # Value before each day's return: previous close, or the applied
+    # value on the entry day
+    before = np.vstack([np.zeros((1, len(bonds))), after[:-1]])
+    rows, cols = entry[entry < len(axis)], np.flatnonzero(entry < len(axis))
+    before[rows, cols] = applied[cols]
+
+    total_before = before.sum(axis=1)
+    total_after = after.sum(axis=1)
+    growth = np.divide(total_after, total_before, out=np.ones(len(axis)), where=total_before > 0)
+    quota = INITIAL_QUOTA_VALUE * np.cumprod(growth)
+    quota_before = np.concatenate([[INITIAL_QUOTA_VALUE], quota[:-1]])
+
+    # Quotas bought on each day at the quota value before that day's return
+    bought = np.zeros(len(axis))
+    np.add.at(bought, rows, applied[cols] / quota_before[rows])
+    total_quotas = np.cumsum(bought)
+
+    held = np.flatnonzero(total_quotas > 0)
+    if not len(held):
+        return []
+    days, quota, total_quotas = axis[held], quota[held], total_quotas[held]
+    return [
+        {
+            "date": str(days[i]),
+            "quota_value": float(quota[i]),
+            "total_value": float(total_quotas[i] * quota[i]),
+            "total_quotas": float(total_quotas[i]),
+        }
+        for i in _downsample(days, freq)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks and per-bond returns
+# ---------------------------------------------------------------------------
+
+def benchmark_series(start: date, tables: RateTables, freq: str) -> dict[str, list[dict]]:
+    """Accumulated return (%) of each benchmark from ``start`` (inclusive)."""
+    since = start - timedelta(days=1)
+    result = {}
+    for name, code, pct in (
+        ("cdi", CDI, 1.0),
+        ("selic", SELIC, 1.0),
+        ("ipca", IPCA, 1.0),
+        ("poupanca", SELIC, POUPANCA_SELIC_SHARE),
+    ):
+        dates = _series_dates(tables, code, since)
+        factors = tables.index(code, pct).factors(since, dates)
+        result[name] = _points(dates, (factors - 1) * 100, freq)
+
+    dates = _series_dates(tables, IPCA, since)
+    bd = business_days_array(start, dates)
+    factors = tables.index(IPCA).factors(since, dates) * (1 + IPCA_BENCHMARK_SPREAD / 100) ** (bd / 252)
+    result["ipca6"] = _points(dates, (factors - 1) * 100, freq)
+    return result
+
+
+def bond_return_series(bond: FixedIncome, tables: RateTables, freq: str) -> list[dict]:
+    """Return (%) of one bond at each observation after its application date."""
+    if not bond.applied_value:
+        return []
+    start = bond.application_date
+    rate = bond.contracted_rate or 0
+    if bond.indexer in ("CDI", "Selic"):
+        code = CDI if bond.indexer == "CDI" else SELIC
+        dates = _series_dates(tables, code, start)
+        factors = tables.index(code, (rate or 100) / 100).factors(start, dates)
+    elif bond.indexer == "IPCA":
+        dates = _series_dates(tables, IPCA, start)
+        bd = business_days_array(start, dates)
+        factors = tables.index(IPCA).factors(start, dates) * (1 + rate / 100) ** (bd / 252)
+    elif bond.indexer == "Prefixado":
+        # One business day per CDI observation, as in the frontend
+        dates = _series_dates(tables, CDI, start)
+        factors = (1 + rate / 100) ** (np.arange(1, len(dates) + 1) / 252)
+    else:
+        return []
+    return _points(dates, (factors - 1) * 100, freq)
+
+
+async def build_series(
+    db: AsyncSession,
+    bonds: list[FixedIncome],
+    exclude: list[str],
+    freq: str,
+    with_bonds: bool,
+) -> dict:
+    """Quota history of the bonds not in ``exclude``, benchmarks from the
+    earliest application date and, with ``with_bonds``, per-bond returns."""
+    if not bonds:
+        return {"freq": freq, "quota": [], "benchmarks": {}, "bonds": {}}
+    start = min(b.application_date for b in bonds)
+    tables = await get_rate_tables(db, start)
+
+    excluded = set(exclude)
+    selected = [b for b in bonds if b.id not in excluded]
+    return {
+        "freq": freq,
+        "quota": quota_history(selected, tables, freq),
+        "benchmarks": benchmark_series(start, tables, freq),
+        "bonds": {b.id: bond_return_series(b, tables, freq) for b in selected} if with_bonds else {},
+    }
@@ -0,0 +1,206 @@
+"""
+Fixed-income valuation from the local BCB series store.
+
+Daily CDI/Selic and monthly IPCA observations are turned into cumulative
+product indexes once, so the compounded factor between any two dates is
+two binary searches and a division instead of a walk over the series.
+Semantics follow ``frontend/src/utils/fixedIncomeCalculations.js``.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.fixed_income import FixedIncome
+from .bcb_store import load_points, series_version, sync_series
+from .business_calendar import business_days
+
+CDI, SELIC, IPCA = 12, 11, 433
+SERIES_CODES = [CDI, SELIC, IPCA]
+INDEXER_SERIES = {"CDI": CDI, "Selic": SELIC, "IPCA": IPCA}
+
+# Regressive IR table: (max days held, rate)
+IR_BRACKETS = ((180, 0.225), (360, 0.20), (720, 0.175))
+IR_FLOOR = 0.15
+
+
+@dataclass
+class FactorIndex:
+    """Cumulative product of ``1 + value/100 * pct`` over one series.
+
+    ``cum[i]`` is the compounded factor of the first ``i`` observations,
+    so ``cum[0] == 1`` and ``len(cum) == len(dates) + 1``.
+    """
+
+    dates: np.ndarray  # datetime64[D], ascending
+    cum: np.ndarray
+
+    @classmethod
+    def build(cls, dates: np.ndarray, values: np.ndarray, pct: float = 1.0) -> "FactorIndex":
+        cum = np.empty(len(values) + 1)
+        cum[0] = 1.0
+        np.cumprod(1 + values / 100 * pct, out=cum[1:])
+        return cls(dates=dates, cum=cum)
+
+    def factor(self, start: date, end: date) -> float:
+        """Compounded factor of the observations dated in (start, end]."""
+        i, j = np.searchsorted(self.dates, np.array([start, end], dtype="datetime64[D]"), side="right")
+        return float(self.cum[j] / self.cum[i]) if j > i else 1.0
+
+    def factors(self, start: date, ends: np.ndarray) -> np.ndarray:
+        """``factor(start, e)`` for every date in ``ends`` (datetime64[D])."""
+        i = np.searchsorted(self.dates, np.datetime64(start, "D"), side="right")
+        j = np.searchsorted(self.dates, ends, side="right")
+        return np.where(j > i, self.cum[np.maximum(j, i)] / self.cum[i], 1.0)
+
+
+@dataclass
+class RateTables:
+    """Stored series from ``start`` to ``built_on`` plus their factor indexes."""
+
+    start: date
+    built_on: date
+    version: int
+    dates: dict[int, np.ndarray]
+    values: dict[int, np.ndarray]
+    _indexes: dict[tuple[int, float], FactorIndex] = field(default_factory=dict)
+
+    def has(self, code: int) -> bool:
+        return len(self.dates.get(code, ())) > 0
+
+    def index(self, code: int, pct: float = 1.0) -> FactorIndex:
+        """Factor index for ``pct`` of series ``code`` (built once per percentage)."""
+        key = (code, round(pct, 8))
+        idx = self._indexes.get(key)
+        if idx is None:
+            idx = FactorIndex.build(self.dates[code], self.values[code], pct)
+            self._indexes[key] = idx
+        return idx
+
+
+_tables: RateTables | None = None
+
+
+async def get_rate_tables(db: AsyncSession, start: date) -> RateTables:
+    """Rate tables covering at least [start, today].
+
+    The tables are shared between requests and rebuilt only when a day
+    rolls over, new observations were stored or an earlier start is needed.
+    """
+    global _tables
+    await sync_series(db, SERIES_CODES, start)
+
+    today = date.today()
+    cached = _tables
+    if cached and cached.start <= start and cached.built_on == today and cached.version == series_version():
+        return cached
+
+    if cached:
+        start = min(start, cached.start)
+    version = series_version()
+    points = await load_points(db, SERIES_CODES, start, today)
+    tables = RateTables(
+        start=start,
+        built_on=today,
+        version=version,
+        dates={c: np.array([d for d, _ in pts], dtype="datetime64[D]") for c, pts in points.items()},
+        values={c: np.array([v for _, v in pts], dtype=float) for c, pts in points.items()},
+    )
+    _tables = tables
+    return tables
+
+
+# ---------------------------------------------------------------------------
+# Per-bond valuation
+# ---------------------------------------------------------------------------
+
+def gross_value(bond: FixedIncome, tables: RateTables, as_of: date) -> float:
+    """Gross value of ``bond`` on ``as_of``.
+
+    Bonds with an unknown contracted rate (e.g. B3 imports with "A definir")
+    keep the stored current value.
+    """
+    rate = bond.contracted_rate
+    if not rate:
+        return bond.current_value or bond.applied_value
+
+    applied, start = bond.applied_value, bond.application_date
+    if bond.indexer in ("CDI", "Selic"):
+        code = INDEXER_SERIES[bond.indexer]
+        if not tables.has(code):
+            return applied
+        return applied * tables.index(code, rate / 100).factor(start, as_of)
+    if bond.indexer == "IPCA":
+        if not tables.has(IPCA):
+            return applied
+        spread = (1 + rate / 100) ** (business_days(start, as_of) / 252)
+        return applied * tables.index(IPCA).factor(start, as_of) * spread
+    if bond.indexer == "Prefixado":
+        return applied * (1 + rate / 100) ** (business_days(start, as_of) / 252)
+    return bond.current_value or bond.applied_value
+
+
+def ir_rate(application_date: date, as_of: date) -> float:
+    """Regressive IR rate; the holding period counts calendar days."""
+    days = (as_of - application_date).days
+    for max_days, rate in IR_BRACKETS:
+        if days <= max_days:
+            return rate
+    return IR_FLOOR
+
+
+def bond_status(maturity_date: date, as_of: date) -> str:
+    days = (maturity_date - as_of).days
+    if days < 0:
+        return "Vencido"
+    if days <= 30:
+        return "< 30d"
+    return "Ativo"
+
+
+def value_bond(bond: FixedIncome, tables: RateTables, as_of: date) -> dict:
+    gross = gross_value(bond, tables, as_of)
+    applied = bond.applied_value
+    rate = 0.0 if bond.tax_exempt else ir_rate(bond.application_date, as_of)
+    ir = max(0.0, (gross - applied) * rate)
+    net = gross - ir
+    return {
+        "id": bond.id,
+        "gross_value": gross,
+        "net_value": net,
+        "ir": ir,
+        "ir_rate": rate,
+        "return_pct": (gross - applied) / applied * 100 if applied > 0 else 0.0,
+        "net_return_pct": (net - applied) / applied * 100 if applied > 0 else 0.0,
+        "status": bond_status(bond.maturity_date, as_of),
+    }
+
+
+async def value_portfolio(db: AsyncSession, bonds: list[FixedIncome], as_of: date | None = None) -> dict:
+    """Value every bond in ``bonds`` on ``as_of`` (default today) plus totals."""
+    as_of = as_of or date.today()
+    valued = []
+    if bonds:
+        tables = await get_rate_tables(db, min(b.application_date for b in bonds))
+        valued = [value_bond(b, tables, as_of) for b in bonds]
+
+    applied = sum(b.applied_value for b in bonds)
+    gross = sum(v["gross_value"] for v in valued)
+    net = sum(v["net_value"] for v in valued)
+    return {
+        "as_of": as_of,
+        "bonds": valued,
+        "totals": {
+            "total_applied": applied,
+            "total_gross": gross,
+            "total_ir": sum(v["ir"] for v in valued),
+            "total_net": net,
+            "total_gross_return": gross - applied,
+            "total_net_return": net - applied,
+            "gross_return_pct": (gross - applied) / applied * 100 if applied > 0 else 0.0,
+            "net_return_pct": (net - applied) / applied * 100 if applied > 0 else 0.0,
+            "active_bonds": sum(1 for v in valued if v["status"] != "Vencido"),
+        },
+    }
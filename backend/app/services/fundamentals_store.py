@@ -0,0 +1,170 @@
+"""
+Database-backed fundamentals store shared by all users.
+
+The /fundamentals endpoint serves rows from ``ticker_fundamentals``.
+Yahoo is only called inline for symbols never seen before; rows past
+their staleness window are returned as-is and queued for the background
+refresher.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, or_, extract
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core.scheduler import periodic
+from ..database import async_session
+from ..models.ticker_fundamental import TickerFundamental
+from .yahoo import fetch_fundamentals, _yahoo_symbol
+
+FIELDS = ("lpa", "vpa", "pvp", "dy", "last_dividend", "dividends_5y")
+
+# Symbols requested by the endpoint that are waiting for a refresh
+_pending: set[str] = set()
+
+
+def _has_data(row: TickerFundamental) -> bool:
+    return any(getattr(row, f) is not None for f in FIELDS)
+
+
+def _is_stale(row: TickerFundamental, now: datetime) -> bool:
+    """Per-ticker staleness policy.
+
+    - dividends_5y is a window of complete years, so any row fetched in a
+      previous year is stale;
+    - rows where Yahoo returned nothing are retried after a shorter delay;
+    - everything else refreshes once the max age is reached.
+    """
+    if row.fetched_at.year != now.year:
+        return True
+    age = now - row.fetched_at
+    if not _has_data(row):
+        return age > timedelta(hours=settings.fundamentals_retry_hours)
+    return age > timedelta(hours=settings.fundamentals_max_age_hours)
+
+
+def _to_dict(row: TickerFundamental) -> dict:
+    return {f: getattr(row, f) for f in FIELDS if getattr(row, f) is not None}
+
+
+async def _upsert(db: AsyncSession, data: dict[str, dict], now: datetime) -> None:
+    if not data:
+        return
+    rows = [
+        {"symbol": symbol, **{f: values.get(f) for f in FIELDS}, "fetched_at": now, "requested_at": now}
+        for symbol, values in data.items()
+    ]
+    stmt = pg_insert(TickerFundamental).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TickerFundamental.symbol],
+        set_={f: stmt.excluded[f] for f in (*FIELDS, "fetched_at")},
+    )
+    await db.execute(stmt)
+
+
+def enqueue_refresh(symbols: list[str]) -> None:
+    """Queue symbols for the background refresher and wake it up."""
+    new = set(symbols) - _pending
+    if new:
+        _pending.update(new)
+        refresh_fundamentals.trigger()
+
+
+async def get_fundamentals(db: AsyncSession, tickers: list[str], suffix: str = ".SA") -> dict[str, dict]:
+    """Return fundamentals for ``tickers`` keyed by the original ticker."""
+    symbols = {t: _yahoo_symbol(t, suffix) for t in tickers}
+    now = datetime.now(timezone.utc)
+
+    result = await db.execute(
+        select(TickerFundamental).where(TickerFundamental.symbol.in_(set(symbols.values())))
+    )
+    rows = {r.symbol: r for r in result.scalars().all()}
+    data = {s: _to_dict(r) for s, r in rows.items()}
+
+    # Cold symbols: nothing to serve yet, fetch inline
+    missing = [s for s in dict.fromkeys(symbols.values()) if s not in rows]
+    if missing:
+        fetched = await fetch_fundamentals(missing, suffix="")
+        fetched = {s: fetched.get(s) or {} for s in missing}
+        await _upsert(db, fetched, now)
+        data.update(fetched)
+
+    # Keep requested_at roughly current so the refresher knows which
+    # symbols are still in use (written at most once a day per symbol)
+    idle = [s for s, r in rows.items() if now - r.requested_at > timedelta(days=1)]
+    if idle:
+        await db.execute(
+            update(TickerFundamental)
+            .where(TickerFundamental.symbol.in_(idle))
+            .values(requested_at=now)
+        )
+    if missing or idle:
+        await db.commit()
+
+    stale = [s for s, r in rows.items() if _is_stale(r, now)]
+    if stale:
+        enqueue_refresh(stale)
+
+    return {t: data[s] for t, s in symbols.items() if s in data}
+
+
+@periodic("fundamentals-refresh", seconds=settings.fundamentals_refresh_interval_seconds, initial_delay=60)
+async def refresh_fundamentals() -> None:
+    """Refresh queued symbols plus stale rows still requested by users."""
+    now = datetime.now(timezone.utc)
+    batch_size = settings.fundamentals_refresh_batch
+    min_age = timedelta(hours=min(settings.fundamentals_retry_hours, settings.fundamentals_max_age_hours))
+
+    async with async_session() as db:
+        result = await db.execute(
+            select(TickerFundamental)
+            .where(
+                TickerFundamental.requested_at >= now - timedelta(days=settings.fundamentals_active_days),
+                or_(
+                    TickerFundamental.fetched_at < now - min_age,
+                    extract("year", TickerFundamental.fetched_at) < now.year,
+                ),
+            )
+            .order_by(TickerFundamental.fetched_at)
+            .limit(batch_size * 4)
+        )
+        candidates = {r.symbol: r for r in result.scalars().all() if _is_stale(r, now)}
+
+        queued = list(_pending)[:batch_size]
+        _pending.difference_update(queued)
+        batch = list(dict.fromkeys(queued + list(candidates)))[:batch_size]
+        if not batch:
+            return
+
+        fetched = await fetch_fundamentals(batch, suffix="")
+        fresh = {s: d for s, d in fetched.items() if d}
+        await _upsert(db, fresh, now)
+
+        # Yahoo returned nothing: rows with data keep their values and are
+        # backdated so the max age runs out after the retry delay (not into
+        # last year, which would make them stale at once); rows without data
+        # already retry after the shorter delay, counted from now
+        failed = [s for s in batch if s not in fresh]
+        if failed:
+            has_data = or_(*(getattr(TickerFundamental, f).is_not(None) for f in FIELDS))
+            retry_at = max(
+                now - timedelta(hours=settings.fundamentals_max_age_hours - settings.fundamentals_retry_hours),
+                now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0),
+            )
+            await db.execute(
+                update(TickerFundamental)
+                .where(TickerFundamental.symbol.in_(failed), has_data)
+                .values(fetched_at=retry_at)
+            )
+            await db.execute(
+                update(TickerFundamental)
+                .where(TickerFundamental.symbol.in_(failed), ~has_data)
+                .values(fetched_at=now)
+            )
+        await db.commit()
+
+    # Run again right away only for stale rows this run did not attempt
+    if _pending or set(candidates) - set(batch):
+        refresh_fundamentals.trigger()
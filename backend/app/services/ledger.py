@@ -0,0 +1,583 @@
+"""
+Position ledger: asset positions derived from the ordered transaction stream.
+
+Transactions are replayed per asset in ``(date, id)`` order on top of an
+opening balance. Checkpoints (``position_checkpoints``) store the position
+every ``ledger_checkpoint_interval`` transactions plus after the latest
+one, so inserting, editing or deleting a transaction only replays the
+transactions after the nearest checkpoint before it; appending a new
+transaction replays just that one.
+
+The opening balance is whatever the asset row held before its first
+transaction (e.g. a position typed in by hand). It is derived by reverting
+the asset's transactions from the current row whenever the row no longer
+matches the latest checkpoint, so direct edits of the row are kept as if
+they predated the first transaction.
+
+Writers lock the asset rows they replay (``SELECT ... FOR UPDATE``) before
+reading them, so concurrent writes to the same asset run one after the
+other instead of overwriting each other's average price, while writes to
+different assets proceed in parallel. Locks are taken in ``(class, key)``
+order; callers run their work through ``core.db_retry.run_with_retry`` so
+the rare deadlock that still happens is retried.
+"""
+
+import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import select, delete, func, tuple_, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.transaction import Transaction
+from ..models.br_stock import BrStock
+from ..models.fii import Fii
+from ..models.intl_stock import IntlStock
+from ..models.fixed_income import FixedIncome
+from ..models.real_asset import RealAsset
+from ..models.fi_etf import FiEtf
+from ..models.cash_account import CashAccount
+from ..models.position_checkpoint import PositionCheckpoint
+from .realized_pnl import mark_changed
+
+MODEL_MAP = {
+    "br_stock": (BrStock, "ticker"),
+    "fii": (Fii, "ticker"),
+    "intl_stock": (IntlStock, "ticker"),
+    "fixed_income": (FixedIncome, "id"),
+    "real_asset": (RealAsset, "id"),
+    "fi_etf": (FiEtf, "ticker"),
+    "cash_account": (CashAccount, "id"),
+}
+
+VALID_OPS = {
+    "br_stock": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
+    "fii": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
+    "intl_stock": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
+    "fixed_income": {"aporte", "resgate", "transferencia"},
+    "real_asset": {"compra", "venda"},
+    "fi_etf": {"compra", "venda", "transferencia", "desdobramento", "bonificacao"},
+    "cash_account": {"aporte", "resgate", "transferencia"},
+}
+
+
+# Position columns owned by the ledger, per asset class
+STATE_FIELDS = {
+    "br_stock": ("qty", "avg_price", "broker"),
+    "fii": ("qty", "avg_price", "broker"),
+    "fi_etf": ("qty", "avg_price", "broker"),
+    "intl_stock": ("qty", "avg_price_usd", "broker"),
+    "fixed_income": ("applied_value", "current_value", "broker"),
+    "real_asset": ("estimated_value",),
+    "cash_account": ("balance", "institution"),
+}
+
+OPENING_KEY = (datetime.date(1, 1, 1), 0)
+
+
+def asset_ref(tx) -> tuple[str, str] | None:
+    """``(asset_class, key)`` of the asset a transaction moves, if any."""
+    entry = MODEL_MAP.get(tx.asset_class)
+    if not entry:
+        return None
+    key = tx.ticker if entry[1] == "ticker" else tx.asset_id
+    if not key:
+        return None
+    return tx.asset_class, key.upper() if entry[1] == "ticker" else key
+
+
+def tx_key(tx) -> tuple[datetime.date, int]:
+    return tx.date, tx.id
+
+
+async def get_asset(db: AsyncSession, user_id: str, ref: tuple[str, str], lock: bool = False):
+    """The asset row behind ``ref``; with ``lock`` it is re-read FOR UPDATE."""
+    model, key_field = MODEL_MAP[ref[0]]
+    with_for_update = True if lock else None
+    if key_field == "ticker":
+        # Composite PK: (user_id, ticker)
+        return await db.get(model, (user_id, ref[1]), with_for_update=with_for_update)
+    asset = await db.get(model, ref[1], with_for_update=with_for_update)
+    return asset if asset and asset.user_id == user_id else None
+
+
+async def lock_assets(db: AsyncSession, user_id: str, refs) -> dict[tuple[str, str], object]:
+    """Load and lock the asset rows behind ``refs``, one query per class.
+
+    Rows are locked in ``(class, key)`` order. Call before the first
+    ledger write of a request that touches many assets (imports, bulk
+    edits), so it does not acquire them one by one in data order.
+    """
+    by_class: dict[str, list[str]] = {}
+    for cls, key in dict.fromkeys(r for r in refs if r):
+        by_class.setdefault(cls, []).append(key)
+    assets = {}
+    for cls in sorted(by_class):
+        model, key_field = MODEL_MAP[cls]
+        column = getattr(model, key_field)
+        result = await db.execute(
+            select(model)
+            .where(model.user_id == user_id, column.in_(by_class[cls]))
+            .order_by(column)
+            .with_for_update()
+        )
+        for asset in result.scalars().all():
+            assets[(cls, getattr(asset, key_field))] = asset
+    return assets
+
+
+# ---------------------------------------------------------------------------
+# Position effects of a single transaction
+# ---------------------------------------------------------------------------
+
+def apply_effect(asset, tx) -> None:
+    """Apply a transaction's effect on the underlying asset position."""
+    op = tx.operation_type
+    cls = tx.asset_class
+
+    if cls in ("br_stock", "fii", "fi_etf"):
+        if op == "compra":
+            old_qty = asset.qty or 0
+            old_avg = asset.avg_price or 0
+            new_qty = old_qty + (tx.qty or 0)
+            if new_qty > 0:
+                asset.avg_price = ((old_qty * old_avg) + ((tx.qty or 0) * (tx.unit_price or 0))) / new_qty
+            asset.qty = int(new_qty)
+        elif op == "venda":
+            asset.qty = int((asset.qty or 0) - (tx.qty or 0))
+        elif op == "transferencia":
+            if tx.broker_destination:
+                asset.broker = tx.broker_destination
+        elif op == "desdobramento":
+            factor = tx.qty or 1
+            asset.qty = int((asset.qty or 0) * factor)
+            if factor > 0:
+                asset.avg_price = (asset.avg_price or 0) / factor
+        elif op == "bonificacao":
+            old_qty = asset.qty or 0
+            old_avg = asset.avg_price or 0
+            bonus_qty = tx.qty or 0
+            new_qty = old_qty + bonus_qty
+            if new_qty > 0:
+                asset.avg_price = (old_qty * old_avg) / new_qty
+            asset.qty = int(new_qty)
+
+    elif cls == "intl_stock":
+        if op == "compra":
+            old_qty = asset.qty or 0
+            old_avg = asset.avg_price_usd or 0
+            new_qty = old_qty + (tx.qty or 0)
+            if new_qty > 0:
+                asset.avg_price_usd = ((old_qty * old_avg) + ((tx.qty or 0) * (tx.unit_price or 0))) / new_qty
+            asset.qty = int(new_qty)
+        elif op == "venda":
+            asset.qty = int((asset.qty or 0) - (tx.qty or 0))
+        elif op == "transferencia":
+            if tx.broker_destination:
+                asset.broker = tx.broker_destination
+        elif op == "desdobramento":
+            factor = tx.qty or 1
+            asset.qty = int((asset.qty or 0) * factor)
+            if factor > 0:
+                asset.avg_price_usd = (asset.avg_price_usd or 0) / factor
+        elif op == "bonificacao":
+            old_qty = asset.qty or 0
+            old_avg = asset.avg_price_usd or 0
+            bonus_qty = tx.qty or 0
+            new_qty = old_qty + bonus_qty
+            if new_qty > 0:
+                asset.avg_price_usd = (old_qty * old_avg) / new_qty
+            asset.qty = int(new_qty)
+
+    elif cls == "fixed_income":
+        if op == "aporte":
+            asset.applied_value = (asset.applied_value or 0) + (tx.total_value or 0)
+            asset.current_value = (asset.current_value or 0) + (tx.total_value or 0)
+        elif op == "resgate":
+            asset.current_value = (asset.current_value or 0) - (tx.total_value or 0)
+        elif op == "transferencia":
+            if tx.broker_destination:
+                asset.broker = tx.broker_destination
+
+    elif cls == "real_asset":
+        if op == "compra":
+            asset.estimated_value = (asset.estimated_value or 0) + (tx.total_value or 0)
+        elif op == "venda":
+            asset.estimated_value = (asset.estimated_value or 0) - (tx.total_value or 0)
+
+    elif cls == "cash_account":
+        if op == "aporte":
+            asset.balance = (asset.balance or 0) + (tx.total_value or 0)
+        elif op == "resgate":
+            asset.balance = (asset.balance or 0) - (tx.total_value or 0)
+        elif op == "transferencia":
+            if tx.broker_destination:
+                asset.institution = tx.broker_destination
+
+
+def revert_effect(asset, tx) -> None:
+    """Revert a transaction's effect (inverse of apply_effect)."""
+    op = tx.operation_type
+    cls = tx.asset_class
+
+    if cls in ("br_stock", "fii", "fi_etf"):
+        if op == "compra":
+            cur_qty = asset.qty or 0
+            cur_avg = asset.avg_price or 0
+            tx_qty = tx.qty or 0
+            old_qty = cur_qty - tx_qty
+            if old_qty > 0:
+                asset.avg_price = ((cur_qty * cur_avg) - (tx_qty * (tx.unit_price or 0))) / old_qty
+            elif old_qty == 0:
+                asset.avg_price = 0
+            asset.qty = int(max(old_qty, 0))
+        elif op == "venda":
+            asset.qty = int((asset.qty or 0) + (tx.qty or 0))
+        elif op == "transferencia":
+            if tx.broker:
+                asset.broker = tx.broker
+        elif op == "desdobramento":
+            factor = tx.qty or 1
+            if factor > 0:
+                asset.qty = int((asset.qty or 0) / factor)
+                asset.avg_price = (asset.avg_price or 0) * factor
+        elif op == "bonificacao":
+            cur_qty = asset.qty or 0
+            bonus_qty = tx.qty or 0
+            old_qty = cur_qty - bonus_qty
+            if old_qty > 0:
+                asset.avg_price = ((asset.avg_price or 0) * cur_qty) / old_qty
+            asset.qty = int(max(old_qty, 0))
+
+    elif cls == "intl_stock":
+        if op == "compra":
+            cur_qty = asset.qty or 0
+            cur_avg = asset.avg_price_usd or 0
+            tx_qty = tx.qty or 0
+            old_qty = cur_qty - tx_qty
+            if old_qty > 0:
+                asset.avg_price_usd = ((cur_qty * cur_avg) - (tx_qty * (tx.unit_price or 0))) / old_qty
+            elif old_qty == 0:
+                asset.avg_price_usd = 0
+            asset.qty = int(max(old_qty, 0))
+        elif op == "venda":
+            asset.qty = int((asset.qty or 0) + (tx.qty or 0))
+        elif op == "transferencia":
+            if tx.broker:
+                asset.broker = tx.broker
+        elif op == "desdobramento":
+            factor = tx.qty or 1
+            if factor > 0:
+                asset.qty = int((asset.qty or 0) / factor)
+                asset.avg_price_usd = (asset.avg_price_usd or 0) * factor
+        elif op == "bonificacao":
+            cur_qty = asset.qty or 0
+            bonus_qty = tx.qty or 0
+            old_qty = cur_qty - bonus_qty
+            if old_qty > 0:
+                asset.avg_price_usd = ((asset.avg_price_usd or 0) * cur_qty) / old_qty
+            asset.qty = int(max(old_qty, 0))
+
+    elif cls == "fixed_income":
+        if op == "aporte":
+            asset.applied_value = (asset.applied_value or 0) - (tx.total_value or 0)
+            asset.current_value = (asset.current_value or 0) - (tx.total_value or 0)
+        elif op == "resgate":
+            asset.current_value = (asset.current_value or 0) + (tx.total_value or 0)
+        elif op == "transferencia":
+            if tx.broker:
+                asset.broker = tx.broker
+
+    elif cls == "real_asset":
+        if op == "compra":
+            asset.estimated_value = (asset.estimated_value or 0) - (tx.total_value or 0)
+        elif op == "venda":
+            asset.estimated_value = (asset.estimated_value or 0) + (tx.total_value or 0)
+
+    elif cls == "cash_account":
+        if op == "aporte":
+            asset.balance = (asset.balance or 0) - (tx.total_value or 0)
+        elif op == "resgate":
+            asset.balance = (asset.balance or 0) + (tx.total_value or 0)
+        elif op == "transferencia":
+            if tx.broker:
+                asset.institution = tx.broker
+
+
+# ---------------------------------------------------------------------------
+# Ledger engine
+# ---------------------------------------------------------------------------
+
+def _snapshot(asset, cls: str) -> dict:
+    return {f: getattr(asset, f) for f in STATE_FIELDS[cls]}
+
+
+def _cp_key(cp: PositionCheckpoint) -> tuple[datetime.date, int]:
+    return cp.tx_date, cp.tx_id
+
+
+def _asset_filter(user_id: str, ref: tuple[str, str]):
+    cls, key = ref
+    if MODEL_MAP[cls][1] == "ticker":
+        match = func.upper(Transaction.ticker) == key
+    else:
+        match = Transaction.asset_id == key
+    return (Transaction.user_id == user_id, Transaction.asset_class == cls, match)
+
+
+def _checkpoint_filter(user_id: str, ref: tuple[str, str]):
+    return (
+        PositionCheckpoint.user_id == user_id,
+        PositionCheckpoint.asset_class == ref[0],
+        PositionCheckpoint.asset_key == ref[1],
+    )
+
+
+def _is_current(head: PositionCheckpoint | None, last_key: tuple, asset, cls: str) -> bool:
+    """Whether the latest checkpoint still describes the asset row."""
+    return head is not None and _cp_key(head) == last_key and head.state == _snapshot(asset, cls)
+
+
+def opening_state(asset, cls: str, txs_newest_first) -> dict:
+    """Position before any transaction: the row with every transaction reverted."""
+    state = SimpleNamespace(**_snapshot(asset, cls))
+    for tx in txs_newest_first:
+        revert_effect(state, tx)
+    return vars(state)
+
+
+def _opening(user_id: str, ref: tuple[str, str], asset, txs_newest_first) -> PositionCheckpoint:
+    """Opening checkpoint derived with ``opening_state``."""
+    return PositionCheckpoint(
+        user_id=user_id, asset_class=ref[0], asset_key=ref[1],
+        tx_date=OPENING_KEY[0], tx_id=OPENING_KEY[1], tx_count=0,
+        state=opening_state(asset, ref[0], txs_newest_first),
+    )
+
+
+def _replay_onto(user_id: str, ref: tuple[str, str], asset, base: PositionCheckpoint, txs) -> list[PositionCheckpoint]:
+    """Reset ``asset`` to ``base`` and apply ``txs`` (oldest first).
+
+    Returns the checkpoints to store: one every ``ledger_checkpoint_interval``
+    transactions and one after the last.
+    """
+    interval = settings.ledger_checkpoint_interval
+    for field, value in base.state.items():
+        setattr(asset, field, value)
+    checkpoints = []
+    count = base.tx_count
+    for n, tx in enumerate(txs, 1):
+        apply_effect(asset, tx)
+        count += 1
+        if count % interval == 0 or n == len(txs):
+            checkpoints.append(PositionCheckpoint(
+                user_id=user_id, asset_class=ref[0], asset_key=ref[1],
+                tx_date=tx.date, tx_id=tx.id, tx_count=count, state=_snapshot(asset, ref[0]),
+            ))
+    return checkpoints
+
+
+def _superseded(base: PositionCheckpoint, replayed: bool) -> bool:
+    """A previous head is dropped once replaced, unless it is the opening
+    or falls on the checkpoint interval."""
+    return replayed and base.tx_count % settings.ledger_checkpoint_interval != 0
+
+
+async def ensure_opening(db: AsyncSession, user_id: str, ref: tuple[str, str], exclude_ids=()) -> None:
+    """Make sure the asset's checkpoints describe its current row.
+
+    Call before changing the asset's transactions. If the latest
+    checkpoint matches the row and the latest transaction, nothing is
+    done; otherwise the opening balance is rebuilt by reverting every
+    transaction (except ``exclude_ids``, which the row does not reflect
+    yet) from the current row, newest first. Locks the asset row until
+    the caller's transaction ends.
+    """
+    asset = await get_asset(db, user_id, ref, lock=True)
+    if asset is None:
+        return
+
+    head = await db.scalar(
+        select(PositionCheckpoint)
+        .where(*_checkpoint_filter(user_id, ref))
+        .order_by(PositionCheckpoint.tx_date.desc(), PositionCheckpoint.tx_id.desc())
+        .limit(1)
+    )
+    tx_filter = _asset_filter(user_id, ref)
+    if exclude_ids:
+        tx_filter += (Transaction.id.not_in(list(exclude_ids)),)
+    last = (await db.execute(
+        select(Transaction.date, Transaction.id)
+        .where(*tx_filter)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(1)
+    )).first()
+    if _is_current(head, tuple(last) if last else OPENING_KEY, asset, ref[0]):
+        return
+
+    result = await db.execute(
+        select(Transaction).where(*tx_filter).order_by(Transaction.date.desc(), Transaction.id.desc())
+    )
+    opening = _opening(user_id, ref, asset, result.scalars().all())
+    await db.execute(delete(PositionCheckpoint).where(*_checkpoint_filter(user_id, ref)))
+    db.add(opening)
+    await db.flush()
+
+
+async def replay(db: AsyncSession, user_id: str, ref: tuple[str, str], since: tuple[datetime.date, int]) -> None:
+    """Recompute the asset row from the nearest checkpoint before ``since``.
+
+    ``since`` is the ordering key of the earliest transaction that was
+    inserted, changed or removed; checkpoints at or after it are dropped.
+    """
+    mark_changed(db, user_id, since)
+    asset = await get_asset(db, user_id, ref)
+    if asset is None:
+        return
+    cp_filter = _checkpoint_filter(user_id, ref)
+
+    await db.execute(
+        delete(PositionCheckpoint).where(
+            *cp_filter, tuple_(PositionCheckpoint.tx_date, PositionCheckpoint.tx_id) >= since
+        )
+    )
+    base = await db.scalar(
+        select(PositionCheckpoint)
+        .where(*cp_filter)
+        .order_by(PositionCheckpoint.tx_date.desc(), PositionCheckpoint.tx_id.desc())
+        .limit(1)
+    )
+    if base is None:
+        # No opening yet (asset had no ledger history): start from the row
+        base = _opening(user_id, ref, asset, [])
+        db.add(base)
+
+    result = await db.execute(
+        select(Transaction)
+        .where(*_asset_filter(user_id, ref), tuple_(Transaction.date, Transaction.id) > _cp_key(base))
+        .order_by(Transaction.date, Transaction.id)
+    )
+    txs = result.scalars().all()
+    db.add_all(_replay_onto(user_id, ref, asset, base, txs))
+    if _superseded(base, bool(txs)):
+        await db.delete(base)
+    await db.flush()
+
+
+async def record_transaction(db: AsyncSession, tx, user_id: str) -> None:
+    """Reflect a newly added transaction in its asset's position."""
+    ref = asset_ref(tx)
+    if ref is None:
+        return
+    if tx.id is None:
+        await db.flush()
+    await ensure_opening(db, user_id, ref, exclude_ids=(tx.id,))
+    await replay(db, user_id, ref, tx_key(tx))
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+class LedgerBatch:
+    """Ledger updates for many assets with a fixed number of queries.
+
+    Usage: ``load`` every asset the batch may touch before changing any
+    transaction, change transactions (``touch`` each affected asset with
+    the earliest changed ordering key), flush, then ``finish``.
+    """
+
+    def __init__(self, db: AsyncSession, user_id: str):
+        self.db = db
+        self.user_id = user_id
+        self.assets: dict[tuple[str, str], object] = {}
+        self.checkpoints: dict[tuple[str, str], list[PositionCheckpoint]] = {}
+        self.since: dict[tuple[str, str], tuple[datetime.date, int]] = {}
+
+    def _tx_filter(self, refs):
+        by_class: dict[str, list[str]] = {}
+        for cls, key in refs:
+            by_class.setdefault(cls, []).append(key)
+        clauses = []
+        for cls, keys in by_class.items():
+            if MODEL_MAP[cls][1] == "ticker":
+                match = func.upper(Transaction.ticker).in_(keys)
+            else:
+                match = Transaction.asset_id.in_(keys)
+            clauses.append(and_(Transaction.asset_class == cls, match))
+        return and_(Transaction.user_id == self.user_id, or_(*clauses))
+
+    async def _load_txs(self, refs) -> dict[tuple[str, str], list]:
+        result = await self.db.execute(
+            select(Transaction).where(self._tx_filter(refs)).order_by(Transaction.date, Transaction.id)
+        )
+        txs: dict[tuple[str, str], list] = {ref: [] for ref in refs}
+        for tx in result.scalars().all():
+            ref = asset_ref(tx)
+            if ref in txs:
+                txs[ref].append(tx)
+        return txs
+
+    async def load(self, refs) -> None:
+        """Lock and prefetch assets, load checkpoints and transactions and
+        anchor each asset."""
+        refs = [r for r in dict.fromkeys(refs) if r and r not in self.assets]
+        if not refs:
+            return
+
+        self.assets.update(await lock_assets(self.db, self.user_id, refs))
+        refs = [r for r in refs if r in self.assets]
+        if not refs:
+            return
+
+        result = await self.db.execute(
+            select(PositionCheckpoint)
+            .where(
+                PositionCheckpoint.user_id == self.user_id,
+                tuple_(PositionCheckpoint.asset_class, PositionCheckpoint.asset_key).in_(refs),
+            )
+            .order_by(PositionCheckpoint.tx_date, PositionCheckpoint.tx_id)
+        )
+        for ref in refs:
+            self.checkpoints[ref] = []
+        for cp in result.scalars().all():
+            self.checkpoints[(cp.asset_class, cp.asset_key)].append(cp)
+
+        txs = await self._load_txs(refs)
+        for ref in refs:
+            asset, cps, history = self.assets[ref], self.checkpoints[ref], txs[ref]
+            last_key = tx_key(history[-1]) if history else OPENING_KEY
+            if _is_current(cps[-1] if cps else None, last_key, asset, ref[0]):
+                continue
+            for cp in cps:
+                await self.db.delete(cp)
+            opening = _opening(self.user_id, ref, asset, reversed(history))
+            self.db.add(opening)
+            self.checkpoints[ref] = [opening]
+
+    def touch(self, ref, key: tuple[datetime.date, int]) -> None:
+        """Mark ``ref`` for replay from ``key`` (keeps the earliest key)."""
+        mark_changed(self.db, self.user_id, key)
+        if ref in self.assets:
+            self.since[ref] = min(self.since.get(ref, key), key)
+
+    async def finish(self) -> None:
+        """Replay every touched asset from its nearest checkpoint."""
+        if not self.since:
+            return
+        txs = await self._load_txs(list(self.since))
+        for ref, since in self.since.items():
+            cps = self.checkpoints[ref]
+            kept = [cp for cp in cps if _cp_key(cp) < since]
+            for cp in cps[len(kept):]:
+                await self.db.delete(cp)
+            base = kept[-1]
+            replayed = [tx for tx in txs[ref] if tx_key(tx) > _cp_key(base)]
+            new = _replay_onto(self.user_id, ref, self.assets[ref], base, replayed)
+            if _superseded(base, bool(replayed)):
+                await self.db.delete(base)
+                kept.pop()
+            self.db.add_all(new)
+            self.checkpoints[ref] = kept + new
+        self.since.clear()
+        await self.db.flush()
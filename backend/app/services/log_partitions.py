@@ -0,0 +1,132 @@
+"""
+Monthly partitions of ``activity_logs`` (see migration 011).
+
+A daily job keeps partitions ready for the current month and the next
+``activity_log_partitions_ahead`` months, and drops the partitions of
+months older than ``activity_log_retention_months`` before the current
+one. Dropping a partition removes a month of logs at once, without the
+dead rows and vacuum work a ``DELETE`` would leave. Months are in UTC.
+
+Rows outside every monthly partition land in ``activity_logs_default``.
+The job moves them into monthly partitions (created as needed) and
+deletes the ones past retention, so the default partition stays empty
+and never blocks creating a month it holds rows for.
+"""
+
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core.scheduler import periodic
+from ..database import async_session
+
+logger = logging.getLogger(__name__)
+
+PARENT = "activity_logs"
+DEFAULT = f"{PARENT}_default"
+COLUMNS = "id, user_id, action, resource, resource_id, details, ip_address, created_at"
+_NAME_RE = re.compile(rf"^{PARENT}_(\d{{4}})_(\d{{2}})$")
+
+
+def _add_months(month: date, n: int) -> date:
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def _partition_month(name: str) -> date | None:
+    match = _NAME_RE.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+async def _create_partition(db: AsyncSession, month: date) -> None:
+    await db.execute(text(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{month} 00:00+00') TO ('{_add_months(month, 1)} 00:00+00')"
+    ))
+
+
+async def maintain_partitions(db: AsyncSession, today: date | None = None) -> dict:
+    """Create missing upcoming partitions, empty the default one and drop expired ones."""
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    cutoff = _add_months(current, -settings.activity_log_retention_months)
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        f"WHERE i.inhparent = '{PARENT}'::regclass"
+    ))
+    existing = {name for (name,) in result.all()}
+
+    # Months the default partition holds rows for
+    default_months: dict[date, int] = {}
+    if DEFAULT in existing:
+        result = await db.execute(text(
+            "SELECT date_trunc('month', created_at AT TIME ZONE 'UTC')::date, count(*) "
+            f"FROM {DEFAULT} GROUP BY 1"
+        ))
+        default_months = dict(result.all())
+
+    created = []
+    moved = expired = 0
+    if default_months:
+        # A month cannot be created while the default partition holds rows
+        # for it, so the default is detached while its rows are moved
+        await db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT}"))
+        for month in sorted(m for m in default_months if m >= cutoff):
+            if partition_name(month) not in existing:
+                await _create_partition(db, month)
+                existing.add(partition_name(month))
+                created.append(partition_name(month))
+        await db.execute(text(
+            f"INSERT INTO {PARENT} ({COLUMNS}) SELECT {COLUMNS} FROM {DEFAULT} "
+            f"WHERE created_at >= '{cutoff} 00:00+00'"
+        ))
+        await db.execute(text(f"TRUNCATE {DEFAULT}"))
+        await db.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT} DEFAULT"))
+        moved = sum(n for m, n in default_months.items() if m >= cutoff)
+        expired = sum(n for m, n in default_months.items() if m < cutoff)
+
+    for n in range(settings.activity_log_partitions_ahead + 1):
+        month = _add_months(current, n)
+        if partition_name(month) in existing:
+            continue
+        await _create_partition(db, month)
+        created.append(partition_name(month))
+
+    dropped = []
+    for name in sorted(existing):
+        month = _partition_month(name)
+        if month is not None and month < cutoff:
+            await db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+
+    await db.commit()
+    return {
+        "created": created,
+        "dropped": dropped,
+        "moved_from_default": moved,
+        "expired_in_default": expired,
+        "retained_since": cutoff.isoformat(),
+    }
+
+
+@periodic("activity-log-partitions", seconds=24 * 3600)
+async def partitions_job() -> None:
+    async with async_session() as db:
+        report = await maintain_partitions(db)
+    if report["moved_from_default"] or report["expired_in_default"]:
+        logger.warning(
+            "[log-partitions] %d rows outside the monthly partitions moved out of %s, %d expired ones deleted",
+            report["moved_from_default"], DEFAULT, report["expired_in_default"],
+        )
+    if report["created"] or report["dropped"]:
+        logger.info(
+            "[log-partitions] created %s, dropped %s",
+            report["created"] or "none", report["dropped"] or "none",
+        )
@@ -0,0 +1,112 @@
+"""
+Portfolio allocation summary: value per allocation class and the gap to
+each ``AllocationTarget``.
+
+Mirrors ``calculateAllocation`` in ``frontend/src/utils/calculations.js``
+using stored prices. The per-class sums come from one aggregated query;
+the USD exchange rate is applied afterwards, so cached sums stay valid
+while the rate moves.
+"""
+
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.br_stock import BrStock
+from ..models.fii import Fii
+from ..models.intl_stock import IntlStock
+from ..models.fixed_income import FixedIncome
+from ..models.fi_etf import FiEtf
+from ..models.cash_account import CashAccount
+from ..models.real_asset import RealAsset
+from ..models.allocation_target import AllocationTarget
+
+# Same fallback as the frontend when the BCB rate is unavailable
+FALLBACK_EXCHANGE_RATE = 6.05
+
+# Allocation class label (as used by AllocationTarget.asset_class) -> asset classes
+ALLOCATION_CLASSES = {
+    "RV Brasil": ("br_stock",),
+    "FIIs": ("fii",),
+    "RV Exterior": ("intl_stock",),
+    "Renda Fixa": ("fixed_income", "fi_etf"),
+    "Caixa": ("cash_account",),
+}
+
+
+def _totals_query(user_id: str):
+    def part(name, model, value, *where):
+        return select(
+            literal(name).label("asset_class"),
+            func.count().label("positions"),
+            func.coalesce(func.sum(value), 0).label("value"),
+        ).where(model.user_id == user_id, *where)
+
+    return union_all(
+        part("br_stock", BrStock, BrStock.qty * BrStock.current_price),
+        part("fii", Fii, Fii.qty * Fii.current_price),
+        part("intl_stock", IntlStock, IntlStock.qty * IntlStock.current_price_usd),
+        part("fixed_income", FixedIncome, FixedIncome.current_value),
+        part("fi_etf", FiEtf, FiEtf.qty * FiEtf.current_price),
+        part("cash_account", CashAccount, CashAccount.balance),
+        part(
+            "real_asset", RealAsset, RealAsset.estimated_value,
+            RealAsset.include_in_total.is_(True), RealAsset.is_closed.is_(False),
+        ),
+    )
+
+
+async def load_totals(db: AsyncSession, user_id: str) -> dict:
+    """Per-asset-class sums (intl_stock in USD) and the user's targets."""
+    rows = (await db.execute(_totals_query(user_id))).all()
+    result = await db.execute(select(AllocationTarget).where(AllocationTarget.user_id == user_id))
+    return {
+        "totals": {r.asset_class: {"positions": r.positions, "value": float(r.value)} for r in rows},
+        "targets": [
+            {"asset_class": t.asset_class, "target": t.target, "target_type": t.target_type}
+            for t in result.scalars().all()
+        ],
+    }
+
+
+def summarize(raw: dict, exchange_rate: float) -> dict:
+    totals = raw["totals"]
+    rates = {"intl_stock": exchange_rate}
+
+    classes = []
+    for label, members in ALLOCATION_CLASSES.items():
+        value = sum(totals[c]["value"] * rates.get(c, 1.0) for c in members)
+        positions = sum(totals[c]["positions"] for c in members)
+        classes.append({"class": label, "value": value, "positions": positions})
+    total = sum(c["value"] for c in classes)
+    for c in classes:
+        c["pct"] = c["value"] / total * 100 if total else 0
+
+    by_label = {c["class"]: c for c in classes}
+    targets = []
+    for t in raw["targets"]:
+        current = by_label.get(t["asset_class"], {"value": 0.0, "pct": 0.0})
+        if t["target_type"] == "value":
+            target_value = t["target"]
+            target_pct = target_value / total * 100 if total else 0
+        else:
+            target_pct = t["target"]
+            target_value = target_pct / 100 * total
+        targets.append({
+            **t,
+            "current_value": current["value"],
+            "current_pct": current["pct"],
+            "target_value": target_value,
+            "target_pct": target_pct,
+            "delta_value": target_value - current["value"],
+            "delta_pct": target_pct - current["pct"],
+        })
+
+    immobilized = totals["real_asset"]["value"]
+    return {
+        "total": total,
+        "immobilized": immobilized,
+        "total_patrimony": total + immobilized,
+        "exchange_rate": exchange_rate,
+        "classes": classes,
+        "targets": targets,
+    }
@@ -0,0 +1,204 @@
+"""
+Local daily price history (OHLC) per Yahoo symbol.
+
+Bars are downloaded incrementally: each symbol keeps one contiguous
+covered range and only the dates outside it are requested from Yahoo.
+``get_price_matrix`` returns prices for many symbols aligned on a
+common date axis for valuation and history features.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.price_history import PriceBar, PriceHistoryCoverage
+from .yahoo import fetch_daily_bars
+
+PRICE_FIELDS = ("open", "high", "low", "close", "adj_close", "volume")
+
+# Rows per INSERT statement (asyncpg caps a statement at 32767 parameters)
+_INSERT_CHUNK = 2000
+
+
+@dataclass
+class PriceMatrix:
+    """Prices aligned on a shared date axis: ``values[i, j]`` is symbol j on dates[i]."""
+
+    dates: list[date]
+    symbols: list[str]
+    values: np.ndarray
+
+    def to_dict(self) -> dict:
+        return {
+            "dates": [d.isoformat() for d in self.dates],
+            "series": {
+                s: [None if np.isnan(v) else float(v) for v in self.values[:, j]]
+                for j, s in enumerate(self.symbols)
+            },
+        }
+
+
+def _gaps(
+    coverage: PriceHistoryCoverage | None, start: date, end: date, now: datetime
+) -> list[tuple[date, date]]:
+    """Date ranges to download so coverage spans [start, end] contiguously.
+
+    Gaps always extend from the edge of the existing coverage, so the
+    covered range never has holes in it. An unconfirmed empty range is
+    downloaded again once its retry time has passed.
+    """
+    if coverage is None:
+        return [(start, end)]
+    gaps = []
+    if start < coverage.start_date:
+        gaps.append((start, coverage.start_date - timedelta(days=1)))
+    if end > coverage.end_date:
+        gaps.append((coverage.end_date + timedelta(days=1), end))
+    if coverage.retry_after is not None and coverage.retry_after <= now:
+        gaps.append((coverage.unconfirmed_start, coverage.unconfirmed_end))
+    return gaps
+
+
+async def _insert_bars(db: AsyncSession, symbol: str, bars: list[dict]) -> None:
+    for i in range(0, len(bars), _INSERT_CHUNK):
+        chunk = [{"symbol": symbol, **b} for b in bars[i:i + _INSERT_CHUNK]]
+        stmt = pg_insert(PriceBar).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceBar.symbol, PriceBar.date],
+            set_={f: stmt.excluded[f] for f in PRICE_FIELDS},
+        )
+        await db.execute(stmt)
+
+
+async def ensure_history(db: AsyncSession, symbols: list[str], start: date, end: date) -> None:
+    """Download whatever part of [start, end] is missing for each symbol.
+
+    Only closed sessions are stored: ``end`` is capped at yesterday, since
+    today's bar keeps moving until the close (live quotes cover it).
+    """
+    end = min(end, date.today() - timedelta(days=1))
+    if start > end:
+        return
+
+    result = await db.execute(
+        select(PriceHistoryCoverage).where(PriceHistoryCoverage.symbol.in_(symbols))
+    )
+    coverage = {c.symbol: c for c in result.scalars().all()}
+
+    # Symbols that miss the same range are downloaded together; the common
+    # case (daily top-up from the last stored date) becomes one request.
+    now = datetime.now(timezone.utc)
+    by_range: dict[tuple[date, date], list[str]] = {}
+    for symbol in dict.fromkeys(symbols):
+        for gap in _gaps(coverage.get(symbol), start, end, now):
+            by_range.setdefault(gap, []).append(symbol)
+    if not by_range:
+        return
+
+    # Bars found per downloaded gap, for each symbol
+    found: dict[str, dict[tuple[date, date], int]] = {}
+    for (gap_start, gap_end), group in by_range.items():
+        bars = await fetch_daily_bars(group, gap_start, gap_end)
+        for symbol in group:
+            symbol_bars = bars.get(symbol, [])
+            found.setdefault(symbol, {})[(gap_start, gap_end)] = len(symbol_bars)
+            await _insert_bars(db, symbol, symbol_bars)
+
+    # Every gap ends up covered. A long gap that came back empty is only
+    # trusted when the same download returned bars for the symbol on the
+    # other side of it (dates before listing or after delisting): Yahoo
+    # answered for the symbol, it just did not trade then. Otherwise it may
+    # be a Yahoo hiccup, so the gap is kept unconfirmed and downloaded once
+    # more after price_history_retry_hours; empty again, it is accepted.
+    plain, marked = [], []
+    for symbol, gaps in found.items():
+        row = {"symbol": symbol, "start_date": start, "end_date": end}
+        current = coverage.get(symbol)
+        pending = None
+        if current is not None and current.retry_after is not None:
+            pending = (current.unconfirmed_start, current.unconfirmed_end)
+        unconfirmed = None if pending in gaps else pending
+        for gap, count in gaps.items():
+            if count or (gap[1] - gap[0]).days < 7 or gap == pending:
+                continue
+            # Gaps never overlap, so bars in any other gap lie beyond this one
+            if any(n for other, n in gaps.items() if other != gap):
+                continue
+            unconfirmed = gap if unconfirmed is None else (
+                min(unconfirmed[0], gap[0]), max(unconfirmed[1], gap[1])
+            )
+
+        if unconfirmed == pending:
+            plain.append(row)
+            continue
+        row["unconfirmed_start"], row["unconfirmed_end"] = unconfirmed or (None, None)
+        row["retry_after"] = now + timedelta(hours=settings.price_history_retry_hours) if unconfirmed else None
+        marked.append(row)
+
+    # Widened in the database, so concurrent downloads for a symbol merge
+    # their ranges instead of overwriting each other
+    for rows in (plain, marked):
+        if not rows:
+            continue
+        stmt = pg_insert(PriceHistoryCoverage).values(rows)
+        set_ = {
+            "start_date": func.least(PriceHistoryCoverage.start_date, stmt.excluded.start_date),
+            "end_date": func.greatest(PriceHistoryCoverage.end_date, stmt.excluded.end_date),
+        }
+        if rows is marked:
+            set_.update({f: stmt.excluded[f] for f in ("unconfirmed_start", "unconfirmed_end", "retry_after")})
+        stmt = stmt.on_conflict_do_update(index_elements=[PriceHistoryCoverage.symbol], set_=set_)
+        await db.execute(stmt)
+    await db.commit()
+
+
+async def get_price_matrix(
+    db: AsyncSession,
+    symbols: list[str],
+    start: date,
+    end: date,
+    field: str = "close",
+    forward_fill: bool = True,
+) -> PriceMatrix:
+    """Load ``field`` for ``symbols`` in [start, end] as an aligned matrix.
+
+    Missing history is fetched first. With ``forward_fill`` each symbol
+    carries its last known price over dates it did not trade (holidays
+    differ between B3 and US exchanges); leading gaps stay NaN.
+    """
+    if field not in PRICE_FIELDS:
+        raise ValueError(f"Unknown price field: {field}")
+    symbols = list(dict.fromkeys(symbols))
+    await ensure_history(db, symbols, start, end)
+
+    col = getattr(PriceBar, field)
+    result = await db.execute(
+        select(PriceBar.symbol, PriceBar.date, col)
+        .where(PriceBar.symbol.in_(symbols), PriceBar.date >= start, PriceBar.date <= end)
+        .order_by(PriceBar.date)
+    )
+    rows = result.all()
+
+    dates = sorted({r[1] for r in rows})
+    date_idx = {d: i for i, d in enumerate(dates)}
+    sym_idx = {s: j for j, s in enumerate(symbols)}
+    values = np.full((len(dates), len(symbols)), np.nan)
+    for symbol, day, value in rows:
+        if value is not None:
+            values[date_idx[day], sym_idx[symbol]] = value
+
+    if forward_fill and len(dates):
+        # Index of the last non-NaN row at or before each row, per column
+        mask = ~np.isnan(values)
+        idx = np.where(mask, np.arange(len(dates))[:, None], 0)
+        np.maximum.accumulate(idx, axis=0, out=idx)
+        filled = values[idx, np.arange(len(symbols))]
+        filled[~np.maximum.accumulate(mask, axis=0)] = np.nan
+        values = filled
+
+    return PriceMatrix(dates=dates, symbols=symbols, values=values)
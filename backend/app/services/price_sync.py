@@ -0,0 +1,93 @@
+"""
+Server-side price write-back.
+
+Fetches each distinct ticker held by any user once and writes the price
+to every holder with one set-based UPDATE per table.
+"""
+
+from sqlalchemy import Float, String, column, select, union, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core import user_cache
+from ..core.scheduler import periodic
+from ..database import async_session
+from ..models.br_stock import BrStock
+from ..models.fii import Fii
+from ..models.fi_etf import FiEtf
+from ..models.intl_stock import IntlStock
+from ..models.watchlist import WatchlistItem
+from .yahoo import fetch_quotes
+
+# (model, price column name, Yahoo suffix)
+PRICE_TABLES = [
+    (BrStock, "current_price", ".SA"),
+    (Fii, "current_price", ".SA"),
+    (FiEtf, "current_price", ".SA"),
+    (WatchlistItem, "current_price", ".SA"),
+    (IntlStock, "current_price_usd", ""),
+]
+
+
+async def _distinct_tickers(db: AsyncSession, suffix: str) -> list[str]:
+    selects = [select(model.ticker) for model, _, sfx in PRICE_TABLES if sfx == suffix]
+    result = await db.execute(union(*selects))
+    return sorted(r[0] for r in result.all() if r[0])
+
+
+async def _write_prices(db: AsyncSession, model, price_field: str, prices: dict[str, float]) -> list[str]:
+    """UPDATE ... FROM (VALUES ...) for every holder whose price changed.
+
+    Returns the user id of every updated row.
+    """
+    price_col = getattr(model, price_field)
+    v = values(
+        column("ticker", String), column("price", Float), name="quotes"
+    ).data(list(prices.items()))
+    result = await db.execute(
+        update(model)
+        .where(model.ticker == v.c.ticker, price_col.is_distinct_from(v.c.price))
+        .values({price_field: v.c.price})
+        .returning(model.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+
+async def sync_prices(db: AsyncSession) -> dict:
+    """Refresh stored prices for all users. Returns per-table update counts."""
+    tickers_total = 0
+    quoted_total = 0
+    updated: dict[str, int] = {}
+    holders: set[str] = set()
+
+    for suffix in dict.fromkeys(sfx for _, _, sfx in PRICE_TABLES):
+        tickers = await _distinct_tickers(db, suffix)
+        tickers_total += len(tickers)
+        if not tickers:
+            continue
+        quotes = await fetch_quotes(tickers, suffix=suffix)
+        prices = {
+            q["symbol"]: q["regularMarketPrice"]
+            for q in quotes
+            if q.get("regularMarketPrice")
+        }
+        quoted_total += len(prices)
+        if not prices:
+            continue
+        for model, price_field, sfx in PRICE_TABLES:
+            if sfx == suffix:
+                users = await _write_prices(db, model, price_field, prices)
+                updated[model.__tablename__] = len(users)
+                holders.update(users)
+
+    await db.commit()
+    for user_id in holders:
+        user_cache.invalidate_user(user_id)
+    return {"tickers": tickers_total, "quoted": quoted_total, "updated": updated}
+
+
+@periodic("price-sync", seconds=settings.price_sync_interval_seconds, initial_delay=30)
+async def price_sync_job() -> None:
+    async with async_session() as db:
+        await sync_prices(db)
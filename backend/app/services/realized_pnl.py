@@ -0,0 +1,353 @@
+"""
+Realized P&L and monthly tax (DARF) report.
+
+The engine walks a user's equity transactions (stocks, FIIs, ETFs and
+foreign stocks) once in ``(date, id)`` order and keeps the cost basis of
+each position as lots: one merged lot for average cost (the method the
+Receita Federal requires) or one lot per purchase for FIFO. Splits
+rescale every lot, bonus shares enter at their declared unit cost and
+transfers between brokers leave the basis unchanged. Buy fees are added
+to the cost and sell fees deducted from the proceeds.
+
+Engine states are kept per user, with a snapshot at every year end.
+Transactions committed after the stored state are applied on top of it;
+a committed change at or before it (reported by the ledger through
+``mark_changed``) rewinds the state to the last snapshot before the
+change, so only the years from there on are walked again.
+
+Tax rules cover swing trade only (day trades are not told apart). Stock
+gains are taxed at 15% and exempt in months whose stock sales total at
+most R$ 20,000; FII gains at 20% with no exemption. Losses are carried
+forward per category and taxes below the DARF minimum roll over to the
+next month. Fixed-income ETFs are taxed at source and foreign stocks
+yearly, so their results are reported without monthly tax (foreign
+amounts are in USD).
+"""
+
+import copy
+import datetime
+from collections import deque
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, select, func, tuple_
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..core.cache import TTLCache
+from ..core.singleflight import SingleFlight
+from ..database import async_session
+from ..models.transaction import Transaction
+
+METHODS = ("average", "fifo")
+TRACKED_CLASSES = ("br_stock", "fii", "fi_etf", "intl_stock")
+
+# DARF categories: asset class, tax rate, monthly sales exemption
+TAX_RULES = {
+    "acoes": ("br_stock", 0.15, 20_000.0),
+    "fii": ("fii", 0.20, None),
+}
+DARF_MINIMUM = 10.0
+
+QTY_EPSILON = 1e-9
+MAX_TX_ID = 2**31 - 1
+OPENING_KEY = (datetime.date.min, 0)
+
+# Session.info key for changes reported before the session commits
+_INFO_KEY = "realized_pnl_changes"
+
+
+# ---------------------------------------------------------------------------
+# Cost basis
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Lot:
+    qty: float
+    unit_cost: float
+
+
+@dataclass
+class Position:
+    lots: deque[Lot] = field(default_factory=deque)
+
+    def buy(self, qty: float, cost: float, fifo: bool) -> None:
+        if qty <= 0:
+            return
+        if fifo or not self.lots:
+            self.lots.append(Lot(qty, cost / qty))
+            return
+        lot = self.lots[0]
+        lot.unit_cost = (lot.qty * lot.unit_cost + cost) / (lot.qty + qty)
+        lot.qty += qty
+
+    def sell(self, qty: float) -> tuple[float, float]:
+        """Remove ``qty`` from the oldest lots: ``(cost basis, qty not held)``."""
+        cost = 0.0
+        remaining = qty
+        while remaining > QTY_EPSILON and self.lots:
+            lot = self.lots[0]
+            taken = min(lot.qty, remaining)
+            cost += taken * lot.unit_cost
+            lot.qty -= taken
+            remaining -= taken
+            if lot.qty <= QTY_EPSILON:
+                self.lots.popleft()
+        return cost, max(remaining, 0.0)
+
+    def split(self, factor: float) -> None:
+        for lot in self.lots:
+            lot.qty *= factor
+            lot.unit_cost /= factor
+
+
+# ---------------------------------------------------------------------------
+# Engine state
+# ---------------------------------------------------------------------------
+
+def _empty_totals() -> dict:
+    return {"sales": 0.0, "cost": 0.0, "fees": 0.0, "realized": 0.0}
+
+
+@dataclass
+class _Snapshot:
+    """State after every transaction dated up to ``day`` (a year end)."""
+
+    day: datetime.date
+    tx_count: int
+    positions: dict
+    realized: dict
+    unmatched_sells: int
+
+
+@dataclass
+class EngineState:
+    method: str
+    positions: dict[tuple[str, str], Position] = field(default_factory=dict)
+    # "YYYY-MM" -> asset class -> totals
+    months: dict[str, dict[str, dict]] = field(default_factory=dict)
+    # (asset class, ticker) -> realized result
+    realized: dict[tuple[str, str], float] = field(default_factory=dict)
+    unmatched_sells: int = 0
+    last_key: tuple[datetime.date, int] = OPENING_KEY
+    tx_count: int = 0
+    snapshots: list[_Snapshot] = field(default_factory=list)
+
+    def _snapshot_until(self, day: datetime.date) -> None:
+        """Snapshot the year that ends before ``day`` once it is complete."""
+        last_day = self.last_key[0]
+        if self.snapshots and self.snapshots[-1].day.year == last_day.year:
+            return
+        if self.tx_count and last_day.year < day.year:
+            self.snapshots.append(_Snapshot(
+                day=datetime.date(last_day.year, 12, 31),
+                tx_count=self.tx_count,
+                positions=copy.deepcopy(self.positions),
+                realized=dict(self.realized),
+                unmatched_sells=self.unmatched_sells,
+            ))
+
+    def apply(self, tx: Transaction) -> None:
+        self._snapshot_until(tx.date)
+        ref = (tx.asset_class, tx.ticker.upper())
+        pos = self.positions.setdefault(ref, Position())
+        op = tx.operation_type
+        qty = tx.qty or 0
+        fees = tx.fees or 0
+
+        if op == "compra":
+            pos.buy(qty, qty * (tx.unit_price or 0) + fees, self.method == "fifo")
+        elif op == "bonificacao":
+            # Bonus shares cost the value capitalized per share (0 if not informed)
+            pos.buy(qty, qty * (tx.unit_price or 0), self.method == "fifo")
+        elif op == "desdobramento":
+            if qty > 0:
+                pos.split(qty)
+        elif op == "venda":
+            basis, missing = pos.sell(qty)
+            if missing > QTY_EPSILON:
+                self.unmatched_sells += 1
+            proceeds = qty * (tx.unit_price or 0)
+            result = proceeds - fees - basis
+            totals = self.months.setdefault(tx.date.strftime("%Y-%m"), {}).setdefault(
+                tx.asset_class, _empty_totals()
+            )
+            totals["sales"] += proceeds
+            totals["cost"] += basis
+            totals["fees"] += fees
+            totals["realized"] += result
+            self.realized[ref] = self.realized.get(ref, 0.0) + result
+        # transferencia: moves between brokers, the basis is unchanged
+
+        self.last_key = (tx.date, tx.id)
+        self.tx_count += 1
+
+    def rewound(self, since: tuple[datetime.date, int]) -> "EngineState":
+        """A new state holding only what precedes ``since``."""
+        kept = [s for s in self.snapshots if s.day < since[0]]
+        state = EngineState(method=self.method, snapshots=kept)
+        if kept:
+            base = kept[-1]
+            last_month = base.day.strftime("%Y-%m")
+            state.positions = copy.deepcopy(base.positions)
+            state.realized = dict(base.realized)
+            state.unmatched_sells = base.unmatched_sells
+            state.months = {
+                month: {cls: dict(t) for cls, t in classes.items()}
+                for month, classes in self.months.items() if month <= last_month
+            }
+            state.last_key = (base.day, MAX_TX_ID)
+            state.tx_count = base.tx_count
+        return state
+
+
+_states = TTLCache(maxsize=settings.user_cache_max_entries, ttl=settings.user_cache_ttl_seconds)
+# Bumped per user when a committed change rewinds their states
+_generation: dict[str, int] = {}
+_flight = SingleFlight()
+
+
+def mark_changed(db, user_id: str, since: tuple[datetime.date, int]) -> None:
+    """Record that the user's transactions change from ``since`` on.
+
+    Applied when ``db`` commits and discarded if it rolls back.
+    """
+    changes = db.info.setdefault(_INFO_KEY, {})
+    changes[user_id] = min(changes.get(user_id, since), since)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    for user_id, since in session.info.pop(_INFO_KEY, {}).items():
+        _generation[user_id] = _generation.get(user_id, 0) + 1
+        for method in METHODS:
+            state = _states.get((user_id, method))
+            if state is not None and since <= state.last_key:
+                _states.set((user_id, method), state.rewound(since))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
+
+
+async def _advance(user_id: str, method: str) -> EngineState:
+    """The user's state brought up to date with the committed transactions."""
+    generation = _generation.get(user_id, 0)
+    state = _states.get((user_id, method)) or EngineState(method=method)
+    tracked = (
+        Transaction.user_id == user_id,
+        Transaction.asset_class.in_(TRACKED_CLASSES),
+        Transaction.ticker.is_not(None),
+        Transaction.ticker != "",
+    )
+    async with async_session() as db:
+        # Rows removed or inserted before the stored position (e.g. a
+        # portfolio reset, which bypasses the ledger) change this count
+        if state.tx_count:
+            seen = await db.scalar(
+                select(func.count())
+                .select_from(Transaction)
+                .where(*tracked, tuple_(Transaction.date, Transaction.id) <= state.last_key)
+            )
+            if seen != state.tx_count:
+                state = EngineState(method=method)
+
+        result = await db.stream_scalars(
+            select(Transaction)
+            .where(*tracked, tuple_(Transaction.date, Transaction.id) > state.last_key)
+            .order_by(Transaction.date, Transaction.id)
+            .execution_options(yield_per=2000)
+        )
+        async for tx in result:
+            state.apply(tx)
+
+    # A change committed meanwhile may not be reflected in what was read
+    if _generation.get(user_id, 0) == generation:
+        _states.set((user_id, method), state)
+    else:
+        _states.delete((user_id, method))
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def _rounded(totals: dict) -> dict:
+    return {k: round(v, 2) for k, v in totals.items()}
+
+
+def monthly_taxes(months: dict[str, dict[str, dict]]) -> list[dict]:
+    """Realized results and tax due per month, oldest first."""
+    losses = {category: 0.0 for category in TAX_RULES}
+    carried = 0.0
+    report = []
+    for month in sorted(months):
+        classes = months[month]
+        taxes = {}
+        month_tax = 0.0
+        for category, (cls, rate, exemption) in TAX_RULES.items():
+            totals = classes.get(cls, _empty_totals())
+            result = totals["realized"]
+            exempt = exemption is not None and totals["sales"] <= exemption and result > 0
+            compensated = taxable = 0.0
+            if result < 0:
+                losses[category] -= result
+            elif result > 0 and not exempt:
+                compensated = min(losses[category], result)
+                losses[category] -= compensated
+                taxable = result - compensated
+            tax = taxable * rate
+            month_tax += tax
+            taxes[category] = {
+                "sales": round(totals["sales"], 2),
+                "result": round(result, 2),
+                "exempt": exempt,
+                "loss_compensated": round(compensated, 2),
+                "taxable": round(taxable, 2),
+                "rate": rate,
+                "tax": round(tax, 2),
+                "loss_carryforward": round(losses[category], 2),
+            }
+
+        due = month_tax + carried
+        darf, carried = (due, 0.0) if due >= DARF_MINIMUM else (0.0, due)
+        report.append({
+            "month": month,
+            "classes": {cls: _rounded(t) for cls, t in classes.items()},
+            "taxes": taxes,
+            "tax": round(month_tax, 2),
+            "darf": round(darf, 2),
+            "carried_tax": round(carried, 2),
+        })
+    return report
+
+
+def _report(state: EngineState) -> dict:
+    months = monthly_taxes(state.months)
+    by_class: dict[str, float] = {}
+    for (cls, _), result in state.realized.items():
+        by_class[cls] = by_class.get(cls, 0.0) + result
+    return {
+        "method": state.method,
+        "months": months,
+        "assets": [
+            {"asset_class": cls, "ticker": ticker, "realized": round(result, 2)}
+            for (cls, ticker), result in sorted(state.realized.items())
+        ],
+        "totals": {
+            "realized": {cls: round(v, 2) for cls, v in sorted(by_class.items())},
+            "darf": round(sum(m["darf"] for m in months), 2),
+        },
+        "unmatched_sells": state.unmatched_sells,
+    }
+
+
+async def build_report(user_id: str, method: str = "average") -> dict:
+    """Realized P&L and DARF report; concurrent calls for a user share one pass."""
+    key = (user_id, method)
+
+    async def fetch(keys):
+        return {key: _report(await _advance(user_id, method))}
+
+    return (await _flight.run_many([key], fetch))[key]
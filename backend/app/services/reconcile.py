@@ -0,0 +1,283 @@
+"""
+Position reconciliation: replay every user's transactions and compare
+the result with the stored asset rows.
+
+Users are processed in pages with a fresh session each, and their
+transactions are streamed in ``(user, date, id)`` order, so memory holds
+one page of assets at a time whatever the number of users. Average price
+depends on the order of operations, so each asset is replayed
+sequentially; the pass over the transactions is still a single stream.
+
+Each asset starts from its ledger opening checkpoint. Assets with
+transactions but no opening (openings are created lazily) cannot be
+checked: the only opening available is the stored row with every
+transaction reverted, and replaying onto it rebuilds the row. They are
+counted as ``unanchored_assets`` instead; a repair run stores that
+opening for them, so later runs check them from there. Only numeric
+position fields are compared.
+
+Run from the backend directory::
+
+    python -m app.services.reconcile [--repair] [--user USER_ID]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core import user_cache
+from ..core.scheduler import periodic
+from ..database import async_session
+from ..models.user import User
+from ..models.transaction import Transaction
+from ..models.position_checkpoint import PositionCheckpoint
+from .ledger import MODEL_MAP, STATE_FIELDS, OPENING_KEY, asset_ref, apply_effect, opening_state
+
+logger = logging.getLogger(__name__)
+
+# Position fields that are compared (broker/institution are descriptive)
+TEXT_FIELDS = {"broker", "institution"}
+NUMERIC_FIELDS = {cls: tuple(f for f in fields if f not in TEXT_FIELDS) for cls, fields in STATE_FIELDS.items()}
+
+MAX_SAMPLES = 100
+ABS_TOLERANCE = 1e-6
+REL_TOLERANCE = 1e-9
+
+
+def _differs(stored, expected) -> bool:
+    stored, expected = stored or 0, expected or 0
+    return abs(stored - expected) > max(ABS_TOLERANCE, REL_TOLERANCE * abs(expected))
+
+
+class _Report:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.users = 0
+        self.assets_checked = 0
+        self.transactions = 0
+        self.orphan_transactions = 0
+        self.mismatched_assets = 0
+        self.repaired_assets = 0
+        self.unanchored_assets = 0
+        self.anchored_assets = 0
+        self.samples: list[dict] = []
+        self.unanchored_samples: list[dict] = []
+
+    def to_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "users": self.users,
+            "assets_checked": self.assets_checked,
+            "transactions": self.transactions,
+            "orphan_transactions": self.orphan_transactions,
+            "mismatched_assets": self.mismatched_assets,
+            "repaired_assets": self.repaired_assets,
+            "unanchored_assets": self.unanchored_assets,
+            "anchored_assets": self.anchored_assets,
+            "elapsed_seconds": round(elapsed, 3),
+            "transactions_per_second": round(self.transactions / elapsed, 1) if elapsed else None,
+            "users_per_second": round(self.users / elapsed, 1) if elapsed else None,
+            "samples": self.samples,
+            "unanchored_samples": self.unanchored_samples,
+        }
+
+
+async def _reconcile_page(db: AsyncSession, user_ids: list[str], repair: bool, report: _Report) -> None:
+    # Stored rows for the page, one query per asset class; a repair locks
+    # them so concurrent ledger writes wait instead of being overwritten
+    assets: dict[tuple, object] = {}
+    for cls, (model, key_field) in sorted(MODEL_MAP.items()):
+        stmt = select(model).where(model.user_id.in_(user_ids))
+        if repair:
+            stmt = stmt.order_by(model.user_id, getattr(model, key_field)).with_for_update()
+        result = await db.execute(stmt)
+        for asset in result.scalars().all():
+            assets[(asset.user_id, cls, getattr(asset, key_field))] = asset
+
+    # Plain rows (not ORM objects), so repaired openings can be re-inserted
+    result = await db.execute(
+        select(
+            PositionCheckpoint.user_id, PositionCheckpoint.asset_class,
+            PositionCheckpoint.asset_key, PositionCheckpoint.state,
+        ).where(
+            PositionCheckpoint.user_id.in_(user_ids),
+            PositionCheckpoint.tx_date == OPENING_KEY[0],
+            PositionCheckpoint.tx_id == OPENING_KEY[1],
+        )
+    )
+    openings = {(u, cls, key): state for u, cls, key, state in result.all()}
+
+    def baseline(key: tuple) -> SimpleNamespace:
+        return SimpleNamespace(**openings[key])
+
+    # Replay the streamed transactions onto per-asset states; assets without
+    # an opening keep theirs, to derive one from the whole history
+    states: dict[tuple, SimpleNamespace] = {}
+    unanchored: dict[tuple, list] = {}
+    last_tx: dict[tuple, tuple] = {}
+    counts: dict[tuple, int] = {}
+    stream = await db.stream_scalars(
+        select(Transaction)
+        .where(Transaction.user_id.in_(user_ids))
+        .order_by(Transaction.user_id, Transaction.date, Transaction.id)
+        .execution_options(yield_per=2000)
+    )
+    async for tx in stream:
+        report.transactions += 1
+        ref = asset_ref(tx)
+        key = (tx.user_id, *ref) if ref else None
+        if key not in assets:
+            report.orphan_transactions += 1
+            continue
+        last_tx[key] = (tx.date, tx.id)
+        counts[key] = counts.get(key, 0) + 1
+        if key not in openings:
+            unanchored.setdefault(key, []).append(tx)
+            continue
+        state = states.get(key)
+        if state is None:
+            state = states[key] = baseline(key)
+        apply_effect(state, tx)
+
+    # Assets with an opening but no transactions must still equal the opening
+    for key in openings:
+        if key in assets and key not in states:
+            states[key] = baseline(key)
+
+    repaired = []
+    for key, state in states.items():
+        asset = assets[key]
+        report.assets_checked += 1
+        diffs = [
+            f for f in NUMERIC_FIELDS[key[1]]
+            if _differs(getattr(asset, f), getattr(state, f))
+        ]
+        if not diffs:
+            continue
+        report.mismatched_assets += 1
+        for f in diffs:
+            if len(report.samples) < MAX_SAMPLES:
+                report.samples.append({
+                    "user_id": key[0], "asset_class": key[1], "asset_key": key[2],
+                    "field": f, "stored": getattr(asset, f), "expected": getattr(state, f),
+                })
+        if repair:
+            for f in diffs:
+                setattr(asset, f, getattr(state, f))
+            repaired.append(key)
+
+    # Replaying onto an opening derived from the row would rebuild the row,
+    # so these are reported apart rather than counted as matching
+    anchored = []
+    for key, txs in unanchored.items():
+        report.unanchored_assets += 1
+        if len(report.unanchored_samples) < MAX_SAMPLES:
+            report.unanchored_samples.append({
+                "user_id": key[0], "asset_class": key[1], "asset_key": key[2], "transactions": len(txs),
+            })
+        if repair:
+            openings[key] = opening_state(assets[key], key[1], reversed(txs))
+            anchored.append(key)
+
+    if repaired or anchored:
+        # Rebuild the ledger checkpoints of repaired assets from this replay
+        # and anchor unanchored ones at their current row
+        for user_id, cls, asset_key in repaired + anchored:
+            await db.execute(
+                delete(PositionCheckpoint).where(
+                    PositionCheckpoint.user_id == user_id,
+                    PositionCheckpoint.asset_class == cls,
+                    PositionCheckpoint.asset_key == asset_key,
+                )
+            )
+        for key in repaired + anchored:
+            user_id, cls, asset_key = key
+            asset = assets[key]
+            db.add(PositionCheckpoint(
+                user_id=user_id, asset_class=cls, asset_key=asset_key,
+                tx_date=OPENING_KEY[0], tx_id=OPENING_KEY[1], tx_count=0,
+                state=openings[key],
+            ))
+            if key in last_tx:
+                db.add(PositionCheckpoint(
+                    user_id=user_id, asset_class=cls, asset_key=asset_key,
+                    tx_date=last_tx[key][0], tx_id=last_tx[key][1], tx_count=counts[key],
+                    state={f: getattr(asset, f) for f in STATE_FIELDS[cls]},
+                ))
+        await db.commit()
+        for user_id in {key[0] for key in repaired}:
+            user_cache.invalidate_user(user_id)
+        report.repaired_assets += len(repaired)
+        report.anchored_assets += len(anchored)
+
+
+async def reconcile_positions(
+    repair: bool = False,
+    user_id: str | None = None,
+    page_size: int | None = None,
+) -> dict:
+    """Replay transactions for every user (or one) and diff the stored positions.
+
+    With ``repair`` mismatched fields are overwritten with the replayed
+    values. Returns counters, throughput and up to ``MAX_SAMPLES`` diffs.
+    """
+    page_size = page_size or settings.reconcile_page_size
+    report = _Report()
+    after = ""
+    while True:
+        async with async_session() as db:
+            if user_id:
+                page = [user_id]
+            else:
+                result = await db.execute(
+                    select(User.id).where(User.id > after).order_by(User.id).limit(page_size)
+                )
+                page = [r[0] for r in result.all()]
+            if not page:
+                break
+            await _reconcile_page(db, page, repair, report)
+        report.users += len(page)
+        if user_id or len(page) < page_size:
+            break
+        after = page[-1]
+    return report.to_dict()
+
+
+@periodic("position-reconcile", seconds=settings.reconcile_interval_hours * 3600, initial_delay=900)
+async def reconcile_job() -> None:
+    """Report-only pass; mismatches are logged for an admin to review."""
+    report = await reconcile_positions()
+    level = logging.WARNING if report["mismatched_assets"] else logging.INFO
+    logger.log(
+        level,
+        "[reconcile] %(users)s users, %(transactions)s transactions in %(elapsed_seconds)ss "
+        "(%(transactions_per_second)s tx/s): %(mismatched_assets)s mismatched assets, "
+        "%(unanchored_assets)s without an opening",
+        report,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay transactions and diff stored positions")
+    parser.add_argument("--repair", action="store_true", help="overwrite mismatched positions")
+    parser.add_argument("--user", help="only this user id")
+    parser.add_argument("--page-size", type=int, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(reconcile_positions(args.repair, args.user, args.page_size))
+    for sample in report.pop("samples"):
+        print("{user_id} {asset_class}:{asset_key} {field}: stored={stored} expected={expected}".format(**sample))
+    for sample in report.pop("unanchored_samples"):
+        print("{user_id} {asset_class}:{asset_key}: no opening, {transactions} transactions".format(**sample))
+    for name, value in report.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
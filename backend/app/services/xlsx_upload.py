@@ -0,0 +1,102 @@
+"""
+Streaming parser for uploaded ``.xlsx`` statements.
+
+Workbooks are opened in openpyxl ``read_only`` mode, which streams the
+sheet XML row by row instead of building every cell in memory, and are
+parsed on a small dedicated thread pool so the event loop keeps serving
+requests. Each row goes through the caller's ``parse_row`` as it is
+read, so only the parsed results are kept.
+
+Limits, all answered with 413: the upload size, the uncompressed size of
+the workbook parts (what a decompression bomb inflates) and the number
+of non-empty data rows.
+"""
+
+import asyncio
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable
+
+from fastapi import HTTPException, UploadFile
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from ..config import settings
+
+MB = 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=settings.import_parse_workers, thread_name_prefix="xlsx")
+
+
+def _check_archive(f: BinaryIO) -> None:
+    try:
+        with zipfile.ZipFile(f) as archive:
+            size = sum(info.file_size for info in archive.infolist())
+    except zipfile.BadZipFile:
+        raise HTTPException(400, "Arquivo .xlsx invalido")
+    if size > settings.import_max_uncompressed_mb * MB:
+        raise HTTPException(413, f"Planilha excede {settings.import_max_uncompressed_mb} MB descompactada")
+    f.seek(0)
+
+
+def _parse(
+    f: BinaryIO,
+    parse_row: Callable[[tuple], Any],
+    sheet_hint: str | None,
+    min_columns: int,
+) -> list:
+    f.seek(0)
+    _check_archive(f)
+    try:
+        wb = load_workbook(f, read_only=True, data_only=True)
+    except (InvalidFileException, KeyError, zipfile.BadZipFile):
+        raise HTTPException(400, "Arquivo .xlsx invalido")
+
+    try:
+        ws = None
+        if sheet_hint:
+            name = next((n for n in wb.sheetnames if sheet_hint in n.lower()), None)
+            ws = wb[name] if name else None
+        if ws is None:
+            ws = wb.active
+
+        results = []
+        rows = 0
+        header_skipped = False
+        for row in ws.iter_rows(values_only=True):
+            if not header_skipped:
+                header_skipped = True
+                continue
+            if all(v is None for v in row):
+                continue
+            rows += 1
+            if rows > settings.import_max_rows:
+                raise HTTPException(413, f"Planilha excede o limite de {settings.import_max_rows} linhas")
+            # Read-only rows end at the last stored cell
+            if len(row) < min_columns:
+                row = row + (None,) * (min_columns - len(row))
+            item = parse_row(row)
+            if item is not None:
+                results.append(item)
+        return results
+    finally:
+        wb.close()
+
+
+async def parse_upload(
+    file: UploadFile,
+    parse_row: Callable[[tuple], Any],
+    sheet_hint: str | None = None,
+    min_columns: int = 0,
+) -> list:
+    """Results of ``parse_row`` for each data row of the upload (None results dropped).
+
+    The header row is skipped. ``sheet_hint`` picks the first sheet whose
+    lowercased name contains it (default: the active sheet); rows shorter
+    than ``min_columns`` are padded with None.
+    """
+    if file.size is not None and file.size > settings.import_max_file_mb * MB:
+        raise HTTPException(413, f"Arquivo excede {settings.import_max_file_mb} MB")
+    loop = asyncio.get_running_loop()
+    # The spooled upload file is read in place, never copied into memory
+    return await loop.run_in_executor(_executor, _parse, file.file, parse_row, sheet_hint, min_columns)
@@ -8,11 +8,30 @@ International tickers are used as-is (e.g. AAPL, MSFT).
 import asyncio
 import math
 from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 
 import yfinance as yf
 
+from ..config import settings
+from ..core.cache import TTLCache
+from ..core.singleflight import SingleFlight
+
 _executor = ThreadPoolExecutor(max_workers=4)
 
+# B3 runs on Brasilia time (UTC-3, no DST since 2019)
+BRT = timezone(timedelta(hours=-3))
+
+# In-flight deduplication of upstream lookups, keyed by Yahoo symbol
+_quote_flight = SingleFlight()
+_asset_info_flight = SingleFlight()
+_fundamentals_flight = SingleFlight()
+
+# Process-wide quote cache keyed by Yahoo symbol (e.g. PETR4.SA, AAPL)
+_quote_cache = TTLCache(
+    maxsize=settings.quote_cache_max_entries,
+    ttl=settings.quote_cache_ttl_market_closed,
+)
+
 # Yahoo Finance sector names → Portuguese equivalents
 SECTOR_PT = {
     "Energy": "Energia",
@@ -43,9 +62,37 @@ FII_INDUSTRY_PT = {
 }
 
 
+def _yahoo_symbol(ticker: str, suffix: str) -> str:
+    return f"{ticker}{suffix}" if suffix and not ticker.endswith(suffix) else ticker
+
+
+def is_b3_open(now: datetime | None = None) -> bool:
+    """True during the B3 trading session (Mon-Fri 10:00-18:00 BRT)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(BRT)
+    return now.weekday() < 5 and 10 <= now.hour < 18
+
+
+def _quote_ttl() -> int:
+    if is_b3_open():
+        return settings.quote_cache_ttl_market_open
+    return settings.quote_cache_ttl_market_closed
+
+
+def quote_cache_stats() -> dict:
+    return _quote_cache.stats() | {"ttl_seconds": _quote_ttl()}
+
+
+def inflight_stats() -> dict:
+    return {
+        "quotes": _quote_flight.stats(),
+        "asset_info": _asset_info_flight.stats(),
+        "fundamentals": _fundamentals_flight.stats(),
+    }
+
+
 def _fetch_quotes_sync(tickers: list[str], suffix: str = ".SA") -> list[dict]:
     """Fetch current quotes for a list of tickers (synchronous)."""
-    yahoo_tickers = [f"{t}{suffix}" if suffix and not t.endswith(suffix) else t for t in tickers]
+    yahoo_tickers = [_yahoo_symbol(t, suffix) for t in tickers]
     ticker_str = " ".join(yahoo_tickers)
 
     data = yf.download(ticker_str, period="1d", group_by="ticker", progress=False, threads=True)
@@ -79,7 +126,7 @@ def _fetch_quotes_sync(tickers: list[str], suffix: str = ".SA") -> list[dict]:
 
 def _fetch_ticker_info_sync(ticker: str, suffix: str = ".SA") -> dict | None:
     """Fetch detailed info for a single ticker (synchronous)."""
-    yahoo_ticker = f"{ticker}{suffix}" if suffix and not ticker.endswith(suffix) else ticker
+    yahoo_ticker = _yahoo_symbol(ticker, suffix)
     try:
         tk = yf.Ticker(yahoo_ticker)
         info = tk.fast_info
@@ -93,12 +140,41 @@ def _fetch_ticker_info_sync(ticker: str, suffix: str = ".SA") -> dict | None:
         return None
 
 
+async def _download_quotes(symbols: list[str]) -> dict[str, dict]:
+    """Download quotes for Yahoo symbols and store them in the quote cache."""
+    loop = asyncio.get_event_loop()
+    # Symbols already carry their suffix, so no suffix is appended here
+    fetched = await loop.run_in_executor(_executor, _fetch_quotes_sync, symbols, "")
+    ttl = _quote_ttl()
+    entries = {}
+    for quote in fetched:
+        entry = {k: v for k, v in quote.items() if k != "symbol"}
+        _quote_cache.set(quote["symbol"], entry, ttl=ttl)
+        entries[quote["symbol"]] = entry
+    return entries
+
+
 async def fetch_quotes(tickers: list[str], suffix: str = ".SA") -> list[dict]:
-    """Fetch current quotes asynchronously via thread pool."""
+    """Fetch current quotes, serving fresh ones from the shared quote cache.
+
+    Only symbols missing from the cache go upstream, and symbols already
+    being downloaded by a concurrent request are awaited instead of
+    fetched again. Results keep the order of ``tickers``.
+    """
     if not tickers:
         return []
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(_executor, _fetch_quotes_sync, tickers, suffix)
+    symbols = {t: _yahoo_symbol(t, suffix) for t in tickers}
+    found, missing = _quote_cache.get_many(dict.fromkeys(symbols.values()))
+
+    if missing:
+        fetched = await _quote_flight.run_many(missing, _download_quotes)
+        found.update({s: q for s, q in fetched.items() if q is not None})
+
+    return [
+        {"symbol": t, **found[s]}
+        for t, s in symbols.items()
+        if s in found
+    ]
 
 
 async def fetch_ticker_info(ticker: str, suffix: str = ".SA") -> dict | None:
@@ -111,7 +187,7 @@ def _fetch_asset_info_sync(tickers: list[str], suffix: str = ".SA") -> dict[str,
     """Fetch sector and name for multiple tickers (synchronous)."""
     results = {}
     for ticker in tickers:
-        yahoo_ticker = f"{ticker}{suffix}" if suffix and not ticker.endswith(suffix) else ticker
+        yahoo_ticker = _yahoo_symbol(ticker, suffix)
         try:
             tk = yf.Ticker(yahoo_ticker)
             info = tk.info or {}
@@ -132,18 +208,30 @@ def _fetch_asset_info_sync(tickers: list[str], suffix: str = ".SA") -> dict[str,
     return results
 
 
+async def _run_per_symbol(flight: SingleFlight, sync_fn, tickers: list[str], suffix: str) -> dict[str, dict]:
+    """Run a per-ticker Yahoo lookup through ``flight``, keyed by Yahoo symbol."""
+    symbols = {t: _yahoo_symbol(t, suffix) for t in tickers}
+
+    async def fetch(owned: list[str]) -> dict[str, dict]:
+        loop = asyncio.get_event_loop()
+        # Symbols already carry their suffix, so no suffix is appended here
+        return await loop.run_in_executor(_executor, sync_fn, owned, "")
+
+    data = await flight.run_many(symbols.values(), fetch)
+    return {t: data[s] for t, s in symbols.items() if data.get(s) is not None}
+
+
 async def fetch_asset_info(tickers: list[str], suffix: str = ".SA") -> dict[str, dict]:
     """Fetch sector and name for multiple tickers asynchronously."""
     if not tickers:
         return {}
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(_executor, _fetch_asset_info_sync, tickers, suffix)
+    return await _run_per_symbol(_asset_info_flight, _fetch_asset_info_sync, tickers, suffix)
 
 
 def _fetch_single_fundamental(args: tuple) -> tuple[str, dict]:
     """Fetch fundamentals for a single ticker. Returns (ticker, data)."""
     ticker, suffix = args
-    yahoo_ticker = f"{ticker}{suffix}" if suffix and not ticker.endswith(suffix) else ticker
+    yahoo_ticker = _yahoo_symbol(ticker, suffix)
     result = {}
     try:
         tk = yf.Ticker(yahoo_ticker)
@@ -210,5 +298,64 @@ async def fetch_fundamentals(tickers: list[str], suffix: str = ".SA") -> dict[st
     """Fetch fundamentals for multiple tickers asynchronously."""
     if not tickers:
         return {}
+    return await _run_per_symbol(_fundamentals_flight, _fetch_fundamentals_sync, tickers, suffix)
+
+
+def _fetch_daily_bars_sync(symbols: list[str], start: date, end: date) -> dict[str, list[dict]]:
+    """Download daily OHLC bars for Yahoo symbols in [start, end] (synchronous)."""
+    data = yf.download(
+        " ".join(symbols),
+        start=start.isoformat(),
+        end=(end + timedelta(days=1)).isoformat(),  # Yahoo's end is exclusive
+        interval="1d",
+        group_by="ticker",
+        auto_adjust=False,
+        progress=False,
+        threads=True,
+    )
+
+    results: dict[str, list[dict]] = {}
+    if data is None or data.empty:
+        return results
+    multi = data.columns.nlevels > 1
+    for symbol in symbols:
+        try:
+            if multi:
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            bars = []
+            for ts, row in frame.iterrows():
+                close = row.get("Close")
+                if close is None or math.isnan(close):
+                    continue
+                bars.append({
+                    "date": ts.date(),
+                    "open": _float_or_none(row.get("Open")),
+                    "high": _float_or_none(row.get("High")),
+                    "low": _float_or_none(row.get("Low")),
+                    "close": float(close),
+                    "adj_close": _float_or_none(row.get("Adj Close")),
+                    "volume": _float_or_none(row.get("Volume")),
+                })
+            results[symbol] = bars
+        except Exception:
+            continue
+    return results
+
+
+def _float_or_none(val) -> float | None:
+    if val is None:
+        return None
+    val = float(val)
+    return None if math.isnan(val) else val
+
+
+async def fetch_daily_bars(symbols: list[str], start: date, end: date) -> dict[str, list[dict]]:
+    """Fetch daily bars for Yahoo symbols asynchronously."""
+    if not symbols:
+        return {}
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(_executor, _fetch_fundamentals_sync, tickers, suffix)
+    return await loop.run_in_executor(_executor, _fetch_daily_bars_sync, symbols, start, end)
@@ -1,11 +1,9 @@
-import { useState } from 'react';
 import { useAdminLogs } from '../../hooks/useAdmin';
 import { Loader2, ChevronDown } from 'lucide-react';
 
 export default function AdminLogsTab() {
-  const [limit, setLimit] = useState(50);
-  const [offset, setOffset] = useState(0);
-  const { data: logs, isLoading } = useAdminLogs({ limit, offset });
+  const { data, isLoading, hasNextPage, fetchNextPage, isFetchingNextPage } = useAdminLogs({ limit: 50 });
+  const logs = data?.pages.flatMap(page => page.items);
 
   if (isLoading) {
     return (
@@ -49,7 +47,7 @@ export default function AdminLogsTab() {
                           })
                         : '-'}
                     </td>
-                    <td className="px-4 py-3 text-slate-400">{log.userId?.slice(0, 8)}...</td>
+                    <td className="px-4 py-3 text-slate-400">{log.userId ? `${log.userId.slice(0, 8)}...` : '-'}</td>
                     <td className="px-4 py-3">
                       <span className="rounded-full bg-indigo-500/20 px-2 py-0.5 text-xs text-indigo-400">
                         {log.action}
@@ -65,13 +63,18 @@ export default function AdminLogsTab() {
             </table>
           </div>
 
-          {logs.length >= limit && (
+          {hasNextPage && (
             <div className="mt-4 flex justify-center">
               <button
-                onClick={() => setOffset(prev => prev + limit)}
-                className="flex items-center gap-2 rounded-lg border border-white/10 bg-white/5 px-4 py-2 text-sm text-slate-400 transition hover:bg-white/10"
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+                className="flex items-center gap-2 rounded-lg border border-white/10 bg-white/5 px-4 py-2 text-sm text-slate-400 transition hover:bg-white/10 disabled:opacity-50"
               >
-                <ChevronDown className="h-4 w-4" />
+                {isFetchingNextPage ? (
+                  <Loader2 className="h-4 w-4 animate-spin" />
+                ) : (
+                  <ChevronDown className="h-4 w-4" />
+                )}
                 Carregar mais
               </button>
             </div>
@@ -1,4 +1,4 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { usersApi, adminApi } from '../services/api';
 
 export function useUsers() {
@@ -14,9 +14,11 @@ export function useAdminMetrics() {
 }
 
 export function useAdminLogs(params = {}) {
-  return useQuery({
+  return useInfiniteQuery({
     queryKey: ['admin', 'logs', params],
-    queryFn: () => adminApi.logs(params),
+    queryFn: ({ pageParam }) => adminApi.logs({ ...params, cursor: pageParam }),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
   });
 }
 
@@ -216,7 +216,7 @@ export const adminApi = {
     const qs = new URLSearchParams();
     if (params.userId) qs.set('user_id', params.userId);
     if (params.limit) qs.set('limit', params.limit);
-    if (params.offset) qs.set('offset', params.offset);
+    if (params.cursor) qs.set('cursor', params.cursor);
     const q = qs.toString();
     return request(`/admin/logs${q ? '?' + q : ''}`);
   },
@@ -418,6 +418,14 @@ export async function resetPortfolio() {
   return request('/portfolio/reset', { method: 'POST', raw: true });
 }
 
+export async function fetchPortfolioSummary() {
+  return request('/portfolio/summary');
+}
+
+export async function fetchPortfolioSnapshot() {
+  return request('/portfolio/snapshot');
+}
+
 // ---------------------------------------------------------------------------
 // Backup Import
 // ---------------------------------------------------------------------------